@@ -1,5 +1,9 @@
 from sqladmin import Admin, ModelView
 
+from app.common.constants import InvalidationEventType
+from app.common.invalidation import invalidation_bus
+from app.crud.document_dao import DocumentDAO
+from app.crud.template_dao import TemplateDAO
 from app.models.document import Document, DocumentField
 from app.models.favorite import UserTemplateFavorite
 from app.models.template import (
@@ -11,14 +15,65 @@ from app.models.template import (
 from app.models.user import User
 
 
-class TemplateFieldTypeAdmin(ModelView, model=TemplateFieldType):
+class InvalidateCacheMixin:
+    """Сброс кэшей всех процессов при изменениях через админку."""
+
+    invalidation_event: str = InvalidationEventType.TEMPLATE
+
+    def invalidation_id(self, model):
+        return model.id
+
+    async def after_model_change(self, data, model, is_created, request):
+        await invalidation_bus.publish(
+            self.invalidation_event, self.invalidation_id(model)
+        )
+
+    async def after_model_delete(self, model, request):
+        await invalidation_bus.publish(
+            self.invalidation_event, self.invalidation_id(model)
+        )
+
+
+class SearchVectorMixin:
+    """Пересчет вектора полнотекстового поиска при изменениях через
+    админку."""
+
+    search_dao = TemplateDAO
+
+    def search_vector_id(self, model):
+        return model.id
+
+    async def after_model_change(self, data, model, is_created, request):
+        await super().after_model_change(data, model, is_created, request)
+        await self.search_dao.update_search_vector(
+            self.search_vector_id(model)
+        )
+
+    async def after_model_delete(self, model, request):
+        await super().after_model_delete(model, request)
+        await self.search_dao.update_search_vector(
+            self.search_vector_id(model)
+        )
+
+
+class TemplateFieldTypeAdmin(
+    InvalidateCacheMixin, ModelView, model=TemplateFieldType
+):
+    invalidation_event = InvalidationEventType.FIELD_TYPE
     column_list = [c.name for c in TemplateFieldType.__table__.c]
     name = "Тип"
     name_plural = "Типы"
     icon = "fa-solid fa-shapes"
 
 
-class TemplateFieldAdmin(ModelView, model=TemplateField):
+class TemplateFieldAdmin(
+    SearchVectorMixin, InvalidateCacheMixin, ModelView, model=TemplateField
+):
+    def invalidation_id(self, model):
+        return model.template_id
+
+    def search_vector_id(self, model):
+        return model.template_id
 
     column_list = [c.name for c in TemplateField.__table__.c] + [
         TemplateField.type,
@@ -50,12 +105,18 @@ class TemplateFieldGroupAdmin(ModelView, model=TemplateFieldGroup):
     # icon = "fa-solid fa-group"
 
 
-class TemplateAdmin(ModelView, model=Template):
-    column_list = [c.name for c in Template.__table__.c] + [
+class TemplateAdmin(
+    SearchVectorMixin, InvalidateCacheMixin, ModelView, model=Template
+):
+    column_list = [
+        c.name for c in Template.__table__.c if c.name != "search_vector"
+    ] + [
         Template.groups,
         Template.fields,
         Template.favorited_by_users,
     ]
+    column_details_exclude_list = [Template.search_vector]
+    form_excluded_columns = [Template.search_vector]
     name = "Шаблон"
     name_plural = "Шаблоны"
     # icon = "fa-solid fa-hotel"
@@ -89,7 +150,12 @@ class UserTemplateFavoriteAdmin(ModelView, model=UserTemplateFavorite):
     icon = "fa-solid fa-person"
 
 
-class DocumentFieldAdmin(ModelView, model=DocumentField):
+class DocumentFieldAdmin(SearchVectorMixin, ModelView, model=DocumentField):
+    search_dao = DocumentDAO
+
+    def search_vector_id(self, model):
+        return model.document_id
+
     form_ajax_refs = {
         "template_field": {
             "fields": ("id",),
@@ -112,8 +178,12 @@ class DocumentFieldAdmin(ModelView, model=DocumentField):
     name_plural = "Поля док"
 
 
-class DocumentAdmin(ModelView, model=Document):
-    column_list = "__all__"
+class DocumentAdmin(SearchVectorMixin, ModelView, model=Document):
+    search_dao = DocumentDAO
+    column_exclude_list = [Document.search_vector]
+    column_details_exclude_list = [Document.search_vector]
+    column_export_exclude_list = [Document.search_vector]
+    form_excluded_columns = [Document.search_vector]
     name = "Документ"
     name_plural = "Документ"
     # icon = "fa-solid fa-hotel"
@@ -0,0 +1,39 @@
+"""list and table field kinds added
+
+Revision ID: 009
+Revises: 008
+Create Date: 2026-10-19 14:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "009"
+down_revision: Union[str, None] = "008"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "field_type",
+        sa.Column(
+            "kind",
+            sa.String(length=50),
+            server_default="scalar",
+            nullable=False,
+        ),
+    )
+    op.add_column(
+        "document_field",
+        sa.Column("items", sa.JSON(), nullable=True),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("document_field", "items")
+    op.drop_column("field_type", "kind")
@@ -0,0 +1,63 @@
+"""foreign key and lookup indexes added
+
+Revision ID: 010
+Revises: 009
+Create Date: 2026-10-19 16:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "010"
+down_revision: Union[str, None] = "009"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (имя индекса, таблица, столбцы)
+INDEXES = (
+    (
+        "ix_document_owner_id_updated_at",
+        "document",
+        ["owner_id", "updated_at"],
+    ),
+    ("ix_document_template_id", "document", ["template_id"]),
+    (
+        "ix_document_field_document_id_template_field_id",
+        "document_field",
+        ["document_id", "template_field_id"],
+    ),
+    (
+        "ix_document_field_template_field_id",
+        "document_field",
+        ["template_field_id"],
+    ),
+    ("ix_template_field_template_id", "template_field", ["template_id"]),
+    ("ix_template_field_type_id", "template_field", ["type_id"]),
+    ("ix_field_group_template_id", "field_group", ["template_id"]),
+    (
+        "ix_user_template_favorite_user_id_template_id",
+        "user_template_favorite",
+        ["user_id", "template_id"],
+    ),
+    (
+        "ix_user_template_favorite_template_id",
+        "user_template_favorite",
+        ["template_id"],
+    ),
+)
+
+
+def upgrade() -> None:
+    # индексы строятся без блокировки записи в таблицы (вне транзакции)
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.create_index(name, table, columns, postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, _ in reversed(INDEXES):
+            op.drop_index(name, table, postgresql_concurrently=True)
@@ -0,0 +1,62 @@
+"""document field values jsonb column added
+
+Revision ID: 011
+Revises: 010
+Create Date: 2026-10-19 18:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = "011"
+down_revision: Union[str, None] = "010"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # существующие документы остаются в document_field (field_values=NULL)
+    op.add_column(
+        "document",
+        sa.Column(
+            "field_values",
+            postgresql.JSONB(astext_type=sa.Text()),
+            nullable=True,
+        ),
+    )
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_document_field_values",
+            "document",
+            ["field_values"],
+            postgresql_using="gin",
+            postgresql_ops={"field_values": "jsonb_path_ops"},
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    # значения документов из field_values переносятся в document_field
+    op.execute(
+        """
+        INSERT INTO document_field (document_id, template_field_id, value,
+            items)
+        SELECT d.id, f.key::integer, f.value ->> 'value',
+            (f.value -> 'items')::json
+        FROM document d CROSS JOIN LATERAL jsonb_each(d.field_values) f
+        JOIN template_field t ON t.id = f.key::integer
+        WHERE d.field_values IS NOT NULL
+        """
+    )
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_document_field_values",
+            "document",
+            postgresql_concurrently=True,
+        )
+    op.drop_column("document", "field_values")
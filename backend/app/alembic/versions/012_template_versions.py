@@ -0,0 +1,96 @@
+"""template versions added
+
+Revision ID: 012
+Revises: 011
+Create Date: 2026-10-19 20:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "012"
+down_revision: Union[str, None] = "011"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "template_version",
+        sa.Column("template_id", sa.Integer(), nullable=False),
+        sa.Column("number", sa.Integer(), nullable=False),
+        sa.Column("filename", sa.String(), nullable=False),
+        sa.Column("file_hash", sa.String(length=64), nullable=True),
+        sa.Column("tags", sa.JSON(), nullable=True),
+        sa.Column("fields", sa.JSON(), nullable=True),
+        sa.Column("thumbnail", sa.String(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(
+            ["template_id"], ["template.id"], ondelete="CASCADE"
+        ),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("template_id", "number"),
+    )
+    op.add_column(
+        "template", sa.Column("version_id", sa.Integer(), nullable=True)
+    )
+    op.create_foreign_key(
+        "fk_template_version_id",
+        "template",
+        "template_version",
+        ["version_id"],
+        ["id"],
+        ondelete="SET NULL",
+    )
+    op.add_column(
+        "document",
+        sa.Column("template_version_id", sa.Integer(), nullable=True),
+    )
+    op.create_foreign_key(
+        None,
+        "document",
+        "template_version",
+        ["template_version_id"],
+        ["id"],
+        ondelete="SET NULL",
+    )
+    op.create_index(
+        "ix_document_template_version_id", "document", ["template_version_id"]
+    )
+    # загруженные файлы шаблонов становятся первой версией,
+    # существующие документы закрепляются за ней
+    op.execute(
+        """
+        INSERT INTO template_version (template_id, number, filename,
+            created_at)
+        SELECT id, 1, filename, updated_at FROM template
+        WHERE filename IS NOT NULL AND filename <> ''
+        """
+    )
+    op.execute(
+        """
+        UPDATE template t SET version_id = v.id
+        FROM template_version v WHERE v.template_id = t.id
+        """
+    )
+    op.execute(
+        """
+        UPDATE document d SET template_version_id = t.version_id
+        FROM template t WHERE t.id = d.template_id
+            AND t.version_id IS NOT NULL
+        """
+    )
+
+
+def downgrade() -> None:
+    # текущие файлы версий остаются в template.filename
+    op.drop_index("ix_document_template_version_id", "document")
+    op.drop_column("document", "template_version_id")
+    op.drop_constraint("fk_template_version_id", "template")
+    op.drop_column("template", "version_id")
+    op.drop_table("template_version")
@@ -0,0 +1,77 @@
+"""full text search vectors added
+
+Revision ID: 013
+Revises: 012
+Create Date: 2026-10-19 22:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = "013"
+down_revision: Union[str, None] = "012"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEXES = (
+    ("ix_template_search_vector", "template"),
+    ("ix_document_search_vector", "document"),
+)
+
+
+def upgrade() -> None:
+    op.add_column(
+        "template",
+        sa.Column("search_vector", postgresql.TSVECTOR(), nullable=True),
+    )
+    op.add_column(
+        "document",
+        sa.Column("search_vector", postgresql.TSVECTOR(), nullable=True),
+    )
+    # векторы существующих объектов (как TemplateDAO.update_search_vector
+    # и DocumentDAO.update_search_vector)
+    op.execute(
+        """
+        UPDATE template t SET search_vector =
+            setweight(to_tsvector('russian', coalesce(t.title, '')), 'A')
+            || setweight(
+                to_tsvector('russian', coalesce(t.description, '')), 'B')
+            || setweight(to_tsvector('russian', coalesce(
+                (SELECT string_agg(f.name, ' ') FROM template_field f
+                 WHERE f.template_id = t.id), '')), 'C')
+        """
+    )
+    op.execute(
+        """
+        UPDATE document d SET search_vector =
+            setweight(to_tsvector('russian', coalesce(d.description, '')), 'A')
+            || setweight(jsonb_to_tsvector('russian', coalesce(
+                d.field_values,
+                (SELECT jsonb_object_agg(f.template_field_id,
+                    jsonb_build_object('value', f.value, 'items', f.items))
+                 FROM document_field f WHERE f.document_id = d.id),
+                '{}'::jsonb), '["string", "numeric"]'), 'B')
+        """
+    )
+    with op.get_context().autocommit_block():
+        for name, table in INDEXES:
+            op.create_index(
+                name,
+                table,
+                ["search_vector"],
+                postgresql_using="gin",
+                postgresql_concurrently=True,
+            )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table in INDEXES:
+            op.drop_index(name, table, postgresql_concurrently=True)
+    op.drop_column("document", "search_vector")
+    op.drop_column("template", "search_vector")
@@ -1,10 +1,16 @@
-from typing import Optional
+from typing import Annotated, Optional
 
-from fastapi import APIRouter, Depends, status
+from fastapi import APIRouter, Depends, Query, Response, status
 from fastapi.responses import FileResponse
 
 from app.auth import current_active_user
-from app.common.utils import get_file_response
+from app.common.constants import file_format_type
+from app.common.utils import (
+    get_file_response,
+    get_json_response,
+    resolve_file_format,
+)
+from app.config import settings
 from app.models.user import User
 from app.schemas.document import (
     DocumentReadDTO,
@@ -26,27 +32,78 @@ async def get_all_documents(
     return None
 
 
+@router.get("/search", summary="Полнотекстовый поиск документов")
+async def search_documents(
+    q: Annotated[
+        str,
+        Query(
+            min_length=1,
+            max_length=200,
+            description="Строка поиска (слова совпадают по началу)",
+        ),
+    ],
+    limit: Annotated[
+        int, Query(ge=1, le=settings.SEARCH_MAX_PAGE_SIZE)
+    ] = settings.SEARCH_PAGE_SIZE,
+    offset: Annotated[int, Query(ge=0)] = 0,
+    user: User = Depends(current_active_user),
+) -> list[DocumentReadMinifiedDTO]:
+    return await DocumentService.search(user, q, limit, offset)
+
+
+@router.get(
+    "/merge",
+    summary="Получить несколько документов одним файлом docx, pdf или html.",
+    status_code=status.HTTP_200_OK,
+)
+async def download_merged_file(
+    document_id: Annotated[
+        list[int],
+        Query(
+            description="Идентификаторы документов в порядке объединения",
+            max_length=settings.DOCUMENT_MERGE_MAX_COUNT,
+        ),
+    ] = [],
+    pdf: bool = False,
+    format: Optional[file_format_type] = None,
+    user: Optional[User] = Depends(current_active_user),
+) -> FileResponse:
+    file, filename = await DocumentService.get_merged_file(
+        document_id,
+        user,
+        resolve_file_format(pdf, format),
+    )
+    return await get_file_response(file, filename)
+
+
 @router.get(
     "/{document_id}",
     summary="Получить документ с заданным document_id",
+    response_model=DocumentReadDTO,
 )
 async def get_document_by_id(
     document_id: document_id_type,
     user: Optional[User] = Depends(current_active_user),
-) -> Optional[DocumentReadDTO]:
-    return await DocumentService.get(id=document_id, user=user)
+) -> Response:
+    return get_json_response(
+        await DocumentService.get(id=document_id, user=user)
+    )
 
 
 @router.post(
     "/",
     status_code=status.HTTP_201_CREATED,
     summary="Добавить документ",
+    response_model=DocumentReadDTO,
 )
 async def add_document(
     data: DocumentWriteDTO, user: User = Depends(current_active_user)
-) -> Optional[DocumentReadDTO]:
+) -> Response:
     document_id = await DocumentService.add(data, user)
-    return await DocumentService.get(id=document_id, user=user)
+    return get_json_response(
+        await DocumentService.get(id=document_id, user=user),
+        status_code=status.HTTP_201_CREATED,
+    )
 
 
 @router.delete(
@@ -63,28 +120,32 @@ async def delete_document(
 @router.put(
     "/{document_id}",
     summary="Обновить документ с заданным document_id",
+    response_model=DocumentReadDTO,
 )
 async def update_document(
     document_id: document_id_type,
     data: DocumentWriteDTO,
     user: Optional[User] = Depends(current_active_user),
-) -> Optional[DocumentReadDTO]:
-    return await DocumentService.update(id=document_id, dto=data, user=user)
+) -> Response:
+    return get_json_response(
+        await DocumentService.update(id=document_id, dto=data, user=user)
+    )
 
 
 @router.get(
     "/{document_id}/download",
-    summary="Получить файл документа в формате docx или pdf.",
+    summary="Получить файл документа в формате docx, pdf или html.",
     status_code=status.HTTP_200_OK,
 )
 async def download_file(
     document_id: document_id_type,
     pdf: bool = False,
+    format: Optional[file_format_type] = None,
     user: Optional[User] = Depends(current_active_user),
 ) -> FileResponse:
     file, filename = await DocumentService.get_file(
         document_id,
         user,
-        pdf,
+        resolve_file_format(pdf, format),
     )
-    return await get_file_response(file, filename, pdf)
+    return await get_file_response(file, filename)
@@ -1,6 +1,14 @@
 from typing import Annotated, Optional
 
-from fastapi import APIRouter, Depends, Query, Response, UploadFile, status
+from fastapi import (
+    APIRouter,
+    Depends,
+    Query,
+    Response,
+    UploadFile,
+    WebSocket,
+    status,
+)
 from fastapi.responses import FileResponse, JSONResponse
 
 from app.auth import (
@@ -8,7 +16,12 @@ from app.auth import (
     current_superuser,
     current_user_or_none,
 )
-from app.common.utils import get_file_response
+from app.common.constants import FileFormat, file_format_type
+from app.common.utils import (
+    get_file_response,
+    get_json_response,
+    resolve_file_format,
+)
 from app.config import settings
 from app.logger import logger
 from app.models.user import User
@@ -19,9 +32,13 @@ from app.schemas.template import (
     TemplateWriteDTO,
 )
 from app.services.favorite import TemplateFavoriteService
+from app.services.live_preview import LivePreviewService
 from app.services.pdf_converter import PdfConverter
 from app.services.template import TemplateService
-from app.tasks.tasks import generate_template_thumbnail
+from app.tasks.tasks import (
+    generate_all_template_thumbnails,
+    generate_template_thumbnail,
+)
 
 router = APIRouter()
 
@@ -37,12 +54,37 @@ async def get_all_templates(
     return await TemplateService.get_all(user=user, favorited=favorited)
 
 
-@router.get("/{template_id}", summary="Получить шаблон с заданным template_id")
+@router.get("/search", summary="Полнотекстовый поиск шаблонов")
+async def search_templates(
+    q: Annotated[
+        str,
+        Query(
+            min_length=1,
+            max_length=200,
+            description="Строка поиска (слова совпадают по началу)",
+        ),
+    ],
+    limit: Annotated[
+        int, Query(ge=1, le=settings.SEARCH_MAX_PAGE_SIZE)
+    ] = settings.SEARCH_PAGE_SIZE,
+    offset: Annotated[int, Query(ge=0)] = 0,
+    user: Optional[User] = Depends(current_user_or_none),
+) -> list[TemplateReadMinifiedDTO]:
+    return await TemplateService.search(q, user, limit, offset)
+
+
+@router.get(
+    "/{template_id}",
+    summary="Получить шаблон с заданным template_id",
+    response_model=TemplateReadDTO,
+)
 async def get_template_by_id(
     template_id: int,
     user: Optional[User] = Depends(current_user_or_none),
-) -> Optional[TemplateReadDTO]:
-    return await TemplateService.get(id=template_id, user=user)
+) -> Response:
+    return get_json_response(
+        await TemplateService.get(id=template_id, user=user)
+    )
 
 
 # @router.put("/{template_id}", summary="Обновить шаблон")
@@ -69,13 +111,19 @@ async def upload_docx_template(
 
 
 @router.post(
-    "/", status_code=status.HTTP_201_CREATED, summary="Добавить шаблон"
+    "/",
+    status_code=status.HTTP_201_CREATED,
+    summary="Добавить шаблон",
+    response_model=TemplateReadDTO,
 )
 async def add_template(
     data: TemplateWriteDTO, user: User = Depends(current_superuser)
-) -> Optional[TemplateReadDTO]:
+) -> Response:
     template_id = await TemplateService.add(data)
-    return await TemplateService.get(id=template_id)
+    return get_json_response(
+        await TemplateService.get(id=template_id),
+        status_code=status.HTTP_201_CREATED,
+    )
 
 
 @router.delete(
@@ -103,12 +151,18 @@ async def check_consistency(
 
 @router.get(
     "/{template_id}/download_draft",
-    summary="Получить файл черновика в формате docx или pdf",
+    summary="Получить файл черновика в формате docx, pdf или html",
     status_code=status.HTTP_200_OK,
 )
-async def download_draft(template_id: int, pdf: bool = False) -> FileResponse:
-    file, filename = await TemplateService.get_draft(template_id, pdf)
-    return await get_file_response(file, filename, pdf)
+async def download_draft(
+    template_id: int,
+    pdf: bool = False,
+    format: Optional[file_format_type] = None,
+) -> FileResponse:
+    file, filename = await TemplateService.get_draft(
+        template_id, resolve_file_format(pdf, format)
+    )
+    return await get_file_response(file, filename)
 
 
 @router.get(
@@ -117,7 +171,9 @@ async def download_draft(template_id: int, pdf: bool = False) -> FileResponse:
     status_code=status.HTTP_200_OK,
 )
 async def get_thumbnail(template_id: int) -> FileResponse:
-    pdf_buffer, _ = await TemplateService.get_draft(template_id, pdf=True)
+    pdf_buffer, _ = await TemplateService.get_draft(
+        template_id, FileFormat.PDF, fallback=False
+    )
     png_buffer = PdfConverter.pdf_to_thumbnail(
         pdf_buffer,
         settings.THUMBNAIL_WIDTH,
@@ -136,22 +192,38 @@ async def generate_thumbnail(template_id: int):
     await TemplateService.generate_thumbnail(template_id)
 
 
+@router.post(
+    "/generate_thumbnails",
+    summary="Сгенерировать миниатюры всех шаблонов (фоновая задача).",
+    status_code=status.HTTP_202_ACCEPTED,
+)
+async def generate_all_thumbnails(user: User = Depends(current_superuser)):
+    generate_all_template_thumbnails.delay()
+
+
 @router.post(
     "/{template_id}/download_preview",
-    summary="Получить превью документа в формате docx или pdf",
+    summary="Получить превью документа в формате docx, pdf или html",
     status_code=status.HTTP_200_OK,
 )
 async def download_preview(
     template_id: int,
     field_values: TemplateFieldWriteValueListDTO,
     pdf: bool = False,
+    format: Optional[file_format_type] = None,
 ) -> FileResponse:
     file, filename = await TemplateService.get_preview(
         template_id,
         field_values.model_dump()["fields"],
-        pdf,
+        resolve_file_format(pdf, format),
     )
-    return await get_file_response(file, filename, pdf)
+    return await get_file_response(file, filename)
+
+
+@router.websocket("/{template_id}/live_preview")
+async def live_preview(websocket: WebSocket, template_id: int):
+    """Живой предпросмотр документа (см. LivePreviewService)."""
+    await LivePreviewService.serve(websocket, template_id)
 
 
 @router.post(
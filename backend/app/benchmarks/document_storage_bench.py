@@ -0,0 +1,157 @@
+"""Хранение значений полей документа: строки document_field и jsonb.
+
+Для каждого способа хранения (DOCUMENT_FIELDS_STORAGE) создаются
+документы шаблона с заданным числом полей и замеряются DocumentService
+add, update, get и план генерации (_get_for_render), а также объем
+значений полей документа (pg_column_size строк document_field или
+столбца field_values, без индексов). Скрипт пишет в б.д. из настроек
+(не PROD) и удаляет созданные объекты. Запуск::
+
+    python -m app.benchmarks.document_storage_bench --fields 300
+"""
+
+import argparse
+import asyncio
+import time
+import uuid
+
+import sqlalchemy
+
+from app.common.constants import DocumentFieldsStorage
+from app.config import settings
+from app.crud.base_dao import UserDAO
+from app.database import async_session_maker
+from app.models.template import Template
+from app.models.user import User
+from app.schemas.document import DocumentWriteDTO
+from app.schemas.template import TemplateWriteDTO
+from app.services.document import DocumentService
+from app.services.template import TemplateService
+
+VALUES_SIZE_SQL = """
+SELECT COALESCE(SUM(pg_column_size(f.*)), 0)
+    + (SELECT COALESCE(SUM(pg_column_size(d.field_values)), 0)
+       FROM document d WHERE d.id = ANY(:ids))
+FROM document_field f WHERE f.document_id = ANY(:ids)
+"""
+
+
+async def values_size(ids: list[int]) -> int:
+    async with async_session_maker() as session:
+        return await session.scalar(
+            sqlalchemy.text(VALUES_SIZE_SQL), {"ids": ids}
+        )
+
+
+def make_document(
+    template_id: int, field_ids: list[int], n: int
+) -> DocumentWriteDTO:
+    return DocumentWriteDTO(
+        template_id=template_id,
+        description=f"Документ {n}",
+        completed=False,
+        fields=[
+            {"field_id": id, "value": f"Значение поля {id} документа {n}"}
+            for id in field_ids
+        ],
+    )
+
+
+async def timed(coro) -> float:
+    start = time.perf_counter()
+    await coro
+    return time.perf_counter() - start
+
+
+async def bench(storage: str, template_id, field_ids, user: User, args):
+    settings.DOCUMENT_FIELDS_STORAGE = storage
+    dtos = [
+        make_document(template_id, field_ids, n) for n in range(args.documents)
+    ]
+
+    ids, add = [], 0.0
+    for dto in dtos:
+        start = time.perf_counter()
+        ids.append(await DocumentService.add(dto, user))
+        add += time.perf_counter() - start
+    size = await values_size(ids)
+
+    update = get = render = 0.0
+    for id, dto in zip(ids, dtos):
+        update += await timed(DocumentService.update(id, dto, user))
+        get += await timed(DocumentService.get(id=id, user=user))
+        render += await timed(DocumentService._get_for_render(id, user))
+    for id in ids:
+        await DocumentService.delete(id, user)
+
+    count = len(ids)
+    print(
+        f"{storage:>6}: add {add / count * 1000:7.2f} ms, "
+        f"update {update / count * 1000:7.2f} ms, "
+        f"get {get / count * 1000:7.2f} ms, "
+        f"render plan {render / count * 1000:7.2f} ms, "
+        f"size {size / count / 2**10:6.1f} KiB/document"
+    )
+
+
+async def run(args) -> None:
+    suffix = uuid.uuid4().hex[:8]
+    title = f"Хранение значений {suffix}"
+    email = f"storage_{suffix}@example.com"
+    try:
+        await bench_storages(title, email, args)
+    finally:
+        async with async_session_maker() as session:
+            await session.execute(
+                sqlalchemy.delete(Template).filter_by(title=title)
+            )
+            await session.execute(
+                sqlalchemy.delete(User).filter_by(email=email)
+            )
+            await session.commit()
+
+
+async def bench_storages(title: str, email: str, args) -> None:
+    template_id = await TemplateService.add(
+        TemplateWriteDTO(
+            title=title,
+            description="Шаблон для замеров",
+            grouped_fields=[],
+            ungrouped_fields=[
+                {
+                    "tag": f"tag{id}",
+                    "name": f"Поле {id}",
+                    "hint": "",
+                    "type": "str",
+                    "length": 100,
+                }
+                for id in range(1, args.fields + 1)
+            ],
+        )
+    )
+    user = await UserDAO.create(
+        email=email,
+        hashed_password="x",
+        name="Замеры",
+        is_active=True,
+        is_superuser=False,
+        is_verified=False,
+    )
+    template = await TemplateService.get_or_raise_not_found(template_id)
+    field_ids = sorted(field.id for field in template.fields)
+    for storage in (DocumentFieldsStorage.EAV, DocumentFieldsStorage.JSONB):
+        await bench(storage, template_id, field_ids, user, args)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--fields", type=int, default=300)
+    parser.add_argument("--documents", type=int, default=50)
+    args = parser.parse_args()
+    if settings.MODE == "PROD":
+        parser.error("замеры не выполняются на рабочей б.д.")
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
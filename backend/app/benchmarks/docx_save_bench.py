@@ -0,0 +1,80 @@
+"""Сравнение сохранения docx: DocxTemplate.save и DocxZipWriter.
+
+Шаблон с заданным количеством изображений (несжимаемый шум) создается
+во временном каталоге, либо задается параметром --docx. Запуск::
+
+    python -m app.benchmarks.docx_save_bench --images 20 --image-size 800
+"""
+
+import argparse
+import os
+import tempfile
+import time
+from io import BytesIO
+
+from docx import Document
+from docx.enum.style import WD_STYLE_TYPE
+from docx.shared import Cm
+from PIL import Image
+
+from app.config import settings
+from app.services.docx_render import DocxRender
+
+
+def make_template(path: str, images: int, image_size: int) -> None:
+    docx = Document()
+    docx.styles.add_style(DocxRender.TAG_STYLE_NAME, WD_STYLE_TYPE.CHARACTER)
+    for i in range(images):
+        docx.add_paragraph(f"Рисунок {i}: {{{{ caption_{i} }}}}")
+        image = Image.frombytes(
+            "RGB", (image_size, image_size), os.urandom(image_size**2 * 3)
+        )
+        buffer = BytesIO()
+        image.save(buffer, format="png")
+        buffer.seek(0)
+        docx.add_picture(buffer, width=Cm(5))
+    docx.save(path)
+
+
+def bench(path: str, count: int, passthrough: bool) -> tuple[float, int]:
+    settings.DOCX_ZIP_PASSTHROUGH = passthrough
+    context = {"caption_0": "значение"}
+    size = 0
+    start = time.perf_counter()
+    for _ in range(count):
+        size = len(DocxRender(path).get_document(dict(context)).getvalue())
+    return time.perf_counter() - start, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--docx", help="docx файл шаблона")
+    parser.add_argument("--images", type=int, default=20)
+    parser.add_argument("--image-size", type=int, default=800)
+    parser.add_argument("--count", type=int, default=10)
+    parser.add_argument(
+        "--compress-level", type=int, default=settings.DOCX_COMPRESS_LEVEL
+    )
+    args = parser.parse_args()
+    settings.DOCX_COMPRESS_LEVEL = args.compress_level
+
+    with tempfile.TemporaryDirectory() as scratch_dir:
+        path = args.docx
+        if not path:
+            path = os.path.join(scratch_dir, "template.docx")
+            make_template(path, args.images, args.image_size)
+        print(f"template: {os.path.getsize(path) / 2**20:.1f} MiB")
+        for name, passthrough in (
+            ("DocxTemplate.save", False),
+            ("DocxZipWriter", True),
+        ):
+            elapsed, size = bench(path, args.count, passthrough)
+            print(
+                f"{name:<18} x{args.count}: {elapsed:8.2f} s "
+                f"({elapsed / args.count * 1000:8.1f} ms/doc, "
+                f"{size / 2**20:.1f} MiB)"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Сравнение движков генерации docx: DocxRender и DocxStreamRender.
+
+Шаблон с заданным количеством абзацев и строк таблицы (в каждой строке
+тэги) создается во временном каталоге, либо задается параметром --docx.
+Запуск::
+
+    python -m app.benchmarks.docx_stream_bench --paragraphs 1000 --rows 200
+"""
+
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+
+from docx import Document
+from docx.enum.style import WD_STYLE_TYPE
+
+from app.services.docx_render import DocxRender
+from app.services.docx_stream import DocxStreamPlan, DocxStreamRender
+
+TAGS = ("name", "city", "date", "sum")
+
+
+def make_template(path: str, paragraphs: int, rows: int) -> None:
+    docx = Document()
+    docx.styles.add_style(DocxRender.TAG_STYLE_NAME, WD_STYLE_TYPE.CHARACTER)
+    for i in range(paragraphs):
+        tag = TAGS[i % len(TAGS)]
+        docx.add_paragraph(f"Пункт {i}. Значение {{{{ {tag} }}}} в тексте.")
+    table = docx.add_table(rows=rows, cols=len(TAGS))
+    for row in table.rows:
+        for cell, tag in zip(row.cells, TAGS):
+            cell.text = f"{{{{ {tag} }}}}"
+    docx.save(path)
+
+
+def bench(render_class, path: str, count: int) -> tuple[float, float]:
+    """Возвращает время генерации (сек) и пик выделенной памяти (МиБ)."""
+    context = {tag: f"значение {tag}" for tag in TAGS[1:]}
+    context_default = {tag: tag for tag in TAGS}
+    start = time.perf_counter()
+    for _ in range(count):
+        render_class(path).get_partial(dict(context), context_default)
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    render_class(path).get_partial(dict(context), context_default)
+    peak = tracemalloc.get_traced_memory()[1] / 2**20
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--docx", help="docx файл шаблона")
+    parser.add_argument("--paragraphs", type=int, default=1000)
+    parser.add_argument("--rows", type=int, default=200)
+    parser.add_argument("--count", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as scratch_dir:
+        path = args.docx
+        if not path:
+            path = os.path.join(scratch_dir, "template.docx")
+            make_template(path, args.paragraphs, args.rows)
+        start = time.perf_counter()
+        plan = DocxStreamPlan.build(path)
+        print(
+            f"compile: {time.perf_counter() - start:.2f} s, "
+            f"variants: {', '.join(plan.variants) or plan.reason}"
+        )
+        for name, render_class in (
+            ("DocxRender", DocxRender),
+            ("DocxStreamRender", DocxStreamRender),
+        ):
+            elapsed, peak = bench(render_class, path, args.count)
+            print(
+                f"{name:<17} x{args.count}: {elapsed:8.2f} s "
+                f"({elapsed / args.count * 1000:8.1f} ms/doc, "
+                f"peak {peak:.1f} MiB)"
+            )
+
+
+if __name__ == "__main__":
+    main()
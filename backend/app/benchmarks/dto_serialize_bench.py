@@ -0,0 +1,150 @@
+"""Формирование json ответа для шаблона с 300 полями.
+
+Сравнивается прежний путь (to_dict моделей, TemplateReadDTO.model_validate,
+повторная валидация по модели ответа и jsonable_encoder в FastAPI) и
+новый: словари только из значений схемы, одна валидация и сериализация
+в pydantic-core (TemplateService.get + get_json_response). Запуск::
+
+    python -m app.benchmarks.dto_serialize_bench --fields 300
+"""
+
+import argparse
+import asyncio
+import time
+from datetime import datetime
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+from app.common.utils import get_json_response
+from app.models.template import (
+    Template,
+    TemplateField,
+    TemplateFieldGroup,
+    TemplateFieldType,
+)
+from app.models.user import User  # noqa: F401 (настройка связей моделей)
+from app.schemas.template import TemplateReadDTO
+from app.services.template import TemplateService
+
+GROUP_SIZE = 10
+
+
+def make_template(count: int) -> Template:
+    now = datetime.utcnow()
+    field_type = TemplateFieldType(
+        id=1, type="str", name="Строка", mask="/^.*$/", kind="scalar"
+    )
+    groups = [
+        TemplateFieldGroup(id=id, template_id=1, name=f"Группа {id}")
+        for id in range(1, count // GROUP_SIZE // 2 + 1)
+    ]
+    fields = [
+        TemplateField(
+            id=id,
+            tag=f"tag{id}",
+            name=f"Поле {id}",
+            hint=f"Подсказка {id}",
+            default="",
+            length=100,
+            template_id=1,
+            group_id=(id - 1) // GROUP_SIZE + 1,
+            type_id=field_type.id,
+            type=field_type,
+        )
+        for id in range(1, count + 1)
+    ]
+    for field in fields:
+        if field.group_id > len(groups):
+            field.group_id = None
+    return Template(
+        id=1,
+        title="Шаблон",
+        description="Описание",
+        deleted=False,
+        created_at=now,
+        updated_at=now,
+        render_engine="docxtpl",
+        groups=groups,
+        fields=fields,
+    )
+
+
+def legacy_dto(obj: Template) -> TemplateReadDTO:
+    groups_dicts = {group.id: group.to_dict() for group in obj.groups}
+    ungrouped_fields = []
+    for field in obj.fields:
+        field_dict = field.to_dict()
+        field_dict["type"] = field.type.type
+        field_dict["mask"] = field.type.mask
+        field_dict["kind"] = field.type.kind
+        group_dict = groups_dicts.get(field.group_id)
+        if group_dict:
+            group_dict.setdefault("fields", []).append(field_dict)
+        else:
+            ungrouped_fields.append(field_dict)
+    obj_dict = obj.to_dict()
+    obj_dict["grouped_fields"] = groups_dicts.values()
+    obj_dict["ungrouped_fields"] = ungrouped_fields
+    return TemplateReadDTO.model_validate(obj_dict)
+
+
+async def legacy_response(obj: Template, response_field) -> bytes:
+    content = await serialize_response(
+        field=response_field, response_content=legacy_dto(obj)
+    )
+    return JSONResponse(content).body
+
+
+async def fast_response(obj: Template, response_field) -> bytes:
+    grouped_fields, ungrouped_fields = TemplateService.fields_as_dicts(
+        obj, TemplateService.field_as_dict
+    )
+    dto = TemplateReadDTO.model_validate(
+        {
+            "id": obj.id,
+            "title": obj.title,
+            "description": obj.description,
+            "created_at": obj.created_at,
+            "updated_at": obj.updated_at,
+            "deleted": obj.deleted,
+            "thumbnail": obj.thumbnail,
+            "render_engine": obj.render_engine,
+            "grouped_fields": grouped_fields,
+            "ungrouped_fields": ungrouped_fields,
+        }
+    )
+    return get_json_response(dto).body
+
+
+async def bench(func, obj: Template, response_field, count: int):
+    body = b""
+    start = time.perf_counter()
+    for _ in range(count):
+        body = await func(obj, response_field)
+    return (time.perf_counter() - start) / count, len(body)
+
+
+async def run(args) -> None:
+    obj = make_template(args.fields)
+    response_field = create_response_field(
+        name="response", type_=TemplateReadDTO
+    )
+    for name, func in (("legacy", legacy_response), ("fast", fast_response)):
+        elapsed, size = await bench(func, obj, response_field, args.count)
+        print(
+            f"{name:>6}: {elapsed * 1000:7.2f} ms/response "
+            f"({size / 2**10:6.1f} KiB)"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--fields", type=int, default=300)
+    parser.add_argument("--count", type=int, default=200)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""Проверка значений документа из 500 полей по маскам типов полей.
+
+Сравнивается проверка с кэшем скомпилированных масок
+(FieldMaskValidator) и компиляция маски при каждой проверке. Запуск::
+
+    python -m app.benchmarks.mask_validation_bench --fields 500
+"""
+
+import argparse
+import re
+import time
+
+from app.models.template import TemplateField, TemplateFieldType
+from app.models.user import User  # noqa: F401 (настройка связей моделей)
+from app.services.field_validator import FieldMaskValidator
+
+MASKS = (
+    ("str", "/^.*$/", "Произвольная строка"),
+    ("int", "/^\\d*$/", "12345"),
+    ("float", "/^\\d+(?:\\.|,)?\\d*$/", "123,45"),
+    ("date", "/^\\d{2}\\.\\d{2}\\.\\d{4}$/", "31.12.2023"),
+    ("email", "/^[\\w.+-]+@[\\w-]+\\.[\\w.]+$/i", "User@Example.com"),
+)
+
+
+def make_document(count: int) -> tuple[dict, list[dict]]:
+    types = [
+        TemplateFieldType(
+            id=id, type=type, name=type, mask=mask, kind="scalar"
+        )
+        for id, (type, mask, _) in enumerate(MASKS, start=1)
+    ]
+    fields, values = {}, []
+    for id in range(1, count + 1):
+        field_type = types[id % len(types)]
+        fields[id] = TemplateField(
+            id=id,
+            tag=f"tag{id}",
+            name=f"Поле {id}",
+            type_id=field_type.id,
+            type=field_type,
+        )
+        values.append({"field_id": id, "value": MASKS[id % len(MASKS)][2]})
+    return fields, values
+
+
+def validate_uncached(fields: dict, values: list[dict]) -> list:
+    errors = []
+    for field_value in values:
+        field = fields[field_value["field_id"]]
+        re.purge()  # как при числе масок больше размера кэша re
+        pattern = FieldMaskValidator.compile(field.type.mask)
+        if not pattern.search(field_value["value"]):
+            errors.append(field.id)
+    return errors
+
+
+def bench(func, fields: dict, values: list[dict], count: int) -> float:
+    start = time.perf_counter()
+    for _ in range(count):
+        assert not func(fields, values)
+    return (time.perf_counter() - start) / count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--fields", type=int, default=500)
+    parser.add_argument("--count", type=int, default=200)
+    args = parser.parse_args()
+
+    fields, values = make_document(args.fields)
+    for name, func in (
+        ("cached", FieldMaskValidator.validate),
+        ("compile", validate_uncached),
+    ):
+        elapsed = bench(func, fields, values, args.count)
+        print(
+            f"{name:>8}: {elapsed * 1000:7.2f} ms/doc "
+            f"({elapsed / args.fields * 1e6:6.2f} us/field)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""Сравнение пакетной и поштучной конвертации docx в pdf.
+
+Запуск (требуется libreoffice)::
+
+    python -m app.benchmarks.pdf_convert_bench --docx ../data/otpusk_tpl.docx
+"""
+
+import argparse
+import time
+from io import BytesIO
+
+from app.services.pdf_converter import PdfConverter
+
+
+def bench_single(content: bytes, count: int) -> float:
+    start = time.perf_counter()
+    for _ in range(count):
+        PdfConverter.docx_to_pdf(BytesIO(content))
+    return time.perf_counter() - start
+
+
+def bench_many(content: bytes, count: int, chunk_size: int) -> float:
+    start = time.perf_counter()
+    in_files = (BytesIO(content) for _ in range(count))
+    for _ in PdfConverter.docx_to_pdf_many(in_files, chunk_size=chunk_size):
+        pass
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--docx", required=True, help="docx файл")
+    parser.add_argument("--count", type=int, default=20)
+    parser.add_argument("--chunk", type=int, nargs="+", default=[5, 10, 20])
+    args = parser.parse_args()
+    with open(args.docx, "rb") as file:
+        content = file.read()
+
+    elapsed = bench_single(content, args.count)
+    print(
+        f"docx_to_pdf        x{args.count}: {elapsed:8.2f} s "
+        f"({args.count / elapsed:6.2f} files/s)"
+    )
+    for chunk_size in args.chunk:
+        elapsed = bench_many(content, args.count, chunk_size)
+        print(
+            f"docx_to_pdf_many/{chunk_size:<3} x{args.count}: "
+            f"{elapsed:8.2f} s ({args.count / elapsed:6.2f} files/s)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+"""Полнотекстовый поиск документов (search_vector и gin индекс).
+
+В б.д. создаются документы (по умолчанию 1 млн) со значениями полей в
+field_values и описаниями из случайных слов словаря, векторы поиска
+рассчитываются DocumentDAO.update_search_vector. Замеряется время
+DocumentDAO.search (первая страница) по документам пользователя и по
+всем документам для частого слова, префикса слова и редкого слова
+(номер документа), для сравнения - поиск по описанию через ILIKE (без
+индекса и ранжирования: первые совпадения по id). Б.д. должна разбирать
+кириллицу на слова (кодировка UTF8 и LC_CTYPE не C). Скрипт пишет в б.д. из настроек (не PROD) и удаляет
+созданные объекты. Запуск::
+
+    python -m app.benchmarks.search_bench --documents 1000000
+"""
+
+import argparse
+import asyncio
+import random
+import statistics
+import time
+import uuid
+
+import sqlalchemy
+
+from app.common.utils import prefix_tsquery
+from app.config import settings
+from app.crud.document_dao import DocumentDAO
+from app.database import async_session_maker, engine
+from app.models.document import Document
+from app.models.template import Template
+from app.models.user import User
+
+WORDS = (
+    "договор поставка аренда оплата счет акт услуга работа заказчик"
+    " исполнитель покупатель продавец товар склад доставка адрес банк"
+    " реквизиты паспорт гражданин компания директор бухгалтер приказ"
+    " сотрудник отпуск командировка доверенность претензия гарантия"
+    " возврат кредит залог страхование имущество квартира помещение"
+    " земельный участок автомобиль ремонт проект смета график этап"
+    " приемка качество штраф неустойка расторжение продление срок"
+).split()
+FIELDS = 10  # полей в шаблоне
+UPDATE_BATCH = 10000  # документов в одном update_search_vector
+
+SEED_SQL = (
+    # пользователи могут быть добавлены с явными id (тестовая б.д.)
+    """
+    SELECT SETVAL('user_id_seq', (SELECT MAX(id) FROM "user"))
+    """,
+    """
+    INSERT INTO "user" (email, hashed_password, is_active, is_superuser,
+        is_verified, name)
+    SELECT :prefix || n || '@example.com', 'x', true, false, false,
+        'Поиск ' || n
+    FROM generate_series(1, :users) n
+    """,
+    # подзапросы со случайными словами зависят от n, чтобы выполняться
+    # для каждого документа
+    """
+    WITH words AS (SELECT CAST(:words AS text[]) AS w)
+    INSERT INTO document (description, template_id, owner_id, completed,
+        field_values, created_at, updated_at)
+    SELECT
+        (SELECT string_agg(word, ' ') FROM (
+            SELECT w[1 + floor(random() * cardinality(w))::int] AS word
+            FROM generate_series(1, 3) WHERE n >= 0) description_words)
+            || ' № ' || n,
+        :template_id, u.id, false,
+        (SELECT jsonb_object_agg(f, jsonb_build_object('value',
+            w[1 + floor(random() * cardinality(w))::int] || ' '
+            || w[1 + floor(random() * cardinality(w))::int]))
+         FROM generate_series(1, :fields) f WHERE n >= 0),
+        now(), now()
+    FROM generate_series(0, :documents - 1) n
+    CROSS JOIN words
+    JOIN (
+        SELECT id, row_number() OVER (ORDER BY id) - 1 AS i FROM "user"
+        WHERE email LIKE :prefix || '%'
+    ) u ON u.i = n % :users
+    """,
+)
+
+
+async def seed(template_id: int, email_prefix: str, args) -> list[int]:
+    """Создает пользователей и документы, возвращает id пользователей."""
+    params = {
+        "prefix": email_prefix,
+        "users": args.users,
+        "documents": args.documents,
+        "template_id": template_id,
+        "fields": FIELDS,
+        "words": WORDS,
+    }
+    async with async_session_maker() as session:
+        for statement in SEED_SQL:
+            await session.execute(sqlalchemy.text(statement), params)
+        await session.commit()
+        user_ids = await session.scalars(
+            sqlalchemy.select(User.id).where(
+                User.email.startswith(email_prefix)
+            )
+        )
+        document_ids = await session.scalars(
+            sqlalchemy.select(Document.id)
+            .filter_by(template_id=template_id)
+            .order_by(Document.id)
+        )
+        user_ids, document_ids = user_ids.all(), document_ids.all()
+
+    start = time.perf_counter()
+    for i in range(0, len(document_ids), UPDATE_BATCH):
+        await DocumentDAO.update_search_vector(
+            *document_ids[i : i + UPDATE_BATCH]
+        )
+    print(
+        f"update_search_vector: {len(document_ids)} документов за "
+        f"{time.perf_counter() - start:.1f} s"
+    )
+    async with engine.connect() as conn:
+        await conn.execution_options(isolation_level="AUTOCOMMIT")
+        await conn.exec_driver_sql("VACUUM ANALYZE document")
+    return user_ids
+
+
+async def measure(name: str, calls, queries: int) -> None:
+    timings, rows = [], 0
+    for _ in range(queries):
+        start = time.perf_counter()
+        rows += len(await calls())
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    print(
+        f"{name:>28}: avg {statistics.mean(timings) * 1000:8.2f} ms, "
+        f"p95 {timings[int(len(timings) * 0.95)] * 1000:8.2f} ms, "
+        f"{rows / queries:5.1f} результатов"
+    )
+
+
+async def ilike_search(text: str, **filter_by) -> list[Document]:
+    async with async_session_maker() as session:
+        result = await session.scalars(
+            sqlalchemy.select(Document.id)
+            .filter_by(**filter_by)
+            .where(Document.description.ilike(f"%{text}%"))
+            .order_by(Document.id.desc())
+            .limit(settings.SEARCH_PAGE_SIZE)
+        )
+        return result.all()
+
+
+async def bench(user_ids: list[int], args) -> None:
+    def search(make_text, **filter_by):
+        async def call():
+            query = prefix_tsquery(make_text(), settings.SEARCH_MAX_TERMS)
+            return await DocumentDAO.search(
+                query, settings.SEARCH_PAGE_SIZE, 0, **filter_by
+            )
+
+        return call
+
+    def owner() -> dict[str, int]:
+        return {"owner_id": random.choice(user_ids)}
+
+    cases = {
+        "частое слово": lambda: random.choice(WORDS),
+        "префикс слова": lambda: random.choice(WORDS)[:4],
+        "два слова": lambda: " ".join(random.sample(WORDS, 2)),
+        "номер документа": lambda: str(random.randrange(args.documents)),
+    }
+    for name, make_text in cases.items():
+        await measure(
+            f"{name}, пользователь",
+            lambda: search(make_text, **owner())(),
+            args.queries,
+        )
+        await measure(f"{name}, все", search(make_text), args.queries)
+    await measure(
+        "ILIKE без ранжирования, польз.",
+        lambda: ilike_search(random.choice(WORDS), **owner()),
+        args.queries,
+    )
+    await measure(
+        "ILIKE без ранжирования, все",
+        lambda: ilike_search(random.choice(WORDS)),
+        max(1, args.queries // 10),
+    )
+
+
+async def run(args) -> None:
+    suffix = uuid.uuid4().hex[:8]
+    title = f"Поиск {suffix}"
+    email_prefix = f"search_{suffix}_"
+    try:
+        async with async_session_maker() as session:
+            template = Template(title=title, description="Шаблон для замеров")
+            session.add(template)
+            await session.commit()
+            template_id = template.id
+        user_ids = await seed(template_id, email_prefix, args)
+        await bench(user_ids, args)
+    finally:
+        async with async_session_maker() as session:
+            await session.execute(
+                sqlalchemy.delete(Template).filter_by(title=title)
+            )
+            await session.execute(
+                sqlalchemy.delete(User).where(
+                    User.email.startswith(email_prefix)
+                )
+            )
+            await session.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--documents", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--queries", type=int, default=50)
+    args = parser.parse_args()
+    if settings.MODE == "PROD":
+        parser.error("замеры не выполняются на рабочей б.д.")
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""Генерация табличного поля со 100/1000/10000 строками.
+
+Строка таблицы с выражениями {{ goods.<столбец> }} размножается по
+элементам поля; время на строку должно оставаться постоянным. Запуск::
+
+    python -m app.benchmarks.table_rows_bench --rows 100 1000 10000
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+from docx import Document
+from docx.enum.style import WD_STYLE_TYPE
+
+from app.services.docx_render import DocxRender, TableRow
+
+COLUMNS = ("number", "name", "amount", "price")
+
+
+def make_template(path: str) -> None:
+    docx = Document()
+    docx.styles.add_style(DocxRender.TAG_STYLE_NAME, WD_STYLE_TYPE.CHARACTER)
+    docx.add_paragraph("Спецификация ({{ goods|length }} позиций)")
+    table = docx.add_table(rows=2, cols=len(COLUMNS))
+    for column, name in enumerate(COLUMNS):
+        table.cell(0, column).text = name
+        table.cell(1, column).text = f"{{{{ goods.{name} }}}}"
+    docx.save(path)
+
+
+def bench(path: str, rows: int, count: int) -> tuple[float, int]:
+    goods = [
+        TableRow(number=str(i), name=f"Товар {i}", amount="1", price="9.99")
+        for i in range(rows)
+    ]
+    size = 0
+    start = time.perf_counter()
+    for _ in range(count):
+        size = len(DocxRender(path).get_document({"goods": goods}).getvalue())
+    return (time.perf_counter() - start) / count, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--rows", type=int, nargs="+", default=[100, 1000, 10000]
+    )
+    parser.add_argument("--count", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as scratch_dir:
+        path = os.path.join(scratch_dir, "template.docx")
+        make_template(path)
+        for rows in args.rows:
+            elapsed, size = bench(path, rows, args.count)
+            print(
+                f"{rows:>6} rows: {elapsed * 1000:9.1f} ms/doc "
+                f"({elapsed / rows * 1e6:7.1f} us/row, "
+                f"{size / 2**10:8.1f} KiB)"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Generic, Hashable, Optional, Tuple, TypeVar
+
+from app.common.metrics import CACHE_REQUESTS
+
+T = TypeVar("T")
+
+
+class TTLCache(Generic[T]):
+    """Ограниченный по размеру кэш в памяти процесса с временем жизни.
+
+    При переполнении вытесняются давно не использованные записи (LRU).
+    Записи старше ttl секунд считаются отсутствующими (ttl=None - без
+    ограничения времени жизни, для ключей с версией данных).
+    Потокобезопасен.
+    """
+
+    def __init__(self, name: str, maxsize: int, ttl: Optional[float]):
+        self._name = name
+        self._maxsize = maxsize
+        self._ttl = ttl
+        self._lock = threading.Lock()
+        self._data: OrderedDict[Hashable, Tuple[float, T]] = OrderedDict()
+
+    def get(self, key: Hashable, default: Any = None) -> Optional[T]:
+        """Возвращает значение по ключу или default."""
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None:
+                expires_at, value = item
+                if expires_at > time.monotonic():
+                    self._data.move_to_end(key)
+                    CACHE_REQUESTS.labels(self._name, "hit").inc()
+                    return value
+                del self._data[key]
+        CACHE_REQUESTS.labels(self._name, "miss").inc()
+        return default
+
+    def set(self, key: Hashable, value: T) -> None:
+        """Сохраняет значение по ключу."""
+        if self._maxsize <= 0:
+            return
+        with self._lock:
+            expires_at = (
+                math.inf if self._ttl is None else time.monotonic() + self._ttl
+            )
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self._maxsize:
+                self._data.popitem(last=False)
+
+    def set_ttl(self, ttl: Optional[float]) -> None:
+        """Изменяет время жизни записей.
+
+        Новое значение применяется к добавляемым записям, срок жизни
+        имеющихся записей сокращается до ttl от текущего момента.
+        """
+        with self._lock:
+            self._ttl = ttl
+            if ttl is None:
+                return
+            expires_at = time.monotonic() + ttl
+            for key, (item_expires_at, value) in list(self._data.items()):
+                if item_expires_at > expires_at:
+                    self._data[key] = (expires_at, value)
+
+    def pop(self, key: Hashable) -> None:
+        """Удаляет значение по ключу (если есть)."""
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        """Очищает кэш."""
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
@@ -0,0 +1,95 @@
+import threading
+import time
+from typing import Final, Optional
+
+from app.common.metrics import CIRCUIT_BREAKER_STATE
+from app.logger import logger
+
+
+class CircuitState:
+    """Состояния предохранителя."""
+
+    CLOSED: Final[int] = 0  # вызовы разрешены
+    HALF_OPEN: Final[int] = 1  # разрешен один пробный вызов
+    OPEN: Final[int] = 2  # вызовы запрещены
+
+
+class CircuitBreaker:
+    """Предохранитель (circuit breaker) для нестабильного ресурса.
+
+    После failure_threshold ошибок подряд предохранитель размыкается и
+    в течение reset_timeout секунд все вызовы отклоняются сразу. Затем
+    разрешается один пробный вызов: при успехе предохранитель замыкается,
+    при ошибке снова размыкается. Потокобезопасен.
+    """
+
+    def __init__(
+        self, name: str, failure_threshold: int, reset_timeout: float
+    ):
+        self._name = name
+        self._failure_threshold = failure_threshold
+        self._reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial_in_progress = False
+        self._set_state(CircuitState.CLOSED)
+
+    def _set_state(self, state: int) -> None:
+        self._state = state
+        CIRCUIT_BREAKER_STATE.labels(self._name).set(state)
+
+    @property
+    def state(self) -> int:
+        return self._state
+
+    def allow(self) -> bool:
+        """Проверяет, разрешен ли вызов ресурса.
+
+        Returns:
+            bool: True, если вызов разрешен (в состоянии half-open
+            разрешается только один пробный вызов).
+        """
+        with self._lock:
+            if self._state == CircuitState.CLOSED:
+                return True
+            if self._state == CircuitState.OPEN:
+                if time.monotonic() - self._opened_at < self._reset_timeout:
+                    return False
+                self._set_state(CircuitState.HALF_OPEN)
+                self._trial_in_progress = False
+            if self._trial_in_progress:
+                return False
+            self._trial_in_progress = True
+            return True
+
+    def record_success(self) -> None:
+        """Регистрирует успешный вызов ресурса."""
+        with self._lock:
+            self._failures = 0
+            self._trial_in_progress = False
+            if self._state != CircuitState.CLOSED:
+                logger.info(f"circuit breaker {self._name}: closed")
+                self._set_state(CircuitState.CLOSED)
+
+    def record_failure(self) -> None:
+        """Регистрирует ошибку вызова ресурса."""
+        with self._lock:
+            self._failures += 1
+            self._trial_in_progress = False
+            if (
+                self._state == CircuitState.HALF_OPEN
+                or self._failures >= self._failure_threshold
+            ):
+                if self._state != CircuitState.OPEN:
+                    logger.warning(f"circuit breaker {self._name}: open")
+                self._opened_at = time.monotonic()
+                self._set_state(CircuitState.OPEN)
+
+    def reset(self) -> None:
+        """Принудительно замыкает предохранитель."""
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_progress = False
+            self._set_state(CircuitState.CLOSED)
@@ -1,4 +1,60 @@
-from typing import Final
+from typing import Final, Literal, TypeAlias
+
+
+class FileFormat:
+    """Форматы генерируемых файлов."""
+
+    DOCX: Final[str] = "docx"
+    PDF: Final[str] = "pdf"
+    HTML: Final[str] = "html"  # быстрый предпросмотр без libreoffice
+
+
+file_format_type: TypeAlias = Literal["docx", "pdf", "html"]
+
+
+class RenderEngine:
+    """Движки генерации docx документов."""
+
+    DOCXTPL: Final[str] = "docxtpl"  # python-docx и jinja по всему xml
+    STREAM: Final[str] = "stream"  # сборка из скомпилированных фрагментов
+
+
+render_engine_type: TypeAlias = Literal["docxtpl", "stream"]
+
+
+class FieldKind:
+    """Виды значений полей шаблона."""
+
+    SCALAR: Final[str] = "scalar"  # одно значение
+    LIST: Final[str] = "list"  # список значений: абзац/строка на элемент
+    TABLE: Final[str] = "table"  # строки таблицы вида {столбец: значение}
+
+
+field_kind_type: TypeAlias = Literal["scalar", "list", "table"]
+
+
+class DocumentFieldsStorage:
+    """Способы хранения значений полей документа."""
+
+    EAV: Final[str] = "eav"  # строка document_field на каждое поле
+    JSONB: Final[str] = "jsonb"  # один столбец document.field_values
+
+
+document_fields_storage_type: TypeAlias = Literal["eav", "jsonb"]
+
+
+class InvalidationEventType:
+    """Типы событий сброса кэшей в памяти процессов."""
+
+    TEMPLATE: Final[str] = "template"  # шаблон создан, изменен или удален
+    FIELD_TYPE: Final[str] = "field_type"  # тип поля изменен или удален
+
+
+invalidation_event_type: TypeAlias = Literal["template", "field_type"]
+
+# конфигурация полнотекстового поиска Postgres (столбцы search_vector);
+# после изменения векторы нужно пересчитать
+SEARCH_CONFIG: Final[str] = "russian"
 
 
 class Messages:
@@ -37,6 +93,12 @@ class Messages:
 
     RENDER_ERROR: Final = "Непредвиденная ошибка при генерации документа"
     PDF_CONVERT_ERROR: Final = "Непредвиденная ошибка при генерации pdf"
+    LIVE_PREVIEW_LIMIT_EXCEEDED: Final = (
+        "Превышены ограничения соединения предпросмотра"
+    )
+    PDF_CONVERTER_UNAVAILABLE: Final = (
+        "Генерация pdf временно недоступна, повторите запрос позже"
+    )
 
     FAVORITE_TEMPLATE_ALREADY_EXISTS: Final = (
         "Шаблон уже содержится в избранном"
@@ -46,3 +108,8 @@ class Messages:
     DOCUMENT_WRONG_FIELDS: Final = (
         "Ошибка: поля {fields} не принадлежат шаблону {tpl}"
     )
+    DOCUMENT_MERGE_EMPTY: Final = "Не заданы документы для объединения"
+    FIELD_VALUES_INVALID: Final = "Значения полей не соответствуют маскам"
+    FIELD_VALUE_MISMATCH: Final = (
+        "Значение '{value}' не соответствует типу поля '{type}'"
+    )
@@ -62,6 +62,13 @@ class TemplatePdfConvertErrorException(TemplateException):
     detail = Messages.PDF_CONVERT_ERROR
 
 
+class PdfConverterUnavailableException(TemplatePdfConvertErrorException):
+    """Конвертер в pdf временно отключен после серии ошибок."""
+
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    detail = Messages.PDF_CONVERTER_UNAVAILABLE
+
+
 class UserTemplateFavoriteAlreadyExistsException(TemplateException):
     """Шаблон уже добавлен в избранное."""
 
@@ -105,3 +112,10 @@ class DocumentConflictException(DocumentException):
 
     status_code = status.HTTP_409_CONFLICT
     detail = Messages.DOCUMENT_CONFLICT
+
+
+class DocumentFieldValidationException(DocumentException):
+    """Значения полей не соответствуют маскам типов полей."""
+
+    status_code = status.HTTP_422_UNPROCESSABLE_ENTITY
+    detail = Messages.FIELD_VALUES_INVALID
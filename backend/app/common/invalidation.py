@@ -0,0 +1,203 @@
+import asyncio
+import json
+import uuid
+from collections import defaultdict
+from typing import Callable, Dict, List, Optional, Tuple
+
+import asyncpg
+import sqlalchemy
+
+from app.common.cache import TTLCache
+from app.common.metrics import (
+    CACHE_INVALIDATION_EVENTS,
+    CACHE_INVALIDATION_LISTENER,
+)
+from app.config import settings
+from app.database import engine
+from app.logger import logger
+
+
+class InvalidationEvent:
+    """Событие сброса кэшей.
+
+    Attributes:
+        type: тип события (InvalidationEventType).
+        id: идентификатор измененного объекта (None - все объекты типа).
+        source: процесс, в котором произошло изменение.
+    """
+
+    def __init__(
+        self, type: str, id: Optional[int] = None, source: Optional[str] = None
+    ):
+        self.type = type
+        self.id = id
+        self.source = source
+
+    def dumps(self) -> str:
+        """Сообщение NOTIFY (до 8000 байт)."""
+        return json.dumps(
+            {"type": self.type, "id": self.id, "source": self.source}
+        )
+
+    @classmethod
+    def loads(cls, payload: str) -> "InvalidationEvent":
+        data = json.loads(payload)
+        return cls(data["type"], data.get("id"), data.get("source"))
+
+    def __repr__(self):
+        return f"InvalidationEvent({self.type!r}, {self.id!r})"
+
+
+InvalidationHandler = Callable[[InvalidationEvent], None]
+
+
+class InvalidationBus:
+    """Сброс кэшей в памяти всех процессов приложения через Postgres
+    LISTEN/NOTIFY.
+
+    publish применяет событие в текущем процессе и отправляет NOTIFY;
+    listen (задача, запущенная в lifespan приложения) получает события
+    других процессов и вызывает подписанные обработчики. Пока слушатель
+    не подключен (разрыв соединения, воркеры celery, скрипты), события
+    других процессов могут быть пропущены: записи зарегистрированных
+    кэшей живут не дольше fallback_ttl, а после подключения кэши
+    очищаются.
+    """
+
+    def __init__(
+        self,
+        channel: str = settings.CACHE_INVALIDATION_CHANNEL,
+        fallback_ttl: float = settings.CACHE_INVALIDATION_FALLBACK_TTL,
+        reconnect_delay: float = settings.CACHE_INVALIDATION_RECONNECT_DELAY,
+        keepalive: float = settings.CACHE_INVALIDATION_KEEPALIVE,
+    ):
+        self.channel = channel
+        self.source = uuid.uuid4().hex
+        self.connected = False
+        # увеличивается при каждом событии: значение, прочитанное из б.д.
+        # до события, не должно попасть в кэш после него
+        self.generation = 0
+        self._fallback_ttl = fallback_ttl
+        self._reconnect_delay = reconnect_delay
+        self._keepalive = keepalive
+        self._handlers: Dict[str, List[InvalidationHandler]] = defaultdict(
+            list
+        )
+        self._caches: List[Tuple[TTLCache, Optional[float]]] = []
+
+    def subscribe(self, type: str, handler: InvalidationHandler) -> None:
+        """Подписывает обработчик на события типа type."""
+        self._handlers[type].append(handler)
+
+    def add_cache(self, cache: TTLCache, ttl: Optional[float]) -> None:
+        """Регистрирует кэш, сбрасываемый событиями шины.
+
+        Args:
+            cache: кэш в памяти процесса.
+            ttl: время жизни записей при подключенном слушателе.
+        """
+        self._caches.append((cache, ttl))
+        if not self.connected:
+            cache.set_ttl(self._disconnected_ttl(ttl))
+
+    def _disconnected_ttl(self, ttl: Optional[float]) -> float:
+        if ttl is None:
+            return self._fallback_ttl
+        return min(ttl, self._fallback_ttl)
+
+    def _set_connected(self, connected: bool) -> None:
+        if connected == self.connected:
+            return
+        self.connected = connected
+        CACHE_INVALIDATION_LISTENER.set(int(connected))
+        self.generation += 1
+        for cache, ttl in self._caches:
+            if connected:
+                # события, отправленные до подключения, могли быть пропущены
+                cache.clear()
+                cache.set_ttl(ttl)
+            else:
+                cache.set_ttl(self._disconnected_ttl(ttl))
+
+    def dispatch(self, event: InvalidationEvent) -> None:
+        """Вызывает обработчики события в текущем процессе."""
+        self.generation += 1
+        origin = "local" if event.source == self.source else "remote"
+        CACHE_INVALIDATION_EVENTS.labels(event.type, origin).inc()
+        for handler in self._handlers.get(event.type, ()):
+            try:
+                handler(event)
+            except Exception as e:
+                logger.exception(e)
+
+    async def publish(self, type: str, id: Optional[int] = None) -> None:
+        """Сбрасывает кэши по событию во всех процессах.
+
+        Ошибка отправки NOTIFY не прерывает изменение: другие процессы
+        получат актуальные данные по истечении времени жизни записей
+        (после переподключения их слушателей).
+
+        Args:
+            type: тип события (InvalidationEventType).
+            id: идентификатор измененного объекта.
+        """
+        event = InvalidationEvent(type, id, self.source)
+        self.dispatch(event)
+        try:
+            async with engine.begin() as conn:
+                await conn.execute(
+                    sqlalchemy.select(
+                        sqlalchemy.func.pg_notify(self.channel, event.dumps())
+                    )
+                )
+        except Exception as e:
+            logger.warning(f"Не отправлено событие сброса кэшей {event}: {e}")
+
+    def _on_notify(self, connection, pid: int, channel: str, payload: str):
+        try:
+            event = InvalidationEvent.loads(payload)
+        except (ValueError, KeyError, TypeError) as e:
+            logger.warning(f"Некорректное событие сброса кэшей {payload}: {e}")
+            return
+        if event.source != self.source:  # свои события уже применены
+            self.dispatch(event)
+
+    async def _connect(self) -> asyncpg.Connection:
+        url = engine.url.set(drivername="postgresql")
+        return await asyncpg.connect(url.render_as_string(hide_password=False))
+
+    async def listen(self) -> None:
+        """Получает события других процессов до отмены задачи.
+
+        Слушатель использует отдельное соединение (не из пула) и
+        проверяет его каждые keepalive секунд. После разрыва соединения
+        подключается повторно через reconnect_delay секунд.
+        """
+        while True:
+            connection = None
+            try:
+                connection = await self._connect()
+                closed = asyncio.Event()
+                connection.add_termination_listener(lambda _: closed.set())
+                await connection.add_listener(self.channel, self._on_notify)
+                self._set_connected(True)
+                logger.info(
+                    f"Слушатель сброса кэшей подключен: {self.channel}"
+                )
+                while not closed.is_set():
+                    try:
+                        await asyncio.wait_for(closed.wait(), self._keepalive)
+                    except asyncio.TimeoutError:
+                        await connection.execute("SELECT 1")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Слушатель сброса кэшей отключен: {e}")
+            finally:
+                self._set_connected(False)
+                if connection is not None and not connection.is_closed():
+                    connection.terminate()
+            await asyncio.sleep(self._reconnect_delay)
+
+
+invalidation_bus = InvalidationBus()
@@ -0,0 +1,55 @@
+from prometheus_client import Counter, Gauge, Histogram
+
+SINGLE_FLIGHT_CALLS = Counter(
+    "templdoc_single_flight_calls_total",
+    "Вызовы single-flight: leader - вычисление выполнено этим вызовом, "
+    "coalesced - результат получен от уже выполняющегося вычисления, "
+    "remote - результат получен от другого воркера через redis.",
+    ["flight", "role"],
+)
+
+CIRCUIT_BREAKER_STATE = Gauge(
+    "templdoc_circuit_breaker_state",
+    "Состояние предохранителя: 0 - замкнут, 1 - пробный вызов, 2 - разомкнут.",
+    ["breaker"],
+)
+
+PDF_CONVERSION_SECONDS = Histogram(
+    "templdoc_pdf_conversion_seconds",
+    "Длительность запуска libreoffice (успешные конвертации).",
+    ["mode"],
+    buckets=(0.5, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89),
+)
+
+PDF_CONVERSION_FAILURES = Counter(
+    "templdoc_pdf_conversion_failures_total",
+    "Ошибки конвертации в pdf: timeout - превышено время, error - ошибка "
+    "libreoffice, circuit_open - отказ без запуска (предохранитель).",
+    ["reason"],
+)
+
+CACHE_REQUESTS = Counter(
+    "templdoc_cache_requests_total",
+    "Обращения к кэшам в памяти процесса: hit - найдено, miss - нет.",
+    ["cache", "result"],
+)
+
+CACHE_INVALIDATION_EVENTS = Counter(
+    "templdoc_cache_invalidation_events_total",
+    "События сброса кэшей: local - изменение в этом процессе, remote - "
+    "получено от другого процесса через LISTEN/NOTIFY.",
+    ["event", "origin"],
+)
+
+CACHE_INVALIDATION_LISTENER = Gauge(
+    "templdoc_cache_invalidation_listener_connected",
+    "Слушатель событий сброса кэшей: 1 - подключен, 0 - кэши работают по "
+    "времени жизни записей.",
+)
+
+DATABASE_ROUTING = Counter(
+    "templdoc_database_routing_total",
+    "Запросы сессий б.д.: replica - чтение из реплики, primary - запись, "
+    "чтение после записи и чтение в запросах api на изменение.",
+    ["target"],
+)
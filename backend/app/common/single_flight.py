@@ -0,0 +1,142 @@
+import asyncio
+import hashlib
+import json
+import pickle
+import uuid
+from typing import Any, Awaitable, Callable, Dict, Generic, Optional, TypeVar
+
+from redis import asyncio as aioredis
+
+from app.common.metrics import SINGLE_FLIGHT_CALLS
+from app.config import settings
+from app.logger import logger
+
+T = TypeVar("T")
+
+
+def make_key(*parts: Any) -> str:
+    """Формирует ключ single-flight по входным данным вычисления.
+
+    Args:
+        parts: сериализуемые в json входные данные вычисления.
+
+    Returns:
+        str: sha256 от json представления входных данных.
+    """
+    raw = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class SingleFlight(Generic[T]):
+    """Объединение одновременных одинаковых вычислений внутри процесса.
+
+    Пока вычисление с заданным ключом выполняется, все последующие вызовы
+    с тем же ключом ожидают его результат, а не запускают вычисление
+    повторно. Вычисление выполняется в отдельной задаче, поэтому отмена
+    одного из ожидающих запросов не прерывает его для остальных.
+    """
+
+    def __init__(self, name: str):
+        self._name = name
+        self._calls: Dict[str, asyncio.Task] = {}
+
+    @staticmethod
+    def _retrieve_exception(task: asyncio.Task) -> None:
+        """Помечает исключение задачи полученным (если никто не ждет)."""
+        if not task.cancelled():
+            task.exception()
+
+    async def do(self, key: str, func: Callable[[], Awaitable[T]]) -> T:
+        """Выполняет func или присоединяется к уже выполняющемуся вызову.
+
+        Args:
+            key: ключ вычисления (см. make_key).
+            func: асинхронная функция вычисления без аргументов.
+
+        Returns:
+            Результат func, общий для всех одновременных вызовов с key.
+        """
+        task = self._calls.get(key)
+        if task is None:
+            SINGLE_FLIGHT_CALLS.labels(self._name, "leader").inc()
+            task = asyncio.ensure_future(func())
+            task.add_done_callback(self._retrieve_exception)
+            task.add_done_callback(lambda _: self._calls.pop(key, None))
+            self._calls[key] = task
+        else:
+            SINGLE_FLIGHT_CALLS.labels(self._name, "coalesced").inc()
+        return await asyncio.shield(task)
+
+
+class RedisSingleFlight(SingleFlight[T]):
+    """Объединение одинаковых вычислений между воркерами через redis.
+
+    Внутри процесса вызовы объединяются как в SingleFlight. Между
+    процессами лидер захватывает в redis блокировку по ключу и публикует
+    результат на короткое время; остальные воркеры ожидают результат,
+    пока блокировка удерживается. Если redis недоступен, вычисление
+    выполняется локально.
+    """
+
+    LOCK_KEY_FORMAT = "single_flight:{name}:lock:{key}"
+    RESULT_KEY_FORMAT = "single_flight:{name}:result:{key}"
+
+    def __init__(
+        self,
+        name: str,
+        redis: Optional[aioredis.Redis] = None,
+        lock_ttl: int = settings.SINGLE_FLIGHT_LOCK_TTL,
+        result_ttl: int = settings.SINGLE_FLIGHT_RESULT_TTL,
+        poll_interval: float = settings.SINGLE_FLIGHT_POLL_INTERVAL,
+    ):
+        super().__init__(name)
+        self._redis = redis or aioredis.Redis(
+            host=settings.REDIS_HOST, port=settings.REDIS_PORT
+        )
+        self._lock_ttl = lock_ttl
+        self._result_ttl = result_ttl
+        self._poll_interval = poll_interval
+
+    async def _release(self, lock_key: str, token: str) -> None:
+        """Снимает блокировку, если она все еще принадлежит этому вызову."""
+        if await self._redis.get(lock_key) == token.encode():
+            await self._redis.delete(lock_key)
+
+    async def _do_remote(self, key: str, func: Callable[[], Awaitable[T]]):
+        lock_key = self.LOCK_KEY_FORMAT.format(name=self._name, key=key)
+        result_key = self.RESULT_KEY_FORMAT.format(name=self._name, key=key)
+        token = uuid.uuid4().hex
+        try:
+            while True:
+                if cached := await self._redis.get(result_key):
+                    SINGLE_FLIGHT_CALLS.labels(self._name, "remote").inc()
+                    return pickle.loads(cached)
+                if await self._redis.set(
+                    lock_key, token, nx=True, ex=self._lock_ttl
+                ):
+                    break
+                await asyncio.sleep(self._poll_interval)
+        except aioredis.RedisError as e:
+            logger.warning(f"single-flight {self._name}: redis error {e}")
+            return await func()
+        try:
+            result = await func()
+            await self._redis.set(
+                result_key, pickle.dumps(result), ex=self._result_ttl
+            )
+            return result
+        finally:
+            try:
+                await self._release(lock_key, token)
+            except aioredis.RedisError as e:
+                logger.warning(f"single-flight {self._name}: redis error {e}")
+
+    async def do(self, key: str, func: Callable[[], Awaitable[T]]) -> T:
+        return await super().do(key, lambda: self._do_remote(key, func))
+
+
+def create_single_flight(name: str) -> SingleFlight:
+    """Создает single-flight согласно настройкам (с redis или без)."""
+    if settings.SINGLE_FLIGHT_REDIS:
+        return RedisSingleFlight(name)
+    return SingleFlight(name)
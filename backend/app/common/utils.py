@@ -1,29 +1,98 @@
+import pathlib
+import re
 import urllib
 from io import BytesIO
+from typing import Optional
 
-from fastapi import Response
+from fastapi import Response, status
+from pydantic import BaseModel
 
+from app.common.constants import FileFormat
 
-async def get_file_response(
-    file: BytesIO, filename: str, pdf: bool = False
+MEDIA_TYPES = {
+    ".pdf": "application/pdf",
+    ".docx": "application/docx",
+    ".html": "text/html; charset=utf-8",
+}
+
+
+def resolve_file_format(pdf: bool, format: Optional[str]) -> str:
+    """Определяет формат файла по параметрам запроса.
+
+    Args:
+        pdf: устаревший флаг формата pdf.
+        format: формат файла (docx, pdf, html), имеет приоритет над pdf.
+
+    Returns:
+        str: формат файла.
+    """
+    if format:
+        return format
+    return FileFormat.PDF if pdf else FileFormat.DOCX
+
+
+def prefix_tsquery(text: str, max_terms: int) -> Optional[str]:
+    """Запрос to_tsquery по строке поиска пользователя.
+
+    Все слова строки обязательны и совпадают по префиксу (поиск по мере
+    ввода): "догов пост" -> "догов:* & пост:*". Знаки препинания и
+    операторы tsquery отбрасываются.
+
+    Args:
+        text: строка поиска.
+        max_terms: наибольшее количество слов запроса.
+
+    Returns:
+        str | None: запрос или None, если в строке нет слов.
+    """
+    terms = re.findall(r"[^\W_]+", text.lower())[:max_terms]
+    return " & ".join(f"{term}:*" for term in terms) or None
+
+
+def get_json_response(
+    dto: BaseModel, status_code: int = status.HTTP_200_OK
 ) -> Response:
+    """Формирует json ответ из DTO без повторной валидации.
+
+    Если обработчик возвращает DTO, FastAPI заново проверяет его по модели
+    ответа и сериализует через jsonable_encoder. DTO сервисов уже
+    соответствуют модели ответа (response_model обработчика), поэтому
+    сериализуются напрямую в pydantic-core.
+
+    Args:
+        dto (BaseModel): объект ответа.
+        status_code (int): код ответа.
+
+    Returns:
+        Response: сформированный ответ.
+    """
+    return Response(
+        dto.model_dump_json(),
+        status_code=status_code,
+        media_type="application/json",
+    )
+
+
+async def get_file_response(file: BytesIO, filename: str) -> Response:
     """Формирует сообщение ответа для отправки файла.
 
+    Тип содержимого определяется по расширению имени файла (сервис может
+    вернуть docx вместо запрошенного pdf, если pdf недоступен). html
+    предпросмотр отдается для отображения в браузере, а не для скачивания.
+
     Args:
         file (BytesIO): файл, который должен быть отправлен.
         filename (str): наименование файла.
-        pdf (bool): True для формата pdf, False для формата docx.
 
     Returns:
         Response: сформированный ответ.
     """
-    if pdf:
-        media_type = "application/pdf"
-    else:
-        media_type = "application/docx"
+    suffix = pathlib.PurePath(filename).suffix.lower()
+    media_type = MEDIA_TYPES.get(suffix, "application/docx")
+    disposition = "inline" if suffix == ".html" else "attachment"
     headers = {
-        "Content-Disposition": "attachment; filename*=utf-8''{}".format(
-            urllib.parse.quote(filename, encoding="utf-8")
+        "Content-Disposition": "{}; filename*=utf-8''{}".format(
+            disposition, urllib.parse.quote(filename, encoding="utf-8")
         )
     }
     return Response(file.getvalue(), headers=headers, media_type=media_type)
@@ -20,6 +20,12 @@ class Settings(BaseSettings):
     TEST_DB_PASS: str
     TEST_DB_NAME: str
 
+    # Реплика Postgresql для чтения (пользователь и пароль основной б.д.),
+    # не задана - все запросы выполняются в основной б.д.
+    DB_REPLICA_HOST: str | None = None
+    DB_REPLICA_PORT: int | None = None  # None - DB_PORT
+    DB_REPLICA_NAME: str | None = None  # None - DB_NAME
+
     # Auth
     SECRET_KEY: str
     ALGORITHM: str
@@ -44,6 +50,18 @@ class Settings(BaseSettings):
             self.DB_NAME,
         )
 
+    @property
+    def REPLICA_DATABASE_URL(self) -> str | None:
+        if not self.DB_REPLICA_HOST:
+            return None
+        return "postgresql+asyncpg://{}:{}@{}:{}/{}".format(
+            self.DB_USER,
+            self.DB_PASS,
+            self.DB_REPLICA_HOST,
+            self.DB_REPLICA_PORT or self.DB_PORT,
+            self.DB_REPLICA_NAME or self.DB_NAME,
+        )
+
     @property
     def TEST_DATABASE_URL(self):
         return "postgresql+asyncpg://{}:{}@{}:{}/{}".format(
@@ -71,6 +89,79 @@ class Settings(BaseSettings):
     THUMBNAIL_WIDTH: int = 250
     THUMBNAIL_FORMAT: str = "png"
 
+    # Сохранение сгенерированных docx: неизмененные части шаблона
+    # копируются без перепаковки, измененные сжимаются с заданным уровнем
+    DOCX_ZIP_PASSTHROUGH: bool = True
+    DOCX_COMPRESS_LEVEL: int = 6  # 0-9, уровень сжатия zlib
+    # Кэш скомпилированных шаблонов jinja (xml частей docx)
+    JINJA_TEMPLATE_CACHE_SIZE: int = 64  # количество шаблонов
+    # сек, None - без ограничения (ключ - хэш исходного текста)
+    JINJA_TEMPLATE_CACHE_TTL: int | None = None
+    # Байт-код шаблонов на диске, общий для всех воркеров
+    JINJA_BYTECODE_CACHE: bool = True
+    JINJA_BYTECODE_CACHE_DIR: str | None = None  # None - временный каталог
+    # Кэш скомпилированных шаблонов потокового движка генерации
+    DOCX_STREAM_PLAN_CACHE_SIZE: int = 64  # количество шаблонов
+    # сек, None - без ограничения (ключ - версия файла шаблона)
+    DOCX_STREAM_PLAN_CACHE_TTL: int | None = None
+
+    # Хранение значений полей документов при записи: "eav" - строками
+    # document_field, "jsonb" - одним столбцом document.field_values.
+    # Чтение поддерживает оба способа (документ переводится в jsonb при
+    # следующем сохранении)
+    DOCUMENT_FIELDS_STORAGE: Literal["eav", "jsonb"] = "eav"
+
+    # Полнотекстовый поиск шаблонов и документов
+    SEARCH_PAGE_SIZE: int = 20  # результатов на странице по умолчанию
+    SEARCH_MAX_PAGE_SIZE: int = 100  # макс. результатов на странице
+    SEARCH_MAX_TERMS: int = 10  # слов строки поиска, остальные отбрасываются
+
+    # Количество docx файлов, конвертируемых одним запуском libreoffice
+    PDF_BATCH_SIZE: int = 20
+    # Устойчивость конвертации в pdf
+    PDF_SOFFICE_BINARY: str = "soffice"
+    PDF_CONVERT_TIMEOUT: float = 30  # сек, базовое время запуска libreoffice
+    PDF_CONVERT_FILE_TIMEOUT: float = 10  # сек, добавка на каждый файл пакета
+    PDF_CONVERT_RETRIES: int = 1  # повторы с новым профилем libreoffice
+    PDF_CIRCUIT_FAILURE_THRESHOLD: int = 5  # ошибок подряд до размыкания
+    PDF_CIRCUIT_RESET_TIMEOUT: float = 30  # сек, до пробного запуска
+    PDF_FALLBACK_TO_DOCX: bool = False  # отдавать docx, если pdf недоступен
+
+    # Объединение нескольких документов в один файл
+    DOCUMENT_MERGE_MAX_COUNT: int = 50  # документов в одном запросе
+    DOCUMENT_MERGE_CONCURRENCY: int = 4  # частей, генерируемых одновременно
+
+    # Кэш html предпросмотра (в памяти процесса)
+    HTML_PREVIEW_CACHE_SIZE: int = 256  # количество документов
+    # сек, None - без ограничения (ключ - версия шаблона и значения полей)
+    HTML_PREVIEW_CACHE_TTL: int | None = None
+
+    # Кэш планов генерации шаблонов: черновики, предпросмотр, миниатюры
+    TEMPLATE_RENDER_PLAN_CACHE_SIZE: int = 256  # количество шаблонов
+    # сек, None - до события сброса при подключенном слушателе
+    TEMPLATE_RENDER_PLAN_CACHE_TTL: int | None = None
+
+    # Сброс кэшей в памяти процессов через Postgres LISTEN/NOTIFY
+    CACHE_INVALIDATION_CHANNEL: str = "templdoc_cache_invalidation"
+    # сек, время жизни записей кэшей, пока слушатель не подключен
+    CACHE_INVALIDATION_FALLBACK_TTL: int = 60
+    CACHE_INVALIDATION_RECONNECT_DELAY: float = 5  # сек, до переподключения
+    CACHE_INVALIDATION_KEEPALIVE: float = 30  # сек, проверка соединения
+
+    # Живой предпросмотр по websocket (ограничения на одно соединение)
+    LIVE_PREVIEW_DEBOUNCE: float = 0.3  # сек, пауза перед перегенерацией
+    LIVE_PREVIEW_MAX_DELAY: float = 1.0  # сек, макс. задержка перегенерации
+    LIVE_PREVIEW_IDLE_TIMEOUT: float = 300  # сек, закрытие при бездействии
+    LIVE_PREVIEW_MAX_MESSAGE_SIZE: int = 65536  # байт, размер сообщения
+    LIVE_PREVIEW_MAX_FIELDS: int = 500  # полей в одном сообщении
+    LIVE_PREVIEW_MAX_CONNECTIONS: int = 100  # соединений на воркер
+
+    # Объединение одновременных одинаковых запросов генерации документов
+    SINGLE_FLIGHT_REDIS: bool = False  # объединять запросы между воркерами
+    SINGLE_FLIGHT_LOCK_TTL: int = 120  # сек, время удержания блокировки
+    SINGLE_FLIGHT_RESULT_TTL: int = 30  # сек, время хранения результата
+    SINGLE_FLIGHT_POLL_INTERVAL: float = 0.1  # сек, период опроса redis
+
     model_config = SettingsConfigDict(
         env_file=".env", env_file_encoding="utf-8"
     )
@@ -1,8 +1,21 @@
-from typing import Any, Generic, Optional, TypeVar
-
-from sqlalchemy import Sequence, delete, insert, select, update
+from functools import reduce
+from typing import Any, Generic, Optional, Tuple, TypeVar
+
+from sqlalchemy import (
+    ColumnElement,
+    Select,
+    Sequence,
+    delete,
+    func,
+    insert,
+    literal_column,
+    select,
+    update,
+)
+from sqlalchemy.dialects.postgresql import TSVECTOR
 from sqlalchemy.engine import Result
 
+from app.common.constants import SEARCH_CONFIG
 from app.database import async_session_maker
 from app.models.base import pk_type
 from app.models.user import User
@@ -10,6 +23,52 @@ from app.models.user import User
 T = TypeVar("T")
 
 
+def weighted_tsvector(*parts: Tuple[ColumnElement, str]) -> ColumnElement:
+    """Вектор полнотекстового поиска из частей с весами.
+
+    Args:
+        parts: пары (tsvector, вес "A" - "D"); вес учитывается ts_rank_cd
+            при ранжировании результатов поиска.
+
+    Returns:
+        ColumnElement: выражение setweight(...) || setweight(...).
+    """
+    vectors = [
+        func.setweight(vector, literal_column(f"'{weight}'"), type_=TSVECTOR)
+        for vector, weight in parts
+    ]
+    return reduce(lambda left, right: left.op("||")(right), vectors)
+
+
+def text_tsvector(text: ColumnElement) -> ColumnElement:
+    """Вектор поиска по тексту (NULL - пустой вектор)."""
+    return func.to_tsvector(SEARCH_CONFIG, func.coalesce(text, ""))
+
+
+def search_select(model, query: str) -> Select:
+    """Запрос объектов, подходящих под полнотекстовый запрос.
+
+    Условие search_vector @@ tsquery выполняется по gin индексу столбца.
+
+    Args:
+        model: модель со столбцом search_vector.
+        query: запрос в синтаксисе to_tsquery (см. prefix_tsquery).
+
+    Returns:
+        Select: объекты в порядке убывания релевантности (ts_rank_cd),
+            при равной релевантности - сначала новые.
+    """
+    ts_query = func.to_tsquery(SEARCH_CONFIG, query)
+    return (
+        select(model)
+        .where(model.search_vector.bool_op("@@")(ts_query))
+        .order_by(
+            func.ts_rank_cd(model.search_vector, ts_query).desc(),
+            model.id.desc(),
+        )
+    )
+
+
 class BaseDAO(Generic[T]):
     model: T = None
 
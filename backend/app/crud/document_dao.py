@@ -1,13 +1,34 @@
 from typing import Optional
 
-from sqlalchemy import Result, Sequence, delete, select
-from sqlalchemy.orm import joinedload, selectinload
+from sqlalchemy import (
+    Result,
+    Row,
+    Sequence,
+    String,
+    and_,
+    cast,
+    column,
+    delete,
+    func,
+    select,
+    union,
+    update,
+)
+from sqlalchemy.dialects.postgresql import JSONB, REGCONFIG
+from sqlalchemy.orm import defer, joinedload, selectinload
 
-from app.crud.base_dao import BaseDAO
+from app.common.constants import SEARCH_CONFIG
+from app.crud.base_dao import (
+    BaseDAO,
+    search_select,
+    text_tsvector,
+    weighted_tsvector,
+)
+from app.crud.template_dao import render_field_options
 from app.database import async_session_maker
 from app.models.base import pk_type
 from app.models.document import Document, DocumentField
-from app.models.template import Template, TemplateField
+from app.models.template import Template, TemplateField, TemplateVersion
 
 
 class DocumentFieldDAO(BaseDAO):
@@ -131,6 +152,64 @@ class DocumentDAO(BaseDAO):
             result: Result = await session.execute(query)
             return result.unique().scalar_one_or_none()
 
+    @classmethod
+    async def get_render_plan(cls, id: pk_type) -> Sequence[Row]:
+        """Получить данные для генерации файла документа.
+
+        Один запрос только столбцов, необходимых для генерации: по строке
+        на поле шаблона (name, owner_id документа, filename, render_engine
+        шаблона, version_id, version_filename версии файла, закрепленной
+        за документом, TemplateField как в TemplateDAO.get_render_plan,
+        value, items строки document_field и stored - значение поля из
+        field_values документа).
+
+        Args:
+            id: идентификатор документа.
+
+        Returns:
+            list(Row): строки запроса (пустой, если документ отсутствует).
+        """
+        # значения field_values разворачиваются один раз на документ
+        stored = (
+            func.jsonb_each(Document.field_values)
+            .table_valued(column("key", String), column("value", JSONB))
+            .render_derived(name="stored")
+        )
+        async with async_session_maker() as session:
+            query = (
+                select(
+                    Document.description.label("name"),
+                    Document.owner_id,
+                    Template.filename,
+                    Template.render_engine,
+                    TemplateVersion.id.label("version_id"),
+                    TemplateVersion.filename.label("version_filename"),
+                    TemplateField,
+                    DocumentField.value,
+                    DocumentField.items,
+                    stored.c.value.label("stored"),
+                )
+                .join(Document.template)
+                .outerjoin(Document.template_version)
+                .outerjoin(Template.fields)
+                .outerjoin(TemplateField.type)
+                .outerjoin(
+                    DocumentField,
+                    and_(
+                        DocumentField.document_id == Document.id,
+                        DocumentField.template_field_id == TemplateField.id,
+                    ),
+                )
+                .outerjoin(
+                    stored, stored.c.key == cast(TemplateField.id, String)
+                )
+                .options(*render_field_options())
+                .where(Document.id == id)
+                .order_by(TemplateField.id)
+            )
+            result: Result = await session.execute(query)
+            return result.all()
+
     @classmethod
     async def get_all(cls, **filter_by) -> Sequence[Document]:
         """Получить все объекты по заданному фильтру.
@@ -145,7 +224,128 @@ class DocumentDAO(BaseDAO):
             query = (
                 select(cls.model)
                 .filter_by(**filter_by)
-                .options(joinedload(Document.template))
+                .options(
+                    joinedload(Document.template),
+                    defer(Document.field_values, raiseload=True),
+                )
+            )
+            result: Result = await session.execute(query)
+            return result.scalars().all()
+
+    @classmethod
+    async def update_search_vector(cls, *ids: pk_type) -> None:
+        """Пересчитать векторы поиска документов по данным б.д.
+
+        Вызывается после изменения описания или значений полей документа.
+        Веса: описание - A, строковые и числовые значения полей (value и
+        элементы items) - B. Значения читаются из field_values, а для
+        документов, сохраненных строками document_field, - из этих строк.
+
+        Args:
+            ids: идентификаторы документов.
+        """
+        rows_values = (
+            select(
+                func.jsonb_object_agg(
+                    DocumentField.template_field_id,
+                    func.jsonb_build_object(
+                        "value",
+                        DocumentField.value,
+                        "items",
+                        DocumentField.items,
+                    ),
+                )
+            )
+            .where(DocumentField.document_id == Document.id)
+            .scalar_subquery()
+        )
+        values_vector = func.jsonb_to_tsvector(
+            cast(SEARCH_CONFIG, REGCONFIG),
+            func.coalesce(Document.field_values, rows_values, cast({}, JSONB)),
+            cast(["string", "numeric"], JSONB),
+        )
+        async with async_session_maker() as session:
+            stmt = (
+                update(Document)
+                .where(Document.id.in_(ids))
+                .values(
+                    search_vector=weighted_tsvector(
+                        (text_tsvector(Document.description), "A"),
+                        (values_vector, "B"),
+                    )
+                )
+                .execution_options(synchronize_session=False)
+            )
+            await session.execute(stmt)
+            await session.commit()
+
+    @classmethod
+    async def search(
+        cls, query: str, limit: int, offset: int, **filter_by
+    ) -> Sequence[Document]:
+        """Полнотекстовый поиск документов.
+
+        Args:
+            query: запрос в синтаксисе to_tsquery.
+            limit: количество документов на странице.
+            offset: количество пропускаемых документов.
+            filter_by (dict): параметры для фильтрации документов.
+
+        Returns:
+            list(Document): документы в порядке убывания релевантности.
+        """
+        async with async_session_maker() as session:
+            query = (
+                search_select(cls.model, query)
+                .filter_by(**filter_by)
+                .options(
+                    joinedload(Document.template),
+                    defer(Document.field_values, raiseload=True),
+                )
+                .limit(limit)
+                .offset(offset)
+            )
+            result: Result = await session.execute(query)
+            return result.scalars().all()
+
+    @classmethod
+    async def get_all_by_field_value(
+        cls, field_id: pk_type, value: str, **filter_by
+    ) -> Sequence[Document]:
+        """Получить документы, в которых поле имеет заданное значение.
+
+        Поиск ведется по обоим способам хранения значений: по индексу
+        ix_document_field_values (field_values @> ...) и по строкам
+        document_field.
+
+        Args:
+            field_id: идентификатор поля шаблона.
+            value: значение поля.
+            filter_by (dict): параметры для поиска объектов.
+
+        Returns:
+            list(Document): список объектов, удовлетворяющих фильтру поиска.
+        """
+        async with async_session_maker() as session:
+            ids = union(
+                select(Document.id).where(
+                    Document.field_values.contains(
+                        {str(field_id): {"value": value}}
+                    )
+                ),
+                select(DocumentField.document_id).where(
+                    DocumentField.template_field_id == field_id,
+                    DocumentField.value == value,
+                ),
+            )
+            query = (
+                select(cls.model)
+                .filter_by(**filter_by)
+                .where(Document.id.in_(ids))
+                .options(
+                    joinedload(Document.template),
+                    defer(Document.field_values, raiseload=True),
+                )
             )
             result: Result = await session.execute(query)
             return result.scalars().all()
@@ -1,9 +1,19 @@
 from typing import Optional
 
-from sqlalchemy import Result, select
-from sqlalchemy.orm import selectinload
+from sqlalchemy import Result, Row, Sequence, func, select, update
+from sqlalchemy.orm import (
+    contains_eager,
+    joinedload,
+    load_only,
+    selectinload,
+)
 
-from app.crud.base_dao import BaseDAO
+from app.crud.base_dao import (
+    BaseDAO,
+    search_select,
+    text_tsvector,
+    weighted_tsvector,
+)
 from app.database import async_session_maker
 from app.models.base import pk_type
 from app.models.favorite import UserTemplateFavorite
@@ -12,9 +22,27 @@ from app.models.template import (
     TemplateField,
     TemplateFieldGroup,
     TemplateFieldType,
+    TemplateVersion,
 )
 
 
+def render_field_options() -> tuple:
+    """Загрузка полей шаблона только со столбцами для генерации."""
+    return (
+        load_only(
+            TemplateField.tag,
+            TemplateField.name,
+            TemplateField.default,
+            TemplateField.type_id,
+        ),
+        contains_eager(TemplateField.type).load_only(
+            TemplateFieldType.name,
+            TemplateFieldType.mask,
+            TemplateFieldType.kind,
+        ),
+    )
+
+
 class TemplateFieldTypeDAO(BaseDAO):
     model = TemplateFieldType
 
@@ -27,6 +55,10 @@ class TemplateFieldDAO(BaseDAO):
     model = TemplateField
 
 
+class TemplateVersionDAO(BaseDAO):
+    model = TemplateVersion
+
+
 class TemplateDAO(BaseDAO):
     model = Template
 
@@ -51,10 +83,105 @@ class TemplateDAO(BaseDAO):
                     )
                 )
                 .options(selectinload(Template.favorited_by_users))
+                .options(joinedload(Template.version))
             )
             result: Result = await session.execute(query)
             return result.unique().scalar_one_or_none()
 
+    @classmethod
+    async def get_render_plan(cls, id: pk_type) -> Sequence[Row]:
+        """Получить данные для генерации документа по шаблону.
+
+        Один запрос только столбцов, необходимых для генерации: по строке
+        на поле шаблона (name, deleted, filename, render_engine шаблона,
+        version_id, version_filename текущей версии файла и TemplateField
+        с тэгом, наименованием, значением по умолчанию и типом поля).
+        Для шаблона без полей TemplateField = None.
+
+        Args:
+            id (pk_type): идентификатор шаблона.
+
+        Returns:
+            list(Row): строки запроса (пустой, если шаблон отсутствует).
+        """
+        async with async_session_maker() as session:
+            query = (
+                select(
+                    Template.title.label("name"),
+                    Template.deleted,
+                    Template.filename,
+                    Template.render_engine,
+                    TemplateVersion.id.label("version_id"),
+                    TemplateVersion.filename.label("version_filename"),
+                    TemplateField,
+                )
+                .outerjoin(Template.version)
+                .outerjoin(Template.fields)
+                .outerjoin(TemplateField.type)
+                .options(*render_field_options())
+                .where(Template.id == id)
+                .order_by(TemplateField.id)
+            )
+            result: Result = await session.execute(query)
+            return result.all()
+
+    @classmethod
+    async def update_search_vector(cls, *ids: pk_type) -> None:
+        """Пересчитать векторы поиска шаблонов по данным б.д.
+
+        Вызывается после изменения наименования, описания или полей
+        шаблона. Веса: наименование - A, описание - B, наименования
+        полей - C.
+
+        Args:
+            ids: идентификаторы шаблонов.
+        """
+        field_names = (
+            select(func.string_agg(TemplateField.name, " "))
+            .where(TemplateField.template_id == Template.id)
+            .scalar_subquery()
+        )
+        async with async_session_maker() as session:
+            stmt = (
+                update(Template)
+                .where(Template.id.in_(ids))
+                .values(
+                    search_vector=weighted_tsvector(
+                        (text_tsvector(Template.title), "A"),
+                        (text_tsvector(Template.description), "B"),
+                        (text_tsvector(field_names), "C"),
+                    )
+                )
+                .execution_options(synchronize_session=False)
+            )
+            await session.execute(stmt)
+            await session.commit()
+
+    @classmethod
+    async def search(
+        cls, query: str, limit: int, offset: int, **filter_by
+    ) -> Sequence[Template]:
+        """Полнотекстовый поиск шаблонов.
+
+        Args:
+            query: запрос в синтаксисе to_tsquery.
+            limit: количество шаблонов на странице.
+            offset: количество пропускаемых шаблонов.
+            filter_by (dict): параметры для фильтрации шаблонов.
+
+        Returns:
+            list(Template): шаблоны в порядке убывания релевантности.
+        """
+        async with async_session_maker() as session:
+            query = (
+                search_select(cls.model, query)
+                .filter_by(**filter_by)
+                .limit(limit)
+                .offset(offset)
+            )
+            result: Result = await session.execute(query)
+            return result.scalars().all()
+
     @classmethod
     async def delete_(cls, id: pk_type) -> None:
         raise NotImplementedError
@@ -1,26 +1,125 @@
-from typing import Annotated, AsyncGenerator
+import json
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import partial
+from typing import Annotated, AsyncGenerator, Iterator, Optional
 
 from sqlalchemy import NullPool
 from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
     AsyncSession,
     async_sessionmaker,
     create_async_engine,
 )
+from sqlalchemy.orm import Session
 
+from app.common.metrics import DATABASE_ROUTING
 from app.config import settings
 
 if settings.MODE == "TEST":
     DATABASE_URL = settings.TEST_DATABASE_URL
+    REPLICA_DATABASE_URL = None
     DATABASE_PARAMS = {"poolclass": NullPool}
     # DATABASE_PARAMS = {}
 else:
     DATABASE_URL = settings.DATABASE_URL
+    REPLICA_DATABASE_URL = settings.REPLICA_DATABASE_URL
     DATABASE_PARAMS = {"poolclass": NullPool}  # for celery background
     # DATABASE_PARAMS = {}
 
+# значения json/jsonb столбцов (items, field_values) хранятся без
+# \uXXXX экранирования: кириллица занимает 2 байта вместо 6
+DATABASE_PARAMS["json_serializer"] = partial(json.dumps, ensure_ascii=False)
+
 engine = create_async_engine(DATABASE_URL, **DATABASE_PARAMS)
+replica_engine = (
+    create_async_engine(REPLICA_DATABASE_URL, **DATABASE_PARAMS)
+    if REPLICA_DATABASE_URL
+    else None
+)
+
+
+class RoutingScope:
+    """Область маршрутизации запросов к б.д. (запрос api, фоновая задача).
+
+    Attributes:
+        primary: все запросы области выполняются в основной б.д.
+            Устанавливается при первой записи, чтобы последующее чтение
+            в той же области не получило из реплики устаревшие данные.
+    """
+
+    def __init__(self, primary: bool = False):
+        self.primary = primary
+
+
+_routing_scope: ContextVar[Optional[RoutingScope]] = ContextVar(
+    "routing_scope", default=None
+)
+
+
+@contextmanager
+def routing_scope(primary: bool = False) -> Iterator[RoutingScope]:
+    """Открывает область маршрутизации запросов к б.д.
+
+    Область наследуется задачами asyncio, созданными внутри нее.
+
+    Args:
+        primary: с самого начала выполнять все запросы в основной б.д.
+            (запросы api на изменение, чтение сразу после записи).
+    """
+    scope = RoutingScope(primary)
+    token = _routing_scope.set(scope)
+    try:
+        yield scope
+    finally:
+        _routing_scope.reset(token)
+
+
+class RoutingSession(Session):
+    """Сессия, выполняющая чтение в реплике, а запись в основной б.д.
+
+    В реплику направляются только SELECT без FOR UPDATE. Запись (в том
+    числе flush и текстовые запросы) выполняется в основной б.д., после
+    нее все запросы этой сессии и текущей области маршрутизации
+    (routing_scope) также выполняются в основной б.д.
+
+    Основная б.д. и реплика задаются в info сессии: "primary", "replica".
+    """
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        scope = _routing_scope.get()
+        if self._flushing or not self._is_read(clause):
+            self.info["wrote"] = True
+            if scope:
+                scope.primary = True
+        elif not self.info.get("wrote") and not (scope and scope.primary):
+            DATABASE_ROUTING.labels("replica").inc()
+            return self.info["replica"]
+        DATABASE_ROUTING.labels("primary").inc()
+        return self.info["primary"]
+
+    @staticmethod
+    def _is_read(clause) -> bool:
+        return (
+            getattr(clause, "is_select", False)
+            and getattr(clause, "_for_update_arg", None) is None
+        )
+
+
+def create_session_maker(
+    primary: AsyncEngine, replica: Optional[AsyncEngine] = None
+) -> async_sessionmaker[AsyncSession]:
+    """Фабрика сессий: без реплики все запросы в основной б.д."""
+    if replica is None:
+        return async_sessionmaker(primary, expire_on_commit=False)
+    return async_sessionmaker(
+        sync_session_class=RoutingSession,
+        info={"primary": primary.sync_engine, "replica": replica.sync_engine},
+        expire_on_commit=False,
+    )
+
 
-async_session_maker = async_sessionmaker(engine, expire_on_commit=False)
+async_session_maker = create_session_maker(engine, replica_engine)
 
 idpk = Annotated[int, "Идентификатор объекта"]
 
@@ -1,10 +1,26 @@
-from fastapi import FastAPI
+import asyncio
+from contextlib import asynccontextmanager, suppress
+
+from fastapi import FastAPI, Request
 from fastapi.staticfiles import StaticFiles
+from prometheus_client import make_asgi_app
 
 from app.admin.views import init_admin
 from app.api import routers
+from app.common.invalidation import invalidation_bus
 from app.config import settings
-from app.database import engine
+from app.database import engine, routing_scope
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # получение событий сброса кэшей от других воркеров
+    listener = asyncio.create_task(invalidation_bus.listen())
+    yield
+    listener.cancel()
+    with suppress(asyncio.CancelledError):
+        await listener
+
 
 app = FastAPI(
     title=settings.TITLE,
@@ -13,15 +29,28 @@ app = FastAPI(
     docs_url=settings.DOCS_URL,
     redoc_url=settings.REDOC_URL,
     openapi_url=settings.OPENAPI_URL,
-    # lifespan=register_init,
+    lifespan=lifespan,
 )
 
 
+# методы api, изменяющие данные: все запросы к б.д. в основной б.д.
+WRITE_METHODS = frozenset(("POST", "PUT", "PATCH", "DELETE"))
+
+
+@app.middleware("http")
+async def database_routing(request: Request, call_next):
+    # чтение из реплики до первой записи в рамках запроса
+    with routing_scope(primary=request.method in WRITE_METHODS):
+        return await call_next(request)
+
+
 app.include_router(routers.v1)
 app.include_router(routers.v2)
 app.mount(
     "/static", StaticFiles(directory="/docx_storage/tpl_thumbnails/"), "static"
 )
+# метрики prometheus
+app.mount("/metrics", make_asgi_app(), "metrics")
 
 # подключение админки
 init_admin(app, engine)
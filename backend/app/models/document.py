@@ -1,21 +1,36 @@
-from typing import TYPE_CHECKING, Optional
+from typing import TYPE_CHECKING, Any, Dict, Iterable, Optional, Tuple
 
-from sqlalchemy import ForeignKey, Text
+from sqlalchemy import JSON, ForeignKey, Index, Text
+from sqlalchemy.dialects.postgresql import JSONB, TSVECTOR
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.models.base import Base, TimestampMixin, pk_type
 
 if TYPE_CHECKING:
-    from app.models.template import Template, TemplateField
+    from app.models.template import (
+        Template,
+        TemplateField,
+        TemplateVersion,
+    )
     from app.models.user import User
 
 
 class DocumentField(Base):
     __tablename__ = "document_field"
+    __table_args__ = (
+        # поля документа (удаление при обновлении, план генерации)
+        Index(
+            "ix_document_field_document_id_template_field_id",
+            "document_id",
+            "template_field_id",
+        ),
+    )
 
     value: Mapped[Optional[str]] = mapped_column(Text)
+    # элементы списочных и табличных полей (FieldKind.LIST/TABLE)
+    items: Mapped[Optional[list[Any]]] = mapped_column(JSON)
     template_field_id: Mapped[pk_type] = mapped_column(
-        ForeignKey("template_field.id", ondelete="CASCADE")
+        ForeignKey("template_field.id", ondelete="CASCADE"), index=True
     )
     document_id: Mapped[pk_type] = mapped_column(
         ForeignKey("document.id", ondelete="CASCADE")
@@ -30,16 +45,51 @@ class DocumentField(Base):
 
 class Document(TimestampMixin, Base):
     __tablename__ = "document"
+    __table_args__ = (
+        # документы пользователя (в порядке изменения)
+        Index("ix_document_owner_id_updated_at", "owner_id", "updated_at"),
+        # поиск документов по значениям полей (field_values @> ...)
+        Index(
+            "ix_document_field_values",
+            "field_values",
+            postgresql_using="gin",
+            postgresql_ops={"field_values": "jsonb_path_ops"},
+        ),
+        # полнотекстовый поиск документов (search_vector @@ tsquery)
+        Index(
+            "ix_document_search_vector",
+            "search_vector",
+            postgresql_using="gin",
+        ),
+    )
 
     description: Mapped[Optional[str]]
     template_id: Mapped[pk_type] = mapped_column(
-        ForeignKey("template.id", ondelete="CASCADE"), nullable=False
+        ForeignKey("template.id", ondelete="CASCADE"),
+        nullable=False,
+        index=True,
     )
     owner_id: Mapped[pk_type] = mapped_column(
         ForeignKey("user.id", ondelete="CASCADE")
     )
+    # версия docx файла шаблона, по которой генерируется документ
+    template_version_id: Mapped[Optional[pk_type]] = mapped_column(
+        ForeignKey("template_version.id", ondelete="SET NULL"), index=True
+    )
     completed: Mapped[bool] = mapped_column(default=False)
+    # значения полей одним столбцом (DocumentFieldsStorage.JSONB):
+    # {"<template_field_id>": {"value": ..., "items": [...]}},
+    # None - значения хранятся строками document_field
+    field_values: Mapped[Optional[dict[str, Any]]] = mapped_column(
+        JSONB(none_as_null=True)
+    )
+    # вектор поиска по описанию и значениям полей
+    # (DocumentDAO.update_search_vector), загружается только явно
+    search_vector: Mapped[Optional[str]] = mapped_column(
+        TSVECTOR, deferred=True
+    )
     template: Mapped["Template"] = relationship("Template")
+    template_version: Mapped[Optional["TemplateVersion"]] = relationship()
     owner: Mapped["User"] = relationship("User", back_populates="documents")
     fields: Mapped[list["DocumentField"]] = relationship(
         back_populates="document"
@@ -47,3 +97,43 @@ class Document(TimestampMixin, Base):
 
     def __str__(self):
         return f"{self.id}: {self.description}"
+
+    @staticmethod
+    def dump_field_values(
+        fields: Iterable[Dict[str, Any]]
+    ) -> Dict[str, Dict[str, Any]]:
+        """Значения полей для столбца field_values.
+
+        Args:
+            fields: поля вида {"field_id": ..., "value": ..., "items": ...}.
+
+        Returns:
+            {"<field_id>": {"value": ..., "items": ...}}, отсутствующие
+            value и items не сохраняются, как и поля без них.
+        """
+        field_values = {}
+        for field in fields:
+            stored = {}
+            if field["value"] is not None:
+                stored["value"] = field["value"]
+            if field.get("items"):
+                stored["items"] = field["items"]
+            if stored:
+                field_values[str(field["field_id"])] = stored
+        return field_values
+
+    def values_by_field_id(self) -> Dict[pk_type, Tuple[Any, Any]]:
+        """Значения полей документа {id поля шаблона: (value, items)}.
+
+        Читаются из field_values, а для документов, сохраненных
+        строками document_field, - из загруженного отношения fields.
+        """
+        if self.field_values is not None:
+            return {
+                int(id): (stored.get("value"), stored.get("items"))
+                for id, stored in self.field_values.items()
+            }
+        return {
+            field.template_field_id: (field.value, field.items)
+            for field in self.fields
+        }
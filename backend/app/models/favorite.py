@@ -1,6 +1,6 @@
 # from typing import TYPE_CHECKING
 
-from sqlalchemy import ForeignKey, Identity
+from sqlalchemy import ForeignKey, Identity, Index
 from sqlalchemy.orm import Mapped, mapped_column
 
 from app.models.base import Base, pk_type
@@ -12,6 +12,16 @@ from app.models.base import Base, pk_type
 
 class UserTemplateFavorite(Base):
     __tablename__ = "user_template_favorite"
+    __table_args__ = (
+        # первичный ключ начинается с id и не подходит для поиска
+        # избранного пользователя и пользователей шаблона
+        Index(
+            "ix_user_template_favorite_user_id_template_id",
+            "user_id",
+            "template_id",
+        ),
+        Index("ix_user_template_favorite_template_id", "template_id"),
+    )
 
     id: Mapped[pk_type] = mapped_column(
         primary_key=True,
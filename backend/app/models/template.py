@@ -1,8 +1,11 @@
-from typing import TYPE_CHECKING, Optional
+from datetime import datetime
+from typing import TYPE_CHECKING, Any, Optional
 
-from sqlalchemy import ForeignKey
+from sqlalchemy import JSON, ForeignKey, Index, String, UniqueConstraint
+from sqlalchemy.dialects.postgresql import TSVECTOR
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
+from app.common.constants import FieldKind, RenderEngine
 from app.models.base import (
     Base,
     FileType,
@@ -47,6 +50,9 @@ class TemplateFieldType(Base):
     type: Mapped[str_50] = mapped_column(unique=True)
     name: Mapped[str_50]
     mask: Mapped[str_256] = mapped_column(nullable=True)
+    kind: Mapped[str_50] = mapped_column(
+        default=FieldKind.SCALAR, server_default=FieldKind.SCALAR
+    )
 
     def __str__(self):
         return f"{self.type} ({self.name})"
@@ -58,7 +64,7 @@ class TemplateFieldGroup(Base):
     __tablename__ = "field_group"
 
     template_id: Mapped[pk_type] = mapped_column(
-        ForeignKey("template.id", ondelete="CASCADE")
+        ForeignKey("template.id", ondelete="CASCADE"), index=True
     )
     name: Mapped[str]
 
@@ -85,13 +91,13 @@ class TemplateField(Base):
     )  # only positive ?, default = 100
 
     template_id: Mapped[pk_type] = mapped_column(
-        ForeignKey("template.id", ondelete="CASCADE")
+        ForeignKey("template.id", ondelete="CASCADE"), index=True
     )
     group_id: Mapped[pk_type] = mapped_column(
         ForeignKey("field_group.id", ondelete="SET NULL"), nullable=True
     )
     type_id: Mapped[pk_type] = mapped_column(
-        ForeignKey("field_type.id", ondelete="RESTRICT")
+        ForeignKey("field_type.id", ondelete="RESTRICT"), index=True
     )
 
     type: Mapped[Optional["TemplateFieldType"]] = relationship()
@@ -108,10 +114,54 @@ class TemplateField(Base):
     # raise ValidationError(Messages.WRONG_FIELD_AND_GROUP_TEMPLATES)
 
 
+class TemplateVersion(Base):
+    """Неизменяемая версия docx файла шаблона.
+
+    Создается при каждой загрузке файла с новым содержимым. Файл версии
+    не перезаписывается, поэтому кэши генерации и миниатюр могут
+    использовать id версии как ключ без ограничения времени жизни.
+    """
+
+    __tablename__ = "template_version"
+    __table_args__ = (UniqueConstraint("template_id", "number"),)
+
+    template_id: Mapped[pk_type] = mapped_column(
+        ForeignKey("template.id", ondelete="CASCADE")
+    )
+    number: Mapped[int]  # порядковый номер версии шаблона
+    filename: Mapped[str]  # имя docx файла в storage_docx
+    file_hash: Mapped[Optional[str]] = mapped_column(String(64))  # sha256
+    # тэги docx файла (индекс тэгов для проверки согласованности)
+    tags: Mapped[Optional[list[str]]] = mapped_column(JSON)
+    # поля шаблона на момент загрузки: [{id, tag, name, default, type}]
+    fields: Mapped[Optional[list[dict[str, Any]]]] = mapped_column(JSON)
+    # имя миниатюры, сгенерированной для версии (в storage_thumbnail)
+    thumbnail: Mapped[Optional[str]]
+    created_at: Mapped[datetime] = mapped_column(default=datetime.utcnow)
+
+    template: Mapped["Template"] = relationship(foreign_keys=[template_id])
+
+    @property
+    def path(self) -> str:
+        """Путь к docx файлу версии."""
+        return storage_docx.get_path(self.filename)
+
+    def __str__(self):
+        return f"{self.template_id}: v{self.number}"
+
+
 class Template(TimestampMixin, Base):
     """Шаблон."""
 
     __tablename__ = "template"
+    __table_args__ = (
+        # полнотекстовый поиск шаблонов (search_vector @@ tsquery)
+        Index(
+            "ix_template_search_vector",
+            "search_vector",
+            postgresql_using="gin",
+        ),
+    )
 
     owner_id: Mapped[Optional[pk_type]] = mapped_column(
         ForeignKey("user.id", ondelete="SET NULL"), nullable=True
@@ -127,9 +177,30 @@ class Template(TimestampMixin, Base):
     thumbnail = mapped_column(
         ImageType(storage=storage_thumbnail), nullable=True
     )
+    render_engine: Mapped[str_50] = mapped_column(
+        default=RenderEngine.DOCXTPL, server_default=RenderEngine.DOCXTPL
+    )
+    # текущая версия docx файла (TemplateVersion)
+    version_id: Mapped[Optional[pk_type]] = mapped_column(
+        ForeignKey(
+            "template_version.id",
+            ondelete="SET NULL",
+            use_alter=True,
+            name="fk_template_version_id",
+        ),
+        nullable=True,
+    )
+    # вектор поиска по наименованию, описанию и наименованиям полей
+    # (TemplateDAO.update_search_vector), загружается только явно
+    search_vector: Mapped[Optional[str]] = mapped_column(
+        TSVECTOR, deferred=True
+    )
 
     owner: Mapped["User"] = relationship(back_populates="templates")
     category: Mapped["Category"] = relationship(back_populates="templates")
+    version: Mapped[Optional["TemplateVersion"]] = relationship(
+        foreign_keys=[version_id]
+    )
     groups: Mapped[Optional[list["TemplateFieldGroup"]]] = relationship(
         back_populates="template", order_by=TemplateFieldGroup.id
     )
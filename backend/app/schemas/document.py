@@ -1,9 +1,10 @@
 from datetime import datetime
-from typing import Annotated, Optional
+from typing import Annotated, Any, Optional
 
 from pydantic import BaseModel, ConfigDict, Field
 
-from app.schemas.template import id_type, template_id_type
+from app.common.constants import FieldKind, field_kind_type
+from app.schemas.template import field_items, id_type, template_id_type
 
 document_id_type = Annotated[int, Field(description="Идентификатор документа")]
 
@@ -19,12 +20,17 @@ class DocumentFieldReadDTO(BaseModel):
     type: Annotated[str, Field(description="Тип поля")]
     length: Annotated[int, Field(description="Длина поля ввода", ge=0, le=100)]
     mask: Annotated[str, Field(description="Маска валидации")]
+    kind: Annotated[
+        field_kind_type,
+        Field(description="Вид значения", default=FieldKind.SCALAR),
+    ]
     default: Annotated[
         Optional[str], Field(description="Значение по умолчанию", default=None)
     ]
     value: Annotated[
         Optional[str], Field(description="Значение", default=None)
     ]
+    items: Annotated[Optional[list[Any]], field_items]
 
 
 class DocumentFieldWriteValueDTO(BaseModel):
@@ -33,6 +39,7 @@ class DocumentFieldWriteValueDTO(BaseModel):
     model_config = ConfigDict(from_attributes=True)
     field_id: id_type
     value: Annotated[Optional[str], Field(description="Значение")]
+    items: Annotated[Optional[list[Any]], field_items]
 
 
 class DocumentFieldGroupReadDTO(BaseModel):
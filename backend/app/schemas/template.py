@@ -1,10 +1,21 @@
 from datetime import datetime
-from typing import Annotated, Optional
+from typing import Annotated, Any, Optional
 
 from pydantic import BaseModel, ConfigDict, Field
 
+from app.common.constants import (
+    FieldKind,
+    RenderEngine,
+    field_kind_type,
+    render_engine_type,
+)
+
 template_id_type = Annotated[int, Field(description="Идентификатор шаблона")]
 id_type = Annotated[int, Field(description="Идентификатор")]
+field_items = Field(
+    description="Элементы списка (строки) или таблицы ({столбец: значение})",
+    default=None,
+)
 
 
 class TemplateFieldTypeWriteDTO(BaseModel):
@@ -15,6 +26,10 @@ class TemplateFieldTypeWriteDTO(BaseModel):
     type: Annotated[str, Field(description="Наименование")]
     name: Annotated[str, Field(description="Описание")]
     mask: Annotated[str, Field(description="Маска валидации", default="")]
+    kind: Annotated[
+        field_kind_type,
+        Field(description="Вид значения", default=FieldKind.SCALAR),
+    ]
 
 
 class TemplateFieldTypeReadDTO(TemplateFieldTypeWriteDTO):
@@ -45,6 +60,10 @@ class TemplateFieldReadDTO(TemplateFieldWriteDTO):
 
     id: id_type
     mask: Annotated[str, Field(description="Маска валидации")]
+    kind: Annotated[
+        field_kind_type,
+        Field(description="Вид значения", default=FieldKind.SCALAR),
+    ]
 
 
 class TemplateFieldWriteValueDTO(BaseModel):
@@ -53,6 +72,7 @@ class TemplateFieldWriteValueDTO(BaseModel):
     model_config = ConfigDict(from_attributes=True)
     field_id: id_type
     value: Annotated[str, Field(description="Значение")]
+    items: Annotated[Optional[list[Any]], field_items]
 
 
 class TemplateFieldGroupReadDTO(BaseModel):
@@ -95,6 +115,10 @@ class TemplateReadMinifiedDTO(BaseModel):
     # owner: Annotated[Optional[int],Field(title="Владелец", default=None)]
     is_favorited: Annotated[bool, Field(title="В избранном", default=False)]
     thumbnail: Optional[str]  # Optional[FilePath]
+    render_engine: Annotated[
+        render_engine_type,
+        Field(title="Движок генерации", default=RenderEngine.DOCXTPL),
+    ]
 
 
 class TemplateReadDTO(TemplateReadMinifiedDTO):
@@ -114,6 +138,10 @@ class TemplateWriteDTO(BaseModel):
     title: Annotated[str, Field(description="Наименование")]
     description: Annotated[str, Field(description="Описание")]
     deleted: Annotated[bool, Field(description="Удален", default=False)]
+    render_engine: Annotated[
+        render_engine_type,
+        Field(description="Движок генерации", default=RenderEngine.DOCXTPL),
+    ]
     grouped_fields: Optional[list[TemplateFieldGroupWriteDTO]]
     ungrouped_fields: Optional[list[TemplateFieldWriteDTO]]
 
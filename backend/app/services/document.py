@@ -1,28 +1,30 @@
 from io import BytesIO
-from typing import Any, List, Optional, Tuple
+from typing import Any, Dict, List, Optional, Sequence, Tuple
 
-from app.common.constants import Messages
+from app.common.constants import DocumentFieldsStorage, FileFormat, Messages
 from app.common.exceptions import (
     DocumentAccessDeniedException,
     DocumentConflictException,
+    DocumentFieldValidationException,
     DocumentNotFoundException,
     TemplateNotFoundException,
-    TemplatePdfConvertErrorException,
     TemplateRenderErrorException,
 )
+from app.common.utils import prefix_tsquery
 from app.config import settings
 from app.crud.document_dao import DocumentDAO, DocumentFieldDAO
-from app.logger import logger
 from app.models.base import pk_type
 from app.models.document import Document
+from app.models.template import Template, TemplateField
 from app.models.user import User
 from app.schemas.document import (
     DocumentReadDTO,
     DocumentReadMinifiedDTO,
     DocumentWriteDTO,
 )
-from app.services.docx_render import DocxRender
-from app.services.pdf_converter import PdfConverter
+from app.services.field_validator import FieldMaskValidator
+from app.services.render import RenderService
+from app.services.render_plan import RenderPlan
 from app.services.template import TemplateService
 
 # from icecream import ic
@@ -32,20 +34,29 @@ class DocumentService:
     DOCX_FILENAME_FORMAT = "tpl_{id}.docx"
     THUMBNAIL_FILENAME_FORMAT = "thumbnail_{id}.png"
     PREVIEW_FILENAME_FORMAT = "{name}_preview.{ext}"
+    MERGED_FILENAME_FORMAT = "documents_{count}.{ext}"
     THUMBNAIL_WIDTH = settings.THUMBNAIL_WIDTH
     THUMBNAIL_HEIGHT = settings.THUMBNAIL_HEIGHT
 
     @classmethod
-    async def _check_document_consistency(cls, dto: DocumentWriteDTO) -> None:
+    async def _check_document_consistency(
+        cls, dto: DocumentWriteDTO
+    ) -> Template:
         """Проверка согласованности полей в запросе создания документа.
 
-        Все поля должны принадлежать заданному существующему шаблону.
+        Все поля должны принадлежать заданному существующему шаблону,
+        а их значения - соответствовать маскам типов полей.
 
         Args:
             dto: объект для создания документа.
 
+        Returns:
+            Template: шаблон документа.
+
         Raises:
             DocumentConflictException: несогласованность полей.
+            DocumentFieldValidationException: значения не соответствуют
+                маскам, detail - список ошибок по полям.
         """
         # проверка, что шаблон с заданным template_id существут
         try:
@@ -68,6 +79,12 @@ class DocumentService:
                     fields=wrong_field_ids, tpl=dto.template_id
                 )
             )
+        if errors := FieldMaskValidator.validate(
+            {field.id: field for field in tpl_obj.fields},
+            (field.model_dump() for field in dto.fields),
+        ):
+            raise DocumentFieldValidationException(detail=errors)
+        return tpl_obj
 
     @classmethod
     def _update_fields_document_id(
@@ -82,6 +99,7 @@ class DocumentService:
 
         Returns:
             Преобразованный список полей. Исключены все поля с "value"=None
+            и без элементов "items"
             Каждый элемент fields преобразуется к виду::
 
             {
@@ -94,7 +112,7 @@ class DocumentService:
         for field in fields:
             field["template_field_id"] = field.pop("field_id")
             field["document_id"] = document_id
-            if field["value"] is not None:
+            if field["value"] is not None or field.get("items"):
                 updated_fields.append(field)
         return updated_fields
 
@@ -102,34 +120,41 @@ class DocumentService:
     def _model_as_dto(cls, obj: Document) -> DocumentReadDTO:
         """Преобразование модели документа в DTO для выдачи.
 
+        DTO проверяется pydantic один раз по словарю только из значений
+        схемы ответа.
+
         Args:
             obj: Объект модели документа.
 
         Returns:
             Объект типа DocumentReadDto.
         """
-        groups_dicts = {
-            group.id: group.to_dict() for group in obj.template.groups
-        }
-        field_values = {
-            field.template_field_id: field.value for field in obj.fields
-        }
-        ungrouped_fields = []
-        for field in obj.template.fields:
-            field_dict = field.to_dict()
-            field_dict["type"] = field.type.type
-            field_dict["mask"] = field.type.mask
-            field_dict["value"] = field_values.get(field.id, "")
-            group_dict = groups_dicts.get(field.group_id)
-            if group_dict:
-                group_dict.setdefault("fields", []).append(field_dict)
-            else:
-                ungrouped_fields.append(field_dict)
-        obj_dict = obj.to_dict()
-        obj_dict["template_title"] = obj.template.title
-        obj_dict["grouped_fields"] = groups_dicts.values()
-        obj_dict["ungrouped_fields"] = ungrouped_fields
-        return DocumentReadDTO.model_validate(obj_dict)
+        doc_values = obj.values_by_field_id()
+
+        def field_as_dict(field: TemplateField) -> Dict[str, Any]:
+            field_dict = TemplateService.field_as_dict(field)
+            value, items = doc_values.get(field.id, ("", None))
+            field_dict["value"] = value
+            field_dict["items"] = items
+            return field_dict
+
+        grouped_fields, ungrouped_fields = TemplateService.fields_as_dicts(
+            obj.template, field_as_dict
+        )
+        return DocumentReadDTO.model_validate(
+            {
+                "id": obj.id,
+                "description": obj.description,
+                "template_id": obj.template_id,
+                "template_title": obj.template.title,
+                "created_at": obj.created_at,
+                "updated_at": obj.updated_at,
+                "owner_id": obj.owner_id,
+                "completed": obj.completed,
+                "grouped_fields": grouped_fields,
+                "ungrouped_fields": ungrouped_fields,
+            }
+        )
 
     @classmethod
     async def add(
@@ -152,16 +177,24 @@ class DocumentService:
         if not owner.is_active:
             raise DocumentAccessDeniedException()
         # проверка консистентности (template_id и field_id)
-        await cls._check_document_consistency(dto)
+        tpl_obj = await cls._check_document_consistency(dto)
 
         obj_dict = dto.model_dump()
         obj_dict["owner_id"] = owner.id
+        # документ генерируется по текущей версии файла шаблона
+        obj_dict["template_version_id"] = tpl_obj.version_id
         fields = obj_dict.pop("fields")
-        # создание документа (без полей)
-        document = await DocumentDAO.create(**obj_dict)
-        # создание полей
-        fields = cls._update_fields_document_id(fields, document.id)
-        await DocumentFieldDAO.create_list(fields)
+        if settings.DOCUMENT_FIELDS_STORAGE == DocumentFieldsStorage.JSONB:
+            # создание документа со значениями полей одной строкой
+            obj_dict["field_values"] = Document.dump_field_values(fields)
+            document = await DocumentDAO.create(**obj_dict)
+        else:
+            # создание документа (без полей)
+            document = await DocumentDAO.create(**obj_dict)
+            # создание полей
+            fields = cls._update_fields_document_id(fields, document.id)
+            await DocumentFieldDAO.create_list(fields)
+        await DocumentDAO.update_search_vector(document.id)
         return document.id
 
     @classmethod
@@ -222,9 +255,79 @@ class DocumentService:
         if not user:
             return []
         obj_sequence = await DocumentDAO.get_all(owner_id=user.id, **filter_by)
+        return cls._models_as_minified_dto(obj_sequence)
+
+    @classmethod
+    async def get_all_by_field_value(
+        cls, user: User, field_id: pk_type, value: str
+    ) -> List[DocumentReadMinifiedDTO]:
+        """Возвращает документы пользователя, в которых поле шаблона
+        имеет заданное значение, в сокращенном виде.
+
+        Args:
+            user: пользователь автор документов.
+            field_id: идентификатор поля шаблона.
+            value: значение поля.
+
+        Returns:
+            list[DocumentReadMinifiedDTO]: список документов.
+        """
+        if not user:
+            return []
+        obj_sequence = await DocumentDAO.get_all_by_field_value(
+            field_id, value, owner_id=user.id
+        )
+        return cls._models_as_minified_dto(obj_sequence)
+
+    @classmethod
+    async def search(
+        cls,
+        user: User,
+        query: str,
+        limit: int = settings.SEARCH_PAGE_SIZE,
+        offset: int = 0,
+    ) -> List[DocumentReadMinifiedDTO]:
+        """Полнотекстовый поиск документов пользователя по описанию и
+        значениям полей.
+
+        Args:
+            user: пользователь автор документов.
+            query: строка поиска, слова совпадают по префиксу.
+            limit: количество документов на странице.
+            offset: количество пропускаемых документов.
+
+        Returns:
+            list[DocumentReadMinifiedDTO]: документы в порядке убывания
+                релевантности.
+        """
+        ts_query = prefix_tsquery(query, settings.SEARCH_MAX_TERMS)
+        if not user or ts_query is None:
+            return []
+        obj_sequence = await DocumentDAO.search(
+            ts_query, limit, offset, owner_id=user.id
+        )
+        return cls._models_as_minified_dto(obj_sequence)
+
+    @classmethod
+    def _models_as_minified_dto(
+        cls, obj_sequence: Sequence[Document]
+    ) -> List[DocumentReadMinifiedDTO]:
+        """Преобразование документов в DTO без описания полей.
+
+        Значения полей (field_values) в списках не загружаются.
+        """
         return [
             DocumentReadMinifiedDTO.model_validate(
-                obj.to_dict() | {"template_title": obj.template.title}
+                {
+                    "id": obj.id,
+                    "description": obj.description,
+                    "template_id": obj.template_id,
+                    "template_title": obj.template.title,
+                    "created_at": obj.created_at,
+                    "updated_at": obj.updated_at,
+                    "owner_id": obj.owner_id,
+                    "completed": obj.completed,
+                }
             )
             for obj in obj_sequence
         ]
@@ -277,29 +380,42 @@ class DocumentService:
         if obj_db.owner_id != user.id:
             raise DocumentAccessDeniedException()
         # проверка консистентности (template_id и field_id)
-        await cls._check_document_consistency(dto)
+        tpl_obj = await cls._check_document_consistency(dto)
         obj_dict = dto.model_dump()
         obj_dict["owner_id"] = user.id
+        if obj_db.template_id != tpl_obj.id:
+            # версия закрепляется заново только при смене шаблона
+            obj_dict["template_version_id"] = tpl_obj.version_id
         fields = obj_dict.pop("fields")
-        # обновление свойств документа
-        await DocumentDAO.update_(id, **obj_dict)
-        # удаление старых полей
-        await DocumentFieldDAO.delete_all(document_id=id)
-        # создание новых полей
-        fields = cls._update_fields_document_id(fields, id)
-        await DocumentFieldDAO.create_list(fields)
+        if settings.DOCUMENT_FIELDS_STORAGE == DocumentFieldsStorage.JSONB:
+            # обновление свойств и значений полей одним запросом
+            obj_dict["field_values"] = Document.dump_field_values(fields)
+            await DocumentDAO.update_(id, **obj_dict)
+            if obj_db.field_values is None:
+                # перевод документа из строк document_field
+                await DocumentFieldDAO.delete_all(document_id=id)
+        else:
+            # обновление свойств документа
+            obj_dict["field_values"] = None
+            await DocumentDAO.update_(id, **obj_dict)
+            # удаление старых полей
+            await DocumentFieldDAO.delete_all(document_id=id)
+            # создание новых полей
+            fields = cls._update_fields_document_id(fields, id)
+            await DocumentFieldDAO.create_list(fields)
+        await DocumentDAO.update_search_vector(id)
         document = await DocumentDAO.get_by_id(id)
         return cls._model_as_dto(document)
 
     @classmethod
     async def get_file(
-        cls, id: pk_type, user: User, pdf: bool = False
+        cls, id: pk_type, user: User, fmt: str = FileFormat.DOCX
     ) -> Tuple[BytesIO, str]:
-        """Возвращает документ с заполненными полями в формате docx или pdf.
+        """Возвращает документ с заполненными полями в формате docx/pdf/html.
 
         Args:
             id: Идентификатор документа.
-            pdf: True для формата pdf, False для формата docx.
+            fmt: Формат файла (docx, pdf, html).
             user: Пользователь для которого генерируется документ.
 
         Returns:
@@ -315,44 +431,109 @@ class DocumentService:
             TemplatePdfConvertErrorException: при ошибках генерации pdf.
 
         """
+        plan = await cls._get_for_render(id, user)
+        (
+            docx_path,
+            context,
+            context_default,
+            engine,
+            version,
+        ) = cls._render_args(plan)
+        buffer, ext = await RenderService.get_partial(
+            docx_path,
+            context,
+            context_default,
+            fmt,
+            settings.PDF_FALLBACK_TO_DOCX,
+            engine,
+            version,
+        )
+        filename = cls.PREVIEW_FILENAME_FORMAT.format(name=plan.name, ext=ext)
+        return buffer, filename
+
+    @classmethod
+    async def get_merged_file(
+        cls, ids: List[pk_type], user: User, fmt: str = FileFormat.DOCX
+    ) -> Tuple[BytesIO, str]:
+        """Возвращает несколько документов, объединенных в один файл.
+
+        Документы генерируются параллельно и объединяются в заданном
+        порядке, каждый с новой страницы. Для pdf выполняется одна
+        конвертация объединенного документа.
+
+        Args:
+            ids: Идентификаторы документов в порядке объединения.
+            user: Пользователь для которого генерируется файл.
+            fmt: Формат файла (docx, pdf, html).
+
+        Returns:
+            (file (BytesIO), filename (str)): сгенерированный файл и имя.
+
+        Raises:
+            DocumentConflictException: если список ids пуст.
+            DocumentNotFoundException: если документ из ids отсутствует.
+            DocumentAccessDeniedException: если пользователь не активен или
+                не является автором одного из документов.
+            TemplateRenderErrorException: при ошибках генерации docx.
+            TemplatePdfConvertErrorException: при ошибках генерации pdf.
+        """
+        if not ids:
+            raise DocumentConflictException(
+                detail=Messages.DOCUMENT_MERGE_EMPTY
+            )
+        plans = [await cls._get_for_render(id, user) for id in ids]
+        parts = [cls._render_args(plan) for plan in plans]
+        buffer, ext = await RenderService.merge(
+            parts, fmt, settings.PDF_FALLBACK_TO_DOCX
+        )
+        filename = cls.MERGED_FILENAME_FORMAT.format(count=len(ids), ext=ext)
+        return buffer, filename
+
+    @classmethod
+    async def _get_for_render(cls, id: pk_type, user: User) -> RenderPlan:
+        """План генерации документа с проверкой прав пользователя.
+
+        Загружаются только данные, необходимые для генерации (один запрос).
+
+        Raises:
+            DocumentNotFoundException: если документ отсутствует.
+            DocumentAccessDeniedException: если пользователь не активен или
+                не является автором документа.
+        """
         if not user.is_active:
             raise DocumentAccessDeniedException()
-        doc = await cls.get_or_raise_not_found(id)
-        if not doc:
+        plan = RenderPlan.from_rows(await DocumentDAO.get_render_plan(id))
+        if not plan:
             raise DocumentNotFoundException()
-        if doc.owner_id != user.id:
+        if plan.owner_id != user.id:
             raise DocumentAccessDeniedException()
-        field_values = {
-            field.template_field_id: field.value
-            for field in doc.fields
-            if field.value is not None
-        }
-        context = {
-            field.tag: value
-            for field in doc.template.fields
-            if (value := field_values.get(field.id))
-        }
-        context_default = {
-            field.tag: field.default or field.name
-            for field in doc.template.fields
-        }
-        docx_path = doc.template.filename
-        try:
-            docx = DocxRender(docx_path)
-            buffer = docx.get_partial(context, context_default)
-        except Exception as e:
-            logger.exception(e)
+        return plan
+
+    @classmethod
+    def _render_args(
+        cls, plan: RenderPlan
+    ) -> Tuple[str, Dict[str, Any], Dict[str, Any], str, Optional[pk_type]]:
+        """Аргументы генерации документа.
+
+        Returns:
+            (путь к docx шаблона, context, context_default, движок генерации,
+            версия файла шаблона)
+
+        Raises:
+            TemplateRenderErrorException: если у шаблона нет docx файла.
+        """
+        if not plan.docx_path:
             raise TemplateRenderErrorException()
-        filename = cls.PREVIEW_FILENAME_FORMAT.format(
-            name=doc.description, ext="docx"
+        context = {}
+        for field in plan.fields:
+            if (doc_value := plan.values.get(field.id)) and (
+                value := TemplateService.field_context_value(field, *doc_value)
+            ):
+                context[field.tag] = value
+        return (
+            plan.docx_path,
+            context,
+            TemplateService.context_default(plan.fields),
+            plan.engine,
+            plan.version_id,
         )
-        if pdf:
-            try:
-                buffer = PdfConverter.docx_to_pdf(buffer)
-                filename = cls.PREVIEW_FILENAME_FORMAT.format(
-                    name=doc.description, ext="pdf"
-                )
-            except Exception as e:
-                logger.exception(e)
-                raise TemplatePdfConvertErrorException()
-        return buffer, filename
@@ -0,0 +1,218 @@
+import base64
+import html
+from io import BytesIO
+from typing import Callable, Final, Iterable, List, Optional, Tuple
+
+from docx import Document
+from docx.enum.text import WD_ALIGN_PARAGRAPH, WD_COLOR_INDEX
+from docx.oxml.ns import qn
+from docx.oxml.simpletypes import ST_Merge
+from docx.table import Table, _Cell
+from docx.text.hyperlink import Hyperlink
+from docx.text.paragraph import Paragraph
+from docx.text.run import Run
+
+# Соответствие цветов выделения docx цветам css
+HIGHLIGHT_COLORS: Final = {
+    WD_COLOR_INDEX.YELLOW: "yellow",
+    WD_COLOR_INDEX.BRIGHT_GREEN: "lime",
+    WD_COLOR_INDEX.TURQUOISE: "aqua",
+    WD_COLOR_INDEX.PINK: "fuchsia",
+    WD_COLOR_INDEX.BLUE: "blue",
+    WD_COLOR_INDEX.RED: "red",
+    WD_COLOR_INDEX.DARK_BLUE: "navy",
+    WD_COLOR_INDEX.TEAL: "teal",
+    WD_COLOR_INDEX.GREEN: "green",
+    WD_COLOR_INDEX.VIOLET: "purple",
+    WD_COLOR_INDEX.DARK_RED: "maroon",
+    WD_COLOR_INDEX.DARK_YELLOW: "olive",
+    WD_COLOR_INDEX.GRAY_25: "silver",
+    WD_COLOR_INDEX.GRAY_50: "gray",
+    WD_COLOR_INDEX.BLACK: "black",
+    WD_COLOR_INDEX.WHITE: "white",
+}
+
+ALIGNMENTS: Final = {
+    WD_ALIGN_PARAGRAPH.CENTER: "center",
+    WD_ALIGN_PARAGRAPH.RIGHT: "right",
+    WD_ALIGN_PARAGRAPH.JUSTIFY: "justify",
+}
+
+EMU_PER_PX: Final = 9525
+
+
+class DocxHtmlConverter:
+    """Конвертация docx документа в html для предпросмотра на экране.
+
+    Конвертер не использует libreoffice и поддерживает только то, что
+    важно для предпросмотра: абзацы и заголовки, начертание и выделение
+    прогонов, таблицы (включая объединенные и вложенные), колонтитулы
+    первого раздела и встроенные изображения. Результат - фрагмент html
+    (без <html>/<body>), пригодный для вставки в страницу.
+    """
+
+    ROOT_OPEN_TAG: Final = (
+        '<div class="docx-preview" style="white-space:pre-wrap">'
+    )
+
+    @classmethod
+    def convert(cls, docx_file: BytesIO) -> str:
+        """Конвертирует docx файл в html фрагмент.
+
+        Args:
+            docx_file: содержимое docx файла.
+
+        Returns:
+            str: html фрагмент документа.
+        """
+        docx = Document(docx_file)
+        parts = [cls.ROOT_OPEN_TAG]
+        if docx.sections:
+            section = docx.sections[0]
+            if not section.header.is_linked_to_previous:
+                parts.append('<header class="docx-header">')
+                parts.extend(cls._blocks(section.header.iter_inner_content()))
+                parts.append("</header>")
+        parts.extend(cls._blocks(docx.iter_inner_content()))
+        if docx.sections:
+            section = docx.sections[0]
+            if not section.footer.is_linked_to_previous:
+                parts.append('<footer class="docx-footer">')
+                parts.extend(cls._blocks(section.footer.iter_inner_content()))
+                parts.append("</footer>")
+        parts.append("</div>")
+        return "".join(parts)
+
+    @classmethod
+    def _blocks(cls, blocks: Iterable[Paragraph | Table]) -> List[str]:
+        """Конвертирует последовательность абзацев и таблиц."""
+        parts = []
+        for block in blocks:
+            if isinstance(block, Paragraph):
+                parts.append(cls.convert_paragraph(block))
+            else:
+                parts.append(cls.convert_table(block))
+        return parts
+
+    @classmethod
+    def convert_paragraph(cls, paragraph: Paragraph) -> str:
+        """Конвертирует абзац документа в html."""
+        tag = "p"
+        style_name = paragraph.style.name if paragraph.style else ""
+        if style_name == "Title":
+            tag = "h1"
+        elif style_name.startswith("Heading "):
+            level = style_name.rsplit(" ", 1)[-1]
+            if level.isdigit() and 1 <= int(level) <= 6:
+                tag = f"h{level}"
+        style = ""
+        if align := ALIGNMENTS.get(paragraph.alignment):
+            style = f' style="text-align:{align}"'
+        content = "".join(
+            cls._hyperlink(item)
+            if isinstance(item, Hyperlink)
+            else cls._run(item)
+            for item in paragraph.iter_inner_content()
+        )
+        return f"<{tag}{style}>{content or '<br>'}</{tag}>"
+
+    @classmethod
+    def _hyperlink(cls, hyperlink: Hyperlink) -> str:
+        content = "".join(cls._run(run) for run in hyperlink.runs)
+        if not hyperlink.address:
+            return content
+        href = html.escape(hyperlink.url, quote=True)
+        return f'<a href="{href}">{content}</a>'
+
+    @classmethod
+    def _run(cls, run: Run) -> str:
+        content = html.escape(run.text).replace("\n", "<br>")
+        content += "".join(cls._images(run))
+        if not content:
+            return ""
+        font = run.font
+        styles = []
+        if font.highlight_color in HIGHLIGHT_COLORS:
+            styles.append(
+                f"background-color:{HIGHLIGHT_COLORS[font.highlight_color]}"
+            )
+        if font.color is not None and font.color.type is not None:
+            if font.color.rgb is not None:
+                styles.append(f"color:#{font.color.rgb}")
+        if font.size is not None:
+            styles.append(f"font-size:{font.size.pt:g}pt")
+        if run.bold:
+            content = f"<b>{content}</b>"
+        if run.italic:
+            content = f"<i>{content}</i>"
+        if run.underline:
+            content = f"<u>{content}</u>"
+        if font.strike:
+            content = f"<s>{content}</s>"
+        if styles:
+            content = f'<span style="{";".join(styles)}">{content}</span>'
+        return content
+
+    @classmethod
+    def _images(cls, run: Run) -> Iterable[str]:
+        """Встроенные изображения прогона в виде data uri."""
+        for drawing in run._r.iter(qn("w:drawing")):
+            extent = next(drawing.iter(qn("wp:extent")), None)
+            size = ""
+            if extent is not None:
+                width = int(extent.get("cx", 0)) // EMU_PER_PX
+                height = int(extent.get("cy", 0)) // EMU_PER_PX
+                size = f' width="{width}" height="{height}"'
+            for blip in drawing.iter(qn("a:blip")):
+                rel_id = blip.get(qn("r:embed"))
+                image_part = run.part.related_parts.get(rel_id)
+                if image_part is None:
+                    continue
+                data = base64.b64encode(image_part.blob).decode("ascii")
+                yield (
+                    f'<img src="data:{image_part.content_type};base64,{data}"'
+                    f"{size}>"
+                )
+
+    @classmethod
+    def convert_table(
+        cls,
+        table: Table,
+        cell_renderer: Optional[Callable[[_Cell], Tuple[str, str]]] = None,
+    ) -> str:
+        """Конвертирует таблицу документа в html.
+
+        Args:
+            table: таблица документа.
+            cell_renderer: функция, возвращающая для ячейки дополнительные
+                атрибуты <td> и ее содержимое (по умолчанию содержимое
+                ячейки конвертируется как есть).
+        """
+        parts = ['<table class="docx-table">']
+        for tr in table._tbl.tr_lst:
+            parts.append("<tr>")
+            for tc in tr.tc_lst:
+                if tc.vMerge == ST_Merge.CONTINUE:
+                    continue
+                attrs = ""
+                if tc.grid_span > 1:
+                    attrs += f' colspan="{tc.grid_span}"'
+                if tc.vMerge == ST_Merge.RESTART:
+                    rowspan = tc.bottom - tc.top
+                    if rowspan > 1:
+                        attrs += f' rowspan="{rowspan}"'
+                cell = _Cell(tc, table)
+                if cell_renderer:
+                    extra_attrs, content = cell_renderer(cell)
+                    attrs += extra_attrs
+                else:
+                    content = cls.convert_cell(cell)
+                parts.append(f"<td{attrs}>{content}</td>")
+            parts.append("</tr>")
+        parts.append("</table>")
+        return "".join(parts)
+
+    @classmethod
+    def convert_cell(cls, cell: _Cell) -> str:
+        """Конвертирует содержимое ячейки таблицы в html (без <td>)."""
+        return "".join(cls._blocks(cell.iter_inner_content()))
@@ -0,0 +1,78 @@
+from copy import deepcopy
+from io import BytesIO
+from typing import BinaryIO, Final, Optional
+
+from docx import Document
+from docx.document import Document as DocumentObject
+from docx.enum.section import WD_SECTION
+from docx.oxml.ns import qn
+from docx.section import Section
+from docxcompose.composer import Composer
+
+# Параметры страницы, которые сохраняет каждый объединяемый документ
+PAGE_SETUP_ATTRS: Final = (
+    "orientation",
+    "page_width",
+    "page_height",
+    "left_margin",
+    "right_margin",
+    "top_margin",
+    "bottom_margin",
+    "header_distance",
+    "footer_distance",
+    "gutter",
+)
+
+
+class DocxMerger:
+    """Объединение сгенерированных docx документов в один.
+
+    Документы добавляются по одному по мере готовности (docxcompose).
+    Каждый документ начинается с новой страницы: перед ним закрывается
+    раздел предыдущего документа, поэтому у каждого сохраняются свои
+    размер, ориентация и поля страницы. Колонтитулы берутся из первого
+    документа (docxcompose удаляет ссылки на колонтитулы добавляемых).
+    """
+
+    def __init__(self):
+        self._composer: Optional[Composer] = None
+
+    @classmethod
+    def _close_section(cls, master: DocumentObject) -> None:
+        """Закрывает последний раздел документа разрывом страницы.
+
+        Свойства последнего раздела (w:body/w:sectPr) копируются в
+        последний абзац, а последний раздел начинается с новой страницы.
+        """
+        body = master.element.body
+        sect_pr = body.get_or_add_sectPr()
+        last = sect_pr.getprevious()
+        if (
+            last is None
+            or last.tag != qn("w:p")
+            or last.pPr is not None
+            and last.pPr.sectPr is not None
+        ):
+            last = master.add_paragraph()._p
+        last.get_or_add_pPr()._insert_sectPr(deepcopy(sect_pr))
+        Section(sect_pr, master.part).start_type = WD_SECTION.NEW_PAGE
+
+    def append(self, file: BinaryIO) -> None:
+        """Добавляет документ в конец объединенного документа."""
+        doc = Document(file)
+        if self._composer is None:
+            self._composer = Composer(doc)
+            return
+        master = self._composer.doc
+        self._close_section(master)
+        self._composer.append(doc)
+        target, source = master.sections[-1], doc.sections[-1]
+        for attr in PAGE_SETUP_ATTRS:
+            setattr(target, attr, getattr(source, attr))
+
+    def save(self) -> BytesIO:
+        """Сохраняет объединенный документ."""
+        buffer = BytesIO()
+        self._composer.save(buffer)
+        buffer.seek(0)
+        return buffer
@@ -1,14 +1,34 @@
+import hashlib
+import os
+import re
+from contextlib import contextmanager
+from contextvars import ContextVar
 from io import BytesIO
-from typing import Any, Dict, Final, List, Tuple
+from typing import (
+    Any,
+    Dict,
+    Final,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Set,
+    Tuple,
+)
 
-import docxtpl
 import jinja2
 import pymorphy2
 from docx import Document
 from docx.enum.text import WD_COLOR_INDEX
+from docx.oxml.ns import qn
+from docx.oxml.text.run import CT_R
 from docxtpl import DocxTemplate
 from num2words import num2words
 
+from app.common.cache import TTLCache
+from app.config import settings
+from app.services.docx_zip import RENDERED_RELTYPES, DocxZipWriter
+
 morph = pymorphy2.MorphAnalyzer()
 
 
@@ -24,6 +44,110 @@ class InflectCase:
     voct: Final[str] = "voct"  # звательный
 
 
+class FieldPlaceholder(str):
+    """Заглушка незаполненного значения списочного или табличного поля.
+
+    Пользовательские фильтры к заглушкам не применяются.
+    """
+
+
+class TableRow(dict):
+    """Строка табличного поля вида {столбец: значение}.
+
+    Столбцы доступны в шаблоне как атрибуты: {{ items.price }}.
+    Для отсутствующих столбцов возвращается пустая строка, а в строке
+    заглушке (черновик, незаполненное поле) - "<поле>.<столбец>".
+    """
+
+    # ключ заглушки недоступен из шаблона как атрибут
+    PLACEHOLDER_KEY: Final = ""
+
+    @classmethod
+    def placeholder(cls, name: str) -> "TableRow":
+        """Строка заглушка для поля с наименованием name."""
+        return cls({cls.PLACEHOLDER_KEY: name})
+
+    def __missing__(self, column: str) -> str:
+        name = self.get(self.PLACEHOLDER_KEY)
+        if name is None:
+            return ""
+        return FieldPlaceholder(f"{name}.{column}")
+
+    def __str__(self) -> str:
+        return ", ".join(
+            str(value)
+            for column, value in self.items()
+            if column != self.PLACEHOLDER_KEY
+        )
+
+
+# Строки таблиц и абзацы без вложенных строк/абзацев того же вида
+_ROW_RE = re.compile(r"<w:tr[ >](?:(?!<w:tr[ >]).)*?</w:tr>", re.DOTALL)
+_PARAGRAPH_RE = re.compile(r"<w:p[ >](?:(?!<w:p[ >]).)*?</w:p>", re.DOTALL)
+# Переменная цикла по элементам списочного поля
+LOOP_VARIABLE: Final = "item_"
+
+
+def expand_list_loops(xml: str, tags: Iterable[str]) -> str:
+    """Размножение строк таблиц и абзацев по элементам списочных полей.
+
+    Строка таблицы (или абзац вне таблицы), в которой есть выражение
+    {{ tag }} или {{ tag.столбец }} для списочного поля tag, оборачивается
+    в цикл jinja по его элементам. Размножение выполняется при генерации
+    одним проходом по тексту xml (как {%tr for %} в docxtpl), без
+    копирования элементов дерева lxml, поэтому время линейно по числу
+    строк. Выражения вида {{ tag|length }} относятся ко всему списку и
+    не размножаются.
+
+    Args:
+        xml: xml части документа после DocxTemplate.patch_xml.
+        tags: тэги полей, значения которых - списки.
+
+    Returns:
+        str: xml с циклами jinja.
+    """
+    tags = sorted(tags, key=len, reverse=True)
+    if not tags:
+        return xml
+    expression = re.compile(
+        r"(\{\{-?\s*)(%s)(?=\s*(?:[.\[]|-?\}\}))"
+        % "|".join(re.escape(tag) for tag in tags)
+    )
+    if not expression.search(xml):
+        return xml
+
+    def expand(match: re.Match) -> str:
+        block = match.group(0)
+        found = expression.search(block)
+        if not found:
+            return block
+        tag = found.group(2)
+        block = expression.sub(
+            lambda m: m.group(1) + LOOP_VARIABLE
+            if m.group(2) == tag
+            else m.group(0),
+            block,
+        )
+        return "{%% for %s in %s %%}%s{%% endfor %%}" % (
+            LOOP_VARIABLE,
+            tag,
+            block,
+        )
+
+    return _PARAGRAPH_RE.sub(expand, _ROW_RE.sub(expand, xml))
+
+
+class ListDocxTemplate(DocxTemplate):
+    """DocxTemplate с размножением строк для списочных полей."""
+
+    def __init__(self, template_file: str):
+        super().__init__(template_file)
+        self.list_tags: Set[str] = set()
+
+    def patch_xml(self, src_xml: str) -> str:
+        return expand_list_loops(super().patch_xml(src_xml), self.list_tags)
+
+
 class CustomFilters:
     """Вспомогательные фильтры шаблонов."""
 
@@ -50,6 +174,7 @@ class CustomFilters:
             not self._enabled
             or tag is None
             or not tag
+            or isinstance(tag, FieldPlaceholder)
             or tag in self._skip_filter_tags
         ):
             return True, tag
@@ -208,7 +333,7 @@ class CustomFilters:
         """Преобразует заданную сумму в представление прописью."""
         if not self._enabled or num is None:
             return f"Прописью({num})"
-        if num in self._skip_filter_tags:
+        if isinstance(num, FieldPlaceholder) or num in self._skip_filter_tags:
             return f"Прописью({num})"
         try:
             roubles = round(float(num), 2)
@@ -246,16 +371,204 @@ class CustomFilters:
         }
 
 
+# Фильтры текущей генерации: общее окружение jinja вызывает их методы
+_current_filters: ContextVar[Optional[CustomFilters]] = ContextVar(
+    "docx_custom_filters", default=None
+)
+
+
+class DocxJinjaEnvironment(jinja2.Environment):
+    """Общее окружение jinja для генерации docx документов.
+
+    docxtpl компилирует xml документа в шаблон jinja при каждой
+    генерации. Окружение кэширует скомпилированные шаблоны в памяти по
+    хэшу исходного текста (т.е. по версии шаблона и варианту разметки),
+    а байт-код сохраняет на диске (FileSystemBytecodeCache), чтобы новые
+    воркеры не компилировали шаблоны повторно.
+
+    Пользовательские фильтры привязываются к генерации через
+    bind_filters: состояние CustomFilters у каждого вызова свое.
+    """
+
+    def __init__(
+        self,
+        cache_size: int = settings.JINJA_TEMPLATE_CACHE_SIZE,
+        cache_ttl: Optional[float] = settings.JINJA_TEMPLATE_CACHE_TTL,
+        bytecode_cache: Optional[jinja2.BytecodeCache] = None,
+    ):
+        super().__init__(bytecode_cache=bytecode_cache)
+        self.filters.update(
+            {
+                name: self._bound_filter(name)
+                for name in CustomFilters().get_filters()
+            }
+        )
+        self._templates: TTLCache[jinja2.Template] = TTLCache(
+            "jinja_templates", cache_size, cache_ttl
+        )
+        self._default_filters = CustomFilters()
+
+    def _bound_filter(self, name: str):
+        def call(*args, **kwargs):
+            filters = _current_filters.get() or self._default_filters
+            return getattr(filters, name)(*args, **kwargs)
+
+        call.__name__ = name
+        return call
+
+    @staticmethod
+    @contextmanager
+    def bind_filters(customfilters: CustomFilters) -> Iterator[None]:
+        """Привязывает фильтры шаблонов к текущей генерации."""
+        token = _current_filters.set(customfilters)
+        try:
+            yield
+        finally:
+            _current_filters.reset(token)
+
+    def _compile_template(self, source: str, key: str) -> jinja2.Template:
+        """Компилирует шаблон, используя байт-код из кэша на диске."""
+        code = None
+        bucket = None
+        if self.bytecode_cache is not None:
+            bucket = self.bytecode_cache.get_bucket(self, key, None, source)
+            code = bucket.code
+        if code is None:
+            code = self.compile(source)
+            if bucket is not None:
+                bucket.code = code
+                self.bytecode_cache.set_bucket(bucket)
+        return self.template_class.from_code(
+            self, code, self.make_globals(None)
+        )
+
+    def from_string(self, source, globals=None, template_class=None):
+        if globals is not None or template_class is not None:
+            return super().from_string(source, globals, template_class)
+        if not isinstance(source, str):
+            return super().from_string(source)
+        key = hashlib.sha1(source.encode("utf-8")).hexdigest()
+        template = self._templates.get(key)
+        if template is None:
+            template = self._compile_template(source, key)
+            self._templates.set(key, template)
+        return template
+
+
+def _create_jinja_env() -> DocxJinjaEnvironment:
+    bytecode_cache = None
+    if settings.JINJA_BYTECODE_CACHE:
+        directory = settings.JINJA_BYTECODE_CACHE_DIR
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        bytecode_cache = jinja2.FileSystemBytecodeCache(directory)
+    return DocxJinjaEnvironment(bytecode_cache=bytecode_cache)
+
+
+jinja_env = _create_jinja_env()
+
+
+# Предопределенное наименование стиля для всех тэгов(переменных) в шаблоне
+TAG_STYLE_NAME: Final = "TemplateTag"
+
+
+def highlight_run(run: CT_R, color: WD_COLOR_INDEX) -> None:
+    """Выделяет прогон заданным цветом."""
+    run.get_or_add_rPr().highlight_val = color
+
+
+class DocxTagIndex:
+    """Индекс тэгов docx документа, построенный за один проход.
+
+    Обходятся все прогоны (w:r) основного документа и колонтитулов в
+    порядке документа, включая вложенные таблицы и надписи (text box).
+    При обходе последовательные прогоны стиля TAG_STYLE_NAME
+    объединяются в один (текст тэга), а для каждого тэга запоминается
+    прогон начала выражения "{{" перед ним. Выделение тэгов после этого
+    сводится к поиску в словаре.
+
+    Attributes:
+        tag_runs: {тэг: прогоны начала выражений с этим тэгом}. Для
+            {{ tag.столбец }} табличных полей ключ - тэг поля.
+        expression_runs: прогоны, содержащие "{{" или "}}".
+    """
+
+    def __init__(self, docx: Document, style_name: str = TAG_STYLE_NAME):
+        self.tag_runs: Dict[str, List[CT_R]] = {}
+        self.expression_runs: List[CT_R] = []
+        try:
+            style_id = docx.styles[style_name].style_id
+        except KeyError:  # в шаблоне нет стиля тэгов
+            style_id = None
+        for element in self._part_elements(docx):
+            self._index_part(element, style_id)
+
+    @staticmethod
+    def _part_elements(docx: Document) -> Iterator[Any]:
+        """Корневые элементы основного документа и колонтитулов."""
+        document_part = docx.part
+        yield document_part.element
+        for rel in document_part.rels.values():
+            if rel.reltype in RENDERED_RELTYPES and not rel.is_external:
+                yield rel.target_part.element
+
+    def _add_tag(self, run: CT_R, begin: Optional[CT_R]) -> None:
+        """Регистрирует прогон тэга run с прогоном начала выражения begin."""
+        if begin is not None:
+            tag = run.text.split(".")[0]
+            self.tag_runs.setdefault(tag, []).append(begin)
+
+    def _index_part(self, element: Any, style_id: Optional[str]) -> None:
+        """Индексирует прогоны одной части документа."""
+        begin = None  # последний прогон с "{{"
+        tag_run = None  # первый прогон текущей серии прогонов тэга
+        tag_begin = None
+        for run in element.iter(qn("w:r")):
+            if style_id is not None and run.style == style_id:
+                if tag_run is not None:
+                    tag_run.text += run.text
+                    run.clear_content()
+                    continue
+                tag_run, tag_begin = run, begin
+                continue
+            if tag_run is not None:
+                begin = self._close_tag(tag_run, tag_begin, begin)
+                tag_run = None
+            text = run.text
+            if "{{" in text or "}}" in text:
+                self.expression_runs.append(run)
+                if "{{" in text:
+                    begin = run
+        if tag_run is not None:
+            self._close_tag(tag_run, tag_begin, begin)
+
+    def _close_tag(
+        self, run: CT_R, begin: Optional[CT_R], last_begin: Optional[CT_R]
+    ) -> Optional[CT_R]:
+        """Завершает серию прогонов тэга.
+
+        Returns:
+            Последний прогон с "{{" с учетом прогона тэга.
+        """
+        text = run.text
+        if "{{" in text or "}}" in text:
+            self.expression_runs.append(run)
+        if "{{" in text:
+            self._add_tag(run, run)
+            return run
+        self._add_tag(run, begin)
+        return last_begin
+
+
 class DocxRender:
     # Предопределенное наименование стиля для всех тэгов(переменных) в шаблоне
-    TAG_STYLE_NAME: Final = "TemplateTag"
+    TAG_STYLE_NAME: Final = TAG_STYLE_NAME
 
     def __init__(self, template_file_name: str):
         self._template_file_name = template_file_name
-        self._template: DocxTemplate = docxtpl.DocxTemplate(template_file_name)
-        self._jinja_env = jinja2.Environment()
+        self._template = ListDocxTemplate(template_file_name)
+        self._jinja_env = jinja_env
         self._customfilters = CustomFilters()
-        self._jinja_env.filters.update(self._customfilters.get_filters())
 
     def _render_to_file_stream(self, context: Dict[str, str]) -> BytesIO:
         """Генерирует docx документ из шаблона согласно контексту.
@@ -266,9 +579,18 @@ class DocxRender:
         Returns:
             BytesIO: документ после замены в шаблоне всех тегов на значения.
         """
-        self._template.render(context, jinja_env=self._jinja_env)
+        self._template.list_tags = {
+            tag for tag, value in context.items() if isinstance(value, list)
+        }
+        with self._jinja_env.bind_filters(self._customfilters):
+            self._template.render(context, jinja_env=self._jinja_env)
         file_stream = BytesIO()
-        self._template.save(file_stream)
+        if settings.DOCX_ZIP_PASSTHROUGH:
+            DocxZipWriter.save(
+                self._template, self._template_file_name, file_stream
+            )
+        else:
+            self._template.save(file_stream)
         file_stream.seek(0)
         return file_stream
 
@@ -325,7 +647,10 @@ class DocxRender:
             default_tags = non_filled_tags & context_default.keys()
             self._markdown_given_tags(self._template.docx, default_tags)
             for tag in default_tags:
-                self._customfilters._skip_filter_tags.add(context_default[tag])
+                if isinstance(context_default[tag], str):
+                    self._customfilters._skip_filter_tags.add(
+                        context_default[tag]
+                    )
                 context[tag] = context_default[tag]
         self._customfilters.enable(True)
         return self._render_to_file_stream(context)
@@ -343,8 +668,9 @@ class DocxRender:
     def markdown_tags(self, color=WD_COLOR_INDEX.YELLOW):
         """Размечает места тэгов заданным цветом."""
         self._template.init_docx()
-        self._markdown_tag(self._template.docx, color, "{{")
-        self._markdown_tag(self._template.docx, color, "}}")
+        index = DocxTagIndex(self._template.docx)
+        for run in index.expression_runs:
+            highlight_run(run, color)
         # self._template.is_rendered = True
 
     def _docx_paragraphs(self, docx: Document):
@@ -357,34 +683,12 @@ class DocxRender:
                     for p in cell.paragraphs:
                         yield p
 
-    def _docx_runs(self, docx: Document):
-        """Генератор по всем прогонам (run) документа."""
-        for p in self._docx_paragraphs(docx):
-            for r in p.runs:
-                yield r
-
-    def _combine_styled_tag_runs(self, tag_style, runs):
-        """Объединяет последовательные прогоны стиля tag_style в один."""
-        start_run = None
-        for r in runs:
-            if r.style == tag_style:
-                if start_run:
-                    start_run.text += r.text
-                    r.clear()
-                else:
-                    start_run = r
-            else:
-                start_run = None
-
     def prepare_template(self):
         """Подготовка шаблона к использованию (объединение прогонов)."""
         self._template.init_docx()
         docx = self._template.docx
-        tag_style = docx.styles[self.TAG_STYLE_NAME]
-        # self._print_document_runs(docx)
-        runs = list(self._docx_runs(docx))
         # Объединение последовательных прогонов с тэгами в один
-        self._combine_styled_tag_runs(tag_style, runs)
+        DocxTagIndex(docx)
         docx.save(self._template_file_name)
 
     def _markdown_given_tags(
@@ -397,22 +701,11 @@ class DocxRender:
             tags (list[str]): список тэгов, который должны быть промаркированы.
             color: цвет для маркировки тэгов.
         """
-
-        def markdown_tag_begin(i, runs):
-            while i >= 0:
-                if "{{" in runs[i].text:
-                    runs[i].font.highlight_color = color
-                    return
-                i -= 1
-
-        tags_set = set(tags)
-        tag_style = docx.styles[self.TAG_STYLE_NAME]
-        runs = list(self._docx_runs(docx))
         # TODO: подготовка должна быть выполнена при загрузке шаблона в базу
-        self._combine_styled_tag_runs(tag_style, runs)
-        for i, r in enumerate(runs):
-            if r.style == tag_style and r.text in tags_set:
-                markdown_tag_begin(i, runs)
+        index = DocxTagIndex(docx)
+        for tag in tags:
+            for run in index.tag_runs.get(tag, ()):
+                highlight_run(run, color)
 
     def _print_document_runs(self, docx: Document):
         """Анализ документа: печать всех его прогонов (run)"""
@@ -427,11 +720,3 @@ class DocxRender:
                     invalid_runs.append(r.text)
         if invalid_runs:
             print("Invalid runs: ", invalid_runs)
-
-    def _markdown_tag(self, docx: Document, color, tag: str = "{{"):
-        """
-        Подсветка заданного тега в документе при помощи заданного цвета.
-        """
-        for r in self._docx_runs(docx):
-            if tag in r.text:
-                r.font.highlight_color = color
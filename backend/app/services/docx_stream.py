@@ -0,0 +1,536 @@
+import json
+import os
+import re
+import zipfile
+from io import BytesIO
+from typing import Any, Dict, Final, List, Optional, Set
+
+import jinja2
+from docx import Document
+from docx.enum.text import WD_COLOR_INDEX
+from docx.oxml.ns import qn
+from docxtpl import DocxTemplate
+
+from app.common.cache import TTLCache
+from app.config import settings
+from app.logger import logger
+from app.services.docx_render import (
+    CustomFilters,
+    DocxRender,
+    DocxTagIndex,
+    highlight_run,
+    jinja_env,
+)
+from app.services.docx_zip import DocxZipWriter
+
+# Метки слотов и маркировки в xml при компиляции шаблона (символы из
+# области частного использования unicode, в документах не встречаются)
+SLOT_OPEN: Final = "\ue000"
+SLOT_CLOSE: Final = "\ue001"
+VALUE_SEPARATOR: Final = "\ue002"
+EMPTY_VALUE: Final = "\ue003"
+HIGHLIGHT_MARK: Final = "@docx-stream-mark-{}@"
+HIGHLIGHT_XML: Final = '<w:highlight w:val="{}"/>'
+# Символы, которые docxtpl преобразует в разметку (табуляции, переносы)
+LISTING_CHARS: Final = frozenset("\t\n\a\f")
+# Свойства документа, которые docxtpl генерирует как шаблоны jinja
+CORE_PROPERTIES: Final = (
+    "author",
+    "comments",
+    "identifier",
+    "language",
+    "subject",
+    "title",
+)
+
+_SLOT_RE = re.compile(r"{{(.*?)}}", re.DOTALL)
+_PIECE_RE = re.compile(
+    SLOT_OPEN
+    + r"(\d+)"
+    + SLOT_CLOSE
+    + r"|(<w:rPr>)?"
+    + HIGHLIGHT_XML.format(HIGHLIGHT_MARK.format(r"(\d+)"))
+    + r"(</w:rPr>)?"
+)
+_SLOT_MARK_RE = re.compile(SLOT_OPEN + r"(\d+)" + SLOT_CLOSE)
+# Разбор xml так же, как в DocxTemplate.resolve_listing
+_PARAGRAPH_RE = re.compile(r"<w:p(?: [^>]*)?>.*?</w:p>", re.DOTALL)
+_RUN_RE = re.compile(r"<w:r(?: [^>]*)?>.*?</w:r>", re.DOTALL)
+_TEXT_RE = re.compile(r"<w:t(?: [^>]*)?>.*?</w:t>", re.DOTALL)
+# Элемент, ставший пустым после подстановки пустых значений (lxml
+# сериализует пустые элементы в сокращенной форме <w:t/>)
+_EMPTY_ELEMENT_RE = re.compile(
+    r"<([A-Za-z_][\w.:-]*)((?:\s[^<>]*)?)>" + EMPTY_VALUE + r"+</\1>"
+)
+
+# Экранирование значений так же, как при сериализации xml в lxml
+_TEXT_ESCAPES = str.maketrans(
+    {"&": "&amp;", "<": "&lt;", ">": "&gt;", "\r": "&#13;"}
+)
+_ATTR_ESCAPES = str.maketrans(
+    {
+        "&": "&amp;",
+        "<": "&lt;",
+        ">": "&gt;",
+        '"': "&quot;",
+        "\n": "&#10;",
+        "\r": "&#13;",
+        "\t": "&#9;",
+    }
+)
+
+
+class StreamVariant:
+    """Варианты скомпилированного шаблона."""
+
+    DOCUMENT: Final[str] = "document"  # документ без маркировки
+    DRAFT: Final[str] = "draft"  # черновик, все тэги выделены
+    PARTIAL: Final[str] = "partial"  # выделяются незаполненные тэги
+
+
+class NotStreamableError(Exception):
+    """Шаблон не поддерживается потоковым движком."""
+
+
+class _PlanCompiler(DocxTemplate):
+    """DocxTemplate, заменяющий выражения {{ ... }} метками слотов.
+
+    Генерация выполняется обычным конвейером docxtpl (подготовка xml,
+    jinja, исправление таблиц и идентификаторов, сериализация), поэтому
+    статические фрагменты результата совпадают с результатом docxtpl.
+    """
+
+    def __init__(self, template_file: str):
+        super().__init__(template_file)
+        self.slots: List[str] = []
+        self.listing_slots: Set[int] = set()
+
+    def patch_xml(self, src_xml: str) -> str:
+        if SLOT_OPEN in src_xml or VALUE_SEPARATOR in src_xml:
+            raise NotStreamableError("служебные символы в тексте шаблона")
+        xml = super().patch_xml(src_xml)
+        if "{%" in xml or "{#" in xml:
+            raise NotStreamableError("управляющие конструкции jinja")
+        return _SLOT_RE.sub(self._slot, xml)
+
+    def _slot(self, match: re.Match) -> str:
+        self.slots.append(match.group(1).strip())
+        return f"{SLOT_OPEN}{len(self.slots) - 1}{SLOT_CLOSE}"
+
+    def resolve_listing(self, xml: str) -> str:
+        for paragraph in _PARAGRAPH_RE.finditer(xml):
+            for run in _RUN_RE.finditer(paragraph.group(0)):
+                for text in _TEXT_RE.finditer(run.group(0)):
+                    self.listing_slots.update(
+                        int(slot.group(1))
+                        for slot in _SLOT_MARK_RE.finditer(text.group(0))
+                    )
+        return super().resolve_listing(xml)
+
+
+class DocxStreamPlan:
+    """Скомпилированный шаблон: статические фрагменты xml и слоты значений.
+
+    План строится один раз (при загрузке шаблона) и сохраняется рядом с
+    docx файлом. Для каждого варианта генерации хранятся измененные
+    элементы архива в виде списка фрагментов:
+
+    - str: статический фрагмент xml;
+    - ["v", slot, attr]: значение выражения slot (в атрибуте или тексте);
+    - ["h", mark, plain, marked]: выделение прогона для незаполненного
+      тэга (marked) или исходное форматирование (plain).
+    """
+
+    FORMAT: Final = 2
+    PLAN_SUFFIX: Final = ".stream.json"
+
+    _cache: TTLCache["DocxStreamPlan"] = TTLCache(
+        "docx_stream_plan",
+        settings.DOCX_STREAM_PLAN_CACHE_SIZE,
+        settings.DOCX_STREAM_PLAN_CACHE_TTL,
+    )
+
+    def __init__(
+        self,
+        version: Optional[List[int]],
+        tags: List[str],
+        variants: Dict[str, Dict[str, Any]],
+        reason: Optional[str] = None,
+    ):
+        self.version = version
+        self.tags = tags
+        self.variants = variants
+        self.reason = reason
+
+    @property
+    def streamable(self) -> bool:
+        """True, если хотя бы один вариант генерируется потоково."""
+        return bool(self.variants)
+
+    @classmethod
+    def _version(cls, docx_path: str) -> List[int]:
+        stat = os.stat(docx_path)
+        return [stat.st_mtime_ns, stat.st_size]
+
+    @classmethod
+    def plan_path(cls, docx_path: str) -> str:
+        """Путь к файлу плана шаблона."""
+        return f"{docx_path}{cls.PLAN_SUFFIX}"
+
+    @classmethod
+    def _mark_tag_runs(cls, docx: Document) -> List[Dict[str, Any]]:
+        """Метки прогонов, выделяемых для незаполненных тэгов.
+
+        Повторяет DocxRender._markdown_given_tags, но вместо выделения
+        цветом ставит в прогоны уникальные метки, а для каждой метки
+        запоминает тэги, при незаполненности которых она выделяется.
+        """
+        marks, mark_by_run = [], {}
+        for tag, runs in DocxTagIndex(docx).tag_runs.items():
+            for begin in runs:
+                mark = mark_by_run.get(begin)
+                if mark is None:
+                    rPr = begin.rPr
+                    highlight = rPr.highlight if rPr is not None else None
+                    mark = {
+                        "created": rPr is None,
+                        "plain": (
+                            highlight.get(qn("w:val"))
+                            if highlight is not None
+                            else None
+                        ),
+                        "tags": set(),
+                    }
+                    highlight_run(begin, WD_COLOR_INDEX.YELLOW)
+                    begin.rPr.highlight.set(
+                        qn("w:val"), HIGHLIGHT_MARK.format(len(marks))
+                    )
+                    mark_by_run[begin] = mark
+                    marks.append(mark)
+                mark["tags"].add(tag)
+        for mark in marks:
+            mark["tags"] = sorted(mark["tags"])
+        return marks
+
+    @classmethod
+    def _split(cls, xml: str, marks: List[Dict[str, Any]]) -> List[Any]:
+        """Разбивает xml на статические фрагменты, слоты и метки."""
+        pieces, static, pos = [], [], 0
+        for match in _PIECE_RE.finditer(xml):
+            static.append(xml[pos : match.start()])
+            pos = match.end()
+            if match.group(1) is not None:
+                attr = xml.rfind("<", 0, match.start()) > xml.rfind(
+                    ">", 0, match.start()
+                )
+                piece = ["v", int(match.group(1)), attr]
+            else:
+                number = int(match.group(3))
+                mark = marks[number]
+                marked = HIGHLIGHT_XML.format("yellow")
+                plain = ""
+                if mark["created"]:
+                    if not (match.group(2) and match.group(4)):
+                        raise NotStreamableError("неожиданное форматирование")
+                    marked = f"<w:rPr>{marked}</w:rPr>"
+                else:
+                    static.append(match.group(2) or "")
+                    if mark["plain"]:
+                        plain = HIGHLIGHT_XML.format(mark["plain"])
+                piece = ["h", number, plain, marked]
+                if not mark["created"] and match.group(4):
+                    pieces.extend(["".join(static), piece])
+                    static = [match.group(4)]
+                    continue
+            pieces.extend(["".join(static), piece])
+            static = []
+        static.append(xml[pos:])
+        pieces.append("".join(static))
+        pieces = [piece for piece in pieces if piece != ""]
+        for piece in pieces:
+            if isinstance(piece, str) and (
+                SLOT_OPEN in piece or HIGHLIGHT_MARK[:-3] in piece
+            ):
+                raise NotStreamableError("метка вне ожидаемого места")
+        return pieces
+
+    @classmethod
+    def _compile_variant(cls, docx_path: str, variant: str) -> Dict[str, Any]:
+        """Компилирует один вариант генерации шаблона."""
+        template = _PlanCompiler(docx_path)
+        template.init_docx()
+        docx = template.docx
+        marks = []
+        if variant == StreamVariant.DRAFT:
+            for run in DocxTagIndex(docx).expression_runs:
+                highlight_run(run, WD_COLOR_INDEX.YELLOW)
+        elif variant == StreamVariant.PARTIAL:
+            marks = cls._mark_tag_runs(docx)
+        for prop in CORE_PROPERTIES:
+            value = getattr(docx.core_properties, prop) or ""
+            if "{{" in value or "{%" in value:
+                raise NotStreamableError("тэги в свойствах документа")
+        template.render({}, jinja_env=jinja2.Environment())
+        with zipfile.ZipFile(docx_path) as source:
+            if not DocxZipWriter._can_passthrough(template, source):
+                raise NotStreamableError("изменена структура пакета")
+        members = {
+            name: cls._split(data.decode("utf-8"), marks)
+            for name, data in DocxZipWriter._replaced_members(template).items()
+        }
+        return {
+            "slots": template.slots,
+            "listing": sorted(template.listing_slots),
+            "marks": marks,
+            "members": members,
+        }
+
+    @classmethod
+    def build(cls, docx_path: str) -> "DocxStreamPlan":
+        """Компилирует шаблон и сохраняет план рядом с docx файлом.
+
+        Варианты, которые не поддерживаются потоковым движком (например,
+        шаблон с циклами и условиями), в план не включаются и
+        генерируются движком docxtpl.
+
+        Args:
+            docx_path: путь к docx файлу шаблона.
+
+        Returns:
+            DocxStreamPlan: скомпилированный план.
+        """
+        version = cls._version(docx_path)
+        variants, reasons, tags = {}, [], []
+        try:
+            tags = sorted(DocxRender(docx_path).get_tags())
+            for variant in (
+                StreamVariant.DOCUMENT,
+                StreamVariant.DRAFT,
+                StreamVariant.PARTIAL,
+            ):
+                try:
+                    variants[variant] = cls._compile_variant(
+                        docx_path, variant
+                    )
+                except (NotStreamableError, KeyError) as e:
+                    reasons.append(f"{variant}: {e}")
+        except Exception as e:
+            logger.exception(e)
+            variants, reasons = {}, [str(e)]
+        reason = "; ".join(reasons) or None
+        if reason:
+            logger.info(f"{docx_path}: потоковая генерация ({reason})")
+        plan = cls(version, tags, variants, reason)
+        try:
+            with open(cls.plan_path(docx_path), "w", encoding="utf-8") as f:
+                json.dump(plan.as_dict(), f, ensure_ascii=False)
+        except OSError as e:
+            logger.warning(f"План {docx_path} не сохранен: {e}")
+        cls._cache.set((docx_path, tuple(version)), plan)
+        return plan
+
+    @classmethod
+    def load(cls, docx_path: str) -> "DocxStreamPlan":
+        """Возвращает план шаблона (из кэша, файла или компилирует).
+
+        Args:
+            docx_path: путь к docx файлу шаблона.
+
+        Returns:
+            DocxStreamPlan: план, соответствующий текущей версии файла.
+        """
+        version = cls._version(docx_path)
+        key = (docx_path, tuple(version))
+        if (plan := cls._cache.get(key)) is not None:
+            return plan
+        try:
+            with open(cls.plan_path(docx_path), encoding="utf-8") as f:
+                data = json.load(f)
+            if data["format"] == cls.FORMAT and data["version"] == version:
+                plan = cls(
+                    data["version"],
+                    data["tags"],
+                    data["variants"],
+                    data["reason"],
+                )
+                cls._cache.set(key, plan)
+                return plan
+        except (OSError, ValueError, KeyError):
+            pass
+        return cls.build(docx_path)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "format": self.FORMAT,
+            "version": self.version,
+            "tags": self.tags,
+            "variants": self.variants,
+            "reason": self.reason,
+        }
+
+
+class DocxStreamRender:
+    """Потоковый движок генерации документов (интерфейс DocxRender).
+
+    Вместо построения объектной модели python-docx и генерации jinja по
+    всему document.xml документ собирается конкатенацией статических
+    фрагментов плана (DocxStreamPlan) и экранированных значений тэгов.
+    Значения всех тэгов вычисляются одним вызовом jinja, неизмененные
+    элементы архива копируются из шаблона без распаковки.
+
+    Результат совпадает с результатом DocxRender. Отличие: значения
+    экранируются, поэтому символы &, < и > не повреждают документ.
+    Шаблоны с управляющими конструкциями ({% %}), а также значения с
+    табуляциями и переносами строк в тексте генерируются DocxRender.
+    """
+
+    def __init__(self, template_file_name: str):
+        self._template_file_name = template_file_name
+        self._plan = DocxStreamPlan.load(template_file_name)
+        self._jinja_env = jinja_env
+        self._customfilters = CustomFilters()
+
+    def _fallback(self) -> DocxRender:
+        return DocxRender(self._template_file_name)
+
+    def _evaluate(
+        self, slots: List[str], context: Dict[str, str]
+    ) -> Optional[List[str]]:
+        """Вычисляет значения всех слотов одним вызовом jinja.
+
+        Одинаковые выражения (тэг встречается в шаблоне многократно)
+        вычисляются один раз.
+        """
+        if not slots:
+            return []
+        expressions = list(dict.fromkeys(slots))
+        source = VALUE_SEPARATOR.join(
+            "{{ %s }}" % expression for expression in expressions
+        )
+        template = self._jinja_env.from_string(source)
+        with self._jinja_env.bind_filters(self._customfilters):
+            values = template.render(context).split(VALUE_SEPARATOR)
+        if len(values) != len(expressions):
+            return None
+        by_expression = dict(zip(expressions, values))
+        return [by_expression[slot] for slot in slots]
+
+    def _render(
+        self,
+        variant: str,
+        context: Dict[str, str],
+        highlighted_tags: Set[str] = frozenset(),
+    ) -> Optional[BytesIO]:
+        """Генерирует документ по плану или возвращает None.
+
+        None означает, что вариант (или набор значений) не поддерживается
+        потоковой генерацией и документ генерируется DocxRender.
+        """
+        compiled = self._plan.variants.get(variant)
+        # строки списочных полей размножает DocxRender
+        if compiled is None or any(
+            isinstance(value, list) for value in context.values()
+        ):
+            return None
+        values = self._evaluate(compiled["slots"], context)
+        if values is None or any(
+            LISTING_CHARS.intersection(values[slot])
+            for slot in compiled["listing"]
+        ):
+            return None
+        highlighted = {
+            number
+            for number, mark in enumerate(compiled["marks"])
+            if highlighted_tags.intersection(mark["tags"])
+        }
+        collapse = "" in values
+        members = {}
+        for name, pieces in compiled["members"].items():
+            parts = []
+            for piece in pieces:
+                if isinstance(piece, str):
+                    parts.append(piece)
+                elif piece[0] == "v":
+                    value = values[piece[1]]
+                    if piece[2]:
+                        parts.append(value.translate(_ATTR_ESCAPES))
+                    else:
+                        parts.append(
+                            value.translate(_TEXT_ESCAPES) or EMPTY_VALUE
+                        )
+                else:
+                    parts.append(piece[3 if piece[1] in highlighted else 2])
+            xml = "".join(parts)
+            if collapse:
+                xml = _EMPTY_ELEMENT_RE.sub(r"<\1\2/>", xml)
+                xml = xml.replace(EMPTY_VALUE, "")
+            members[name] = xml.encode("utf-8")
+        file_stream = BytesIO()
+        DocxZipWriter.write(self._template_file_name, members, file_stream)
+        file_stream.seek(0)
+        return file_stream
+
+    def get_document(self, context: Dict[str, str]) -> BytesIO:
+        """Генерирует и возвращает документ согласно заданному контексту.
+
+        Args:
+            context: словарь вида {тэг:значение} для генерации документа
+
+        Returns:
+            BytesIO: документ после замены в шаблоне всех тегов на значения.
+        """
+        self._customfilters.enable(True)
+        self._customfilters._skip_filter_tags.clear()
+        file_stream = self._render(StreamVariant.DOCUMENT, context)
+        if file_stream is None:
+            return self._fallback().get_document(context)
+        return file_stream
+
+    def get_draft(self, context: Dict[str, str]) -> BytesIO:
+        """Генерирует и возвращает эскиз документа согласно контексту
+
+        Args:
+            context: словарь вида {тэг:значение} для генерации эскиза.
+
+        Returns:
+            BytesIO: эскиз после замены в шаблоне всех тегов на значения.
+        """
+        self._customfilters.enable(False)
+        file_stream = self._render(StreamVariant.DRAFT, context)
+        if file_stream is None:
+            return self._fallback().get_draft(context)
+        return file_stream
+
+    def get_partial(
+        self, context: Dict[str, str], context_default: Dict[str, str] = None
+    ) -> BytesIO:
+        """Генерирует и возвращает частично заполненный документ.
+
+        Args:
+            context: Словарь значения полей вида {тэг:значение}.
+            context_default: Словарь значений по умолчанию вида
+                {тэг: значение по умолчанию}.
+
+        Returns:
+            BytesIO: Документ после замены в шаблоне всех тегов на значения.
+        """
+        self._customfilters.enable(True)
+        variant, default_tags, values = StreamVariant.DOCUMENT, set(), context
+        if context_default:
+            variant = StreamVariant.PARTIAL
+            non_filled_tags = set(self.get_tags()) - context.keys()
+            default_tags = non_filled_tags & context_default.keys()
+            values = dict(context)
+            for tag in default_tags:
+                self._customfilters._skip_filter_tags.add(context_default[tag])
+                values[tag] = context_default[tag]
+        file_stream = self._render(variant, values, default_tags)
+        if file_stream is None:
+            return self._fallback().get_partial(context, context_default)
+        return file_stream
+
+    def get_tags(self) -> List[str]:
+        """Возвращает список всех тэгов из docx шаблона."""
+        if self._plan.streamable:
+            return self._plan.tags
+        return self._fallback().get_tags()
@@ -0,0 +1,168 @@
+import copy
+import struct
+import zipfile
+from typing import BinaryIO, Dict, Iterator
+
+from docx.opc.constants import RELATIONSHIP_TYPE as RT
+from docx.opc.part import Part
+from docxtpl import DocxTemplate
+
+from app.config import settings
+from app.logger import logger
+
+# Части документа, которые изменяет генерация по шаблону
+RENDERED_RELTYPES = (RT.HEADER, RT.FOOTER)
+
+
+class DocxZipWriter:
+    """Сохранение сгенерированного docx с копированием неизмененных частей.
+
+    DocxTemplate.save заново сериализует и сжимает все части пакета,
+    включая изображения, шрифты и стили, которые генерация не меняет.
+    DocxZipWriter переписывает только измененные xml части (документ,
+    колонтитулы, свойства документа и их связи), а остальные элементы
+    zip архива шаблона копирует в сжатом виде без распаковки.
+    """
+
+    @classmethod
+    def _rendered_parts(cls, template: DocxTemplate) -> Iterator[Part]:
+        """Части пакета, которые могли быть изменены генерацией."""
+        document_part = template.docx.part
+        yield document_part
+        for rel in document_part.rels.values():
+            if rel.reltype in RENDERED_RELTYPES and not rel.is_external:
+                yield rel.target_part
+        package = document_part.package
+        for rel in package.rels.values():
+            if rel.reltype == RT.CORE_PROPERTIES:
+                yield rel.target_part
+
+    @classmethod
+    def _replaced_members(cls, template: DocxTemplate) -> Dict[str, bytes]:
+        """Новое содержимое измененных элементов архива {имя: данные}."""
+        members = {}
+        for part in cls._rendered_parts(template):
+            members[part.partname.membername] = part.blob
+            if part.rels:
+                members[part.partname.rels_uri.membername] = part.rels.xml
+        return members
+
+    @classmethod
+    def _can_passthrough(
+        cls, template: DocxTemplate, source: zipfile.ZipFile
+    ) -> bool:
+        """Проверяет, что структура пакета не изменилась при генерации."""
+        if (
+            template.pics_to_replace
+            or template.crc_to_new_media
+            or template.crc_to_new_embedded
+            or template.zipname_to_replace
+        ):
+            return False
+        names = set(source.namelist())
+        package = template.docx.part.package
+        return all(part.partname.membername in names for part in package.parts)
+
+    @classmethod
+    def _copy_raw(
+        cls,
+        source: zipfile.ZipFile,
+        target: zipfile.ZipFile,
+        info: zipfile.ZipInfo,
+    ) -> None:
+        """Копирует элемент архива в сжатом виде (без распаковки).
+
+        zipfile не предоставляет публичного api для такого копирования,
+        поэтому локальный заголовок и данные элемента записываются
+        напрямую, а элемент регистрируется в каталоге целевого архива.
+        """
+        source.fp.seek(info.header_offset)
+        header = struct.unpack(
+            zipfile.structFileHeader, source.fp.read(zipfile.sizeFileHeader)
+        )
+        source.fp.seek(
+            header[zipfile._FH_FILENAME_LENGTH]
+            + header[zipfile._FH_EXTRA_FIELD_LENGTH],
+            1,
+        )
+        data = source.fp.read(info.compress_size)
+        zinfo = copy.copy(info)
+        zinfo.flag_bits &= ~0x08  # размеры известны, дескриптор не нужен
+        target.fp.seek(target.start_dir)
+        zinfo.header_offset = target.start_dir
+        target.fp.write(zinfo.FileHeader())
+        target.fp.write(data)
+        target.start_dir = target.fp.tell()
+        target.filelist.append(zinfo)
+        target.NameToInfo[zinfo.filename] = zinfo
+        target._didModify = True
+
+    @classmethod
+    def write(
+        cls,
+        template_file: str | BinaryIO,
+        replaced: Dict[str, bytes],
+        out: BinaryIO,
+        compresslevel: int | None = None,
+    ) -> None:
+        """Записывает архив шаблона с заменой заданных элементов.
+
+        Args:
+            template_file: исходный docx файл шаблона (путь или поток).
+            replaced: новое содержимое элементов архива {имя: данные}.
+            out: поток для записи результата (с поддержкой seek/tell).
+            compresslevel: уровень сжатия перезаписываемых частей 0-9
+                (по умолчанию DOCX_COMPRESS_LEVEL).
+        """
+        if compresslevel is None:
+            compresslevel = settings.DOCX_COMPRESS_LEVEL
+        replaced = dict(replaced)
+        with zipfile.ZipFile(template_file) as source, zipfile.ZipFile(
+            out, "w"
+        ) as target:
+            for info in source.infolist():
+                data = replaced.pop(info.filename, None)
+                if data is None:
+                    cls._copy_raw(source, target, info)
+                    continue
+                zinfo = zipfile.ZipInfo(info.filename, info.date_time)
+                zinfo.compress_type = zipfile.ZIP_DEFLATED
+                target.writestr(zinfo, data, compresslevel=compresslevel)
+            for name, data in replaced.items():
+                target.writestr(
+                    name,
+                    data,
+                    compress_type=zipfile.ZIP_DEFLATED,
+                    compresslevel=compresslevel,
+                )
+
+    @classmethod
+    def save(
+        cls,
+        template: DocxTemplate,
+        template_file: str | BinaryIO,
+        out: BinaryIO,
+        compresslevel: int | None = None,
+    ) -> None:
+        """Сохраняет сгенерированный документ.
+
+        Если генерация изменила структуру пакета (добавлены части, заменены
+        изображения), документ сохраняется стандартным DocxTemplate.save.
+
+        Args:
+            template: шаблон после DocxTemplate.render.
+            template_file: исходный docx файл шаблона (путь или поток).
+            out: поток для записи результата (с поддержкой seek/tell).
+            compresslevel: уровень сжатия перезаписываемых частей 0-9
+                (по умолчанию DOCX_COMPRESS_LEVEL).
+        """
+        with zipfile.ZipFile(template_file) as source:
+            passthrough = cls._can_passthrough(template, source)
+        if not passthrough:
+            logger.debug("docx package changed, full save")
+            template.save(out)
+            return
+        cls.write(
+            template_file, cls._replaced_members(template), out, compresslevel
+        )
+        template.is_saved = True
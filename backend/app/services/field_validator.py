@@ -0,0 +1,134 @@
+import re
+from typing import Any, Dict, Iterable, List, Optional, Pattern, Tuple
+
+from app.common.constants import FieldKind, InvalidationEventType, Messages
+from app.common.invalidation import invalidation_bus
+from app.logger import logger
+from app.models.base import pk_type
+from app.models.template import TemplateField, TemplateFieldType
+
+# Маска в виде литерала регулярного выражения javascript: /шаблон/флаги
+_JS_LITERAL_RE = re.compile(r"^/(.*)/([a-z]*)$", re.DOTALL)
+_JS_FLAGS = {"i": re.IGNORECASE, "m": re.MULTILINE, "s": re.DOTALL}
+
+
+class FieldMaskValidator:
+    """Проверка значений полей документа по маскам типов полей.
+
+    Маска типа поля (TemplateFieldType.mask) задается для клиента как
+    регулярное выражение javascript ("/^\\d*$/") или как шаблон без
+    ограничителей. Маски компилируются один раз и кэшируются по id типа.
+    Кэш сбрасывается при изменении типа (событие FIELD_TYPE шины сброса
+    кэшей), а при расхождении маски в кэше и в базе (тип изменен в
+    другом процессе до получения события) маска компилируется заново.
+
+    Значение соответствует маске, если в нем найдено совпадение (как
+    RegExp.test на клиенте). Пустые значения не проверяются. Типы с
+    пустой или некорректной маской значения не ограничивают.
+    """
+
+    _compiled: Dict[pk_type, Tuple[Optional[str], Optional[Pattern]]] = {}
+
+    @classmethod
+    def compile(cls, mask: Optional[str]) -> Optional[Pattern]:
+        """Компилирует маску типа поля.
+
+        Returns:
+            Pattern или None, если маска пустая или некорректная.
+        """
+        if not mask:
+            return None
+        source, flags = mask, 0
+        if match := _JS_LITERAL_RE.match(mask):
+            source = match.group(1)
+            for flag in match.group(2):
+                flags |= _JS_FLAGS.get(flag, 0)
+        try:
+            return re.compile(source, flags)
+        except re.error as e:
+            logger.warning(f"Некорректная маска {mask!r}: {e}")
+            return None
+
+    @classmethod
+    def get_pattern(cls, field_type: TemplateFieldType) -> Optional[Pattern]:
+        """Скомпилированная маска типа поля (из кэша)."""
+        cached = cls._compiled.get(field_type.id)
+        if cached is not None and cached[0] == field_type.mask:
+            return cached[1]
+        pattern = cls.compile(field_type.mask)
+        cls._compiled[field_type.id] = (field_type.mask, pattern)
+        return pattern
+
+    @classmethod
+    def invalidate(cls, type_id: Optional[pk_type] = None) -> None:
+        """Сбрасывает кэш масок типа type_id (всех типов, если None)."""
+        if type_id is None:
+            cls._compiled.clear()
+        else:
+            cls._compiled.pop(type_id, None)
+
+    @classmethod
+    def _values(
+        cls, field: TemplateField, value: Any, items: Any
+    ) -> List[Any]:
+        """Проверяемые значения поля с учетом вида поля."""
+        kind = field.type.kind
+        if kind == FieldKind.SCALAR:
+            return [value]
+        if kind == FieldKind.LIST and items:
+            return list(items)
+        # значения столбцов таблицы не типизированы
+        return []
+
+    @classmethod
+    def validate(
+        cls,
+        fields: Dict[pk_type, TemplateField],
+        values: Iterable[Dict[str, Any]],
+    ) -> List[Dict[str, Any]]:
+        """Проверяет значения полей документа за один проход.
+
+        Args:
+            fields: поля шаблона {id поля: поле}.
+            values: значения полей вида
+                {"field_id": id, "value": значение, "items": элементы}.
+                Поля, отсутствующие в fields, пропускаются (проверяются
+                при проверке согласованности документа).
+
+        Returns:
+            Список ошибок (пустой, если все значения корректны) вида
+            {"field_id": id, "tag": тэг, "msg": сообщение}.
+        """
+        errors = []
+        patterns = {}
+        for field_value in values:
+            field = fields.get(field_value["field_id"])
+            if field is None:
+                continue
+            type_id = field.type_id
+            if type_id not in patterns:
+                patterns[type_id] = cls.get_pattern(field.type)
+            pattern = patterns[type_id]
+            if pattern is None:
+                continue
+            for value in cls._values(
+                field, field_value.get("value"), field_value.get("items")
+            ):
+                if value and not pattern.search(str(value)):
+                    errors.append(
+                        {
+                            "field_id": field.id,
+                            "tag": field.tag,
+                            "msg": Messages.FIELD_VALUE_MISMATCH.format(
+                                value=value, type=field.type.name
+                            ),
+                        }
+                    )
+                    break
+        return errors
+
+
+invalidation_bus.subscribe(
+    InvalidationEventType.FIELD_TYPE,
+    lambda event: FieldMaskValidator.invalidate(event.id),
+)
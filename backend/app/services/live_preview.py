@@ -0,0 +1,386 @@
+import asyncio
+import json
+import re
+from typing import Any, Dict, Final, List, Optional, Set, Tuple
+
+import jinja2
+from docx.oxml import parse_xml
+from docx.oxml.ns import qn
+from docx.oxml.simpletypes import ST_Merge
+from docx.table import Table, _Cell
+from docx.text.paragraph import Paragraph
+from docxtpl import DocxTemplate
+from fastapi import WebSocket, WebSocketDisconnect, status
+from jinja2 import meta
+from lxml import etree
+from starlette.concurrency import run_in_threadpool
+
+from app.common.constants import Messages
+from app.common.exceptions import (
+    TemplateException,
+    TemplateRenderErrorException,
+)
+from app.config import settings
+from app.logger import logger
+from app.models.base import pk_type
+from app.services.docx_html import DocxHtmlConverter
+from app.services.docx_render import CustomFilters, DocxRender
+from app.services.template import TemplateService
+
+# Невидимый разделитель: обрамляет значения по умолчанию (незаполненные
+# поля), чтобы выделить их в html
+UNFILLED_MARK: Final = "\u2063"
+UNFILLED_RE: Final = re.compile(f"{UNFILLED_MARK}(.*?){UNFILLED_MARK}", re.S)
+
+
+class PreviewUnit:
+    """Независимо перегенерируемый фрагмент документа.
+
+    Фрагмент - абзац или ячейка таблицы (kind "p" или "tc"), для шаблонов
+    с управляющими тэгами {% %} - документ целиком (kind "doc").
+    """
+
+    def __init__(
+        self,
+        id: str,
+        kind: str,
+        template: Optional[jinja2.Template] = None,
+        tags: Optional[Set[str]] = None,
+        parent: Any = None,
+    ):
+        self.id = id
+        self.kind = kind
+        self.template = template
+        self.tags = tags or set()
+        self.parent = parent  # объект python-docx, определяющий part
+
+
+class LivePreviewSession:
+    """Сессия живого предпросмотра документа по шаблону.
+
+    При создании шаблон разбирается один раз: каждый абзац и каждая ячейка
+    таблицы компилируются в отдельный jinja шаблон, для них определяется
+    множество используемых тэгов. При изменении значений полей
+    перегенерируются только фрагменты, использующие измененные тэги.
+    Шаблоны с управляющими тэгами ({% if %}, {%tr for %} и т.п.) не
+    разбиваются на фрагменты и перегенерируются целиком.
+
+    Args:
+        docx_path: путь к docx файлу шаблона.
+        fields: словарь вида {field_id: (тэг, значение по умолчанию)}.
+    """
+
+    def __init__(self, docx_path: str, fields: Dict[int, Tuple[str, str]]):
+        self._docx_path = docx_path
+        self._fields = fields
+        self._values: Dict[int, str] = {}
+        self._filters = CustomFilters()
+        self._env = jinja2.Environment(autoescape=True)
+        self._env.filters.update(self._filters.get_filters())
+        self._tpl = DocxTemplate(docx_path)
+        self._tpl.init_docx()
+        self._units: List[PreviewUnit] = []
+        self._cell_units: Dict[Any, PreviewUnit] = {}
+        # (html тэг контейнера, элементы контейнера, родитель python-docx)
+        self._containers: List[Tuple[Optional[str], List[Any], Any]] = []
+        self._whole_document = False
+        self._parse()
+
+    def _parse(self) -> None:
+        docx = self._tpl.docx
+        # (html тэг контейнера, xml, родитель python-docx, префикс id)
+        sources = [(None, self._tpl.get_xml(), docx._body, "b")]
+        if docx.sections:
+            section = docx.sections[0]
+            if not section.header.is_linked_to_previous:
+                xml = self._tpl.get_part_xml(section.header.part)
+                sources.insert(0, ("header", xml, section.header, "h"))
+            if not section.footer.is_linked_to_previous:
+                xml = self._tpl.get_part_xml(section.footer.part)
+                sources.append(("footer", xml, section.footer, "f"))
+        sources = [
+            (tag, self._tpl.patch_xml(xml), parent, prefix)
+            for tag, xml, parent, prefix in sources
+        ]
+        if any("{%" in xml for _, xml, _, _ in sources):
+            self._whole_document = True
+            self._units.append(PreviewUnit("doc", "doc"))
+            return
+        for tag, xml, parent, prefix in sources:
+            root = parse_xml(xml.encode("utf-8"))
+            if (body := root.find(qn("w:body"))) is not None:
+                root = body
+            items = []
+            for i, element in enumerate(root):
+                if element.tag == qn("w:p"):
+                    items.append(
+                        self._add_unit(f"{prefix}{i}", "p", element, parent)
+                    )
+                elif element.tag == qn("w:tbl"):
+                    self._add_cell_units(f"{prefix}{i}", element, parent)
+                    items.append(element)
+            self._containers.append((tag, items, parent))
+
+    def _add_unit(self, id: str, kind: str, element, parent) -> PreviewUnit:
+        source = etree.tostring(element, encoding="unicode")
+        tags = meta.find_undeclared_variables(self._env.parse(source))
+        template = self._env.from_string(source)
+        unit = PreviewUnit(id, kind, template, tags, parent)
+        self._units.append(unit)
+        return unit
+
+    def _add_cell_units(self, table_id: str, tbl, parent) -> None:
+        for row, tr in enumerate(tbl.tr_lst):
+            for col, tc in enumerate(tr.tc_lst):
+                if tc.vMerge == ST_Merge.CONTINUE:
+                    continue
+                self._cell_units[tc] = self._add_unit(
+                    f"{table_id}-{row}-{col}", "tc", tc, parent
+                )
+
+    @property
+    def field_ids(self) -> Set[int]:
+        """Идентификаторы полей шаблона."""
+        return set(self._fields)
+
+    def _context(self) -> Dict[str, str]:
+        """Контекст генерации: значения полей или выделенные умолчания."""
+        context = {}
+        skip_filter_tags = set()
+        for field_id, (tag, default) in self._fields.items():
+            if value := self._values.get(field_id):
+                context[tag] = value
+            else:
+                context[tag] = f"{UNFILLED_MARK}{default}{UNFILLED_MARK}"
+                skip_filter_tags.add(context[tag])
+        self._filters._skip_filter_tags = skip_filter_tags
+        return context
+
+    def _render_unit(self, unit: PreviewUnit, context: Dict[str, str]) -> str:
+        if unit.kind == "doc":
+            context_default = {
+                tag: default for tag, default in self._fields.values()
+            }
+            context = {
+                self._fields[field_id][0]: value
+                for field_id, value in self._values.items()
+                if value
+            }
+            buffer = DocxRender(self._docx_path).get_partial(
+                context, context_default
+            )
+            return DocxHtmlConverter.convert(buffer)
+        xml = unit.template.render(context)
+        element = parse_xml(self._tpl.resolve_listing(xml).encode("utf-8"))
+        if unit.kind == "p":
+            html = DocxHtmlConverter.convert_paragraph(
+                Paragraph(element, unit.parent)
+            )
+        else:
+            html = DocxHtmlConverter.convert_cell(_Cell(element, unit.parent))
+        return UNFILLED_RE.sub(r"<mark>\1</mark>", html)
+
+    def render_all(self) -> str:
+        """Генерирует html документа целиком.
+
+        Каждый фрагмент размечен атрибутом data-block с идентификатором
+        фрагмента (для абзацев - обрамляющий <div>, для ячеек - <td>).
+
+        Raises:
+            TemplateRenderErrorException: при ошибках генерации.
+        """
+        context = self._context()
+
+        def render_cell(cell: _Cell) -> Tuple[str, str]:
+            unit = self._cell_units[cell._tc]
+            html = self._render_unit(unit, context)
+            return f' data-block="{unit.id}"', html
+
+        try:
+            if self._whole_document:
+                html = self._render_unit(self._units[0], context)
+                return f'<div data-block="doc">{html}</div>'
+            parts = [DocxHtmlConverter.ROOT_OPEN_TAG]
+            for tag, items, parent in self._containers:
+                if tag:
+                    parts.append(f'<{tag} class="docx-{tag}">')
+                for item in items:
+                    if isinstance(item, PreviewUnit):
+                        html = self._render_unit(item, context)
+                        parts.append(
+                            f'<div data-block="{item.id}">{html}</div>'
+                        )
+                        continue
+                    parts.append(
+                        DocxHtmlConverter.convert_table(
+                            Table(item, parent), render_cell
+                        )
+                    )
+                if tag:
+                    parts.append(f"</{tag}>")
+            parts.append("</div>")
+            return "".join(parts)
+        except Exception as e:
+            logger.exception(e)
+            raise TemplateRenderErrorException()
+
+    def update(self, values: Dict[int, str]) -> List[Dict[str, str]]:
+        """Применяет новые значения полей и перегенерирует фрагменты.
+
+        Args:
+            values: измененные значения полей вида {field_id: значение}.
+
+        Returns:
+            list[dict]: перегенерированные фрагменты вида
+            {"id": идентификатор фрагмента, "html": содержимое}.
+
+        Raises:
+            TemplateRenderErrorException: при ошибках генерации.
+        """
+        changed_tags = {
+            self._fields[field_id][0]
+            for field_id, value in values.items()
+            if self._values.get(field_id, "") != value
+        }
+        self._values.update(values)
+        if not changed_tags:
+            return []
+        try:
+            context = self._context()
+            return [
+                {"id": unit.id, "html": self._render_unit(unit, context)}
+                for unit in self._units
+                if unit.kind == "doc" or unit.tags & changed_tags
+            ]
+        except Exception as e:
+            logger.exception(e)
+            raise TemplateRenderErrorException()
+
+
+class LivePreviewService:
+    """Живой предпросмотр документа по websocket.
+
+    Клиент отправляет изменения полей {"fields": [{"field_id": id,
+    "value": значение}, ...]}. Изменения накапливаются и применяются
+    после паузы LIVE_PREVIEW_DEBOUNCE секунд (но не позже
+    LIVE_PREVIEW_MAX_DELAY секунд после первого изменения). Сервер
+    отправляет {"type": "init", "html": ...} при подключении,
+    {"type": "update", "blocks": [{"id": ..., "html": ...}]} после
+    перегенерации и {"type": "error", "detail": ...} при ошибках.
+    """
+
+    _connections = 0
+
+    @classmethod
+    async def serve(cls, websocket: WebSocket, template_id: pk_type) -> None:
+        """Обслуживает websocket соединение живого предпросмотра."""
+        if cls._connections >= settings.LIVE_PREVIEW_MAX_CONNECTIONS:
+            await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER)
+            return
+        cls._connections += 1
+        try:
+            try:
+                plan = await TemplateService.get_render_plan(template_id)
+            except TemplateException as e:
+                await websocket.close(
+                    code=status.WS_1008_POLICY_VIOLATION, reason=e.detail
+                )
+                return
+            if not plan.docx_path:
+                await websocket.close(
+                    code=status.WS_1011_INTERNAL_ERROR,
+                    reason=Messages.RENDER_ERROR,
+                )
+                return
+            fields = {
+                field.id: (field.tag, field.default or field.name)
+                for field in plan.fields
+            }
+            await websocket.accept()
+            try:
+                session = await run_in_threadpool(
+                    LivePreviewSession, plan.docx_path, fields
+                )
+                await cls.run_session(websocket, session)
+            except WebSocketDisconnect:
+                pass
+        finally:
+            cls._connections -= 1
+
+    @classmethod
+    def _parse_message(
+        cls, message: str, session: LivePreviewSession
+    ) -> Dict[int, str]:
+        """Разбирает сообщение клиента с изменениями полей.
+
+        Raises:
+            ValueError: при ошибочном формате или превышении ограничений.
+        """
+        data = json.loads(message)
+        fields = data["fields"]
+        if len(fields) > settings.LIVE_PREVIEW_MAX_FIELDS:
+            raise ValueError(Messages.LIVE_PREVIEW_LIMIT_EXCEEDED)
+        values = {}
+        for field in fields:
+            field_id, value = int(field["field_id"]), str(field["value"])
+            if field_id not in session.field_ids:
+                raise ValueError(Messages.FIELD_NOT_FOUND)
+            values[field_id] = value
+        return values
+
+    @classmethod
+    async def run_session(
+        cls, websocket: WebSocket, session: LivePreviewSession
+    ) -> None:
+        """Цикл обработки сообщений клиента для созданной сессии."""
+        loop = asyncio.get_running_loop()
+        html = await run_in_threadpool(session.render_all)
+        await websocket.send_json({"type": "init", "html": html})
+        pending: Dict[int, str] = {}
+        first_change_at: Optional[float] = None
+        deadline: Optional[float] = None
+        while True:
+            if deadline is None:
+                timeout = settings.LIVE_PREVIEW_IDLE_TIMEOUT
+            else:
+                timeout = max(deadline - loop.time(), 0)
+            try:
+                message = await asyncio.wait_for(
+                    websocket.receive_text(), timeout
+                )
+            except asyncio.TimeoutError:
+                if deadline is None:
+                    await websocket.close(code=status.WS_1000_NORMAL_CLOSURE)
+                    return
+                values, pending = pending, {}
+                first_change_at = deadline = None
+                try:
+                    blocks = await run_in_threadpool(session.update, values)
+                except TemplateRenderErrorException as e:
+                    await websocket.send_json(
+                        {"type": "error", "detail": e.detail}
+                    )
+                    continue
+                if blocks:
+                    await websocket.send_json(
+                        {"type": "update", "blocks": blocks}
+                    )
+                continue
+            if len(message) > settings.LIVE_PREVIEW_MAX_MESSAGE_SIZE:
+                await websocket.close(
+                    code=status.WS_1009_MESSAGE_TOO_BIG,
+                    reason=Messages.LIVE_PREVIEW_LIMIT_EXCEEDED,
+                )
+                return
+            try:
+                pending.update(cls._parse_message(message, session))
+            except (ValueError, KeyError, TypeError) as e:
+                await websocket.send_json({"type": "error", "detail": str(e)})
+                continue
+            now = loop.time()
+            if first_change_at is None:
+                first_change_at = now
+            deadline = min(
+                now + settings.LIVE_PREVIEW_DEBOUNCE,
+                first_change_at + settings.LIVE_PREVIEW_MAX_DELAY,
+            )
@@ -1,20 +1,39 @@
+import contextlib
+import os
 import pathlib
+import signal
 import subprocess
 import sys
 import tempfile
+import threading
+import time
 from io import BytesIO
-from typing import Literal, TypeAlias
+from typing import Iterable, Iterator, List, Literal, Optional, TypeAlias
 
 from pdf2image import convert_from_bytes
 from PIL.Image import Image
 
-from app.common.exceptions import TemplatePdfConvertErrorException
+from app.common.circuit_breaker import CircuitBreaker
+from app.common.exceptions import (
+    PdfConverterUnavailableException,
+    TemplatePdfConvertErrorException,
+)
+from app.common.metrics import PDF_CONVERSION_FAILURES, PDF_CONVERSION_SECONDS
+from app.config import settings
 from app.logger import logger
 
 img_format: TypeAlias = Literal["png", "jpeg", "tiff", "ppm"]
 
 
 class PdfConverter:
+    PDF_BATCH_SIZE = settings.PDF_BATCH_SIZE
+
+    _breaker = CircuitBreaker(
+        "pdf_converter",
+        settings.PDF_CIRCUIT_FAILURE_THRESHOLD,
+        settings.PDF_CIRCUIT_RESET_TIMEOUT,
+    )
+
     @classmethod
     def _docx_to_pdf_win32(cls, in_file: BytesIO) -> BytesIO:
         """Конвертирует docx файл pdf-файла на платформах win32.
@@ -51,6 +70,125 @@ class PdfConverter:
         pdf_file.unlink(missing_ok=True)
         return out_buffer
 
+    @classmethod
+    def _profile_dir(cls) -> pathlib.Path:
+        """Профиль libreoffice текущего потока.
+
+        Одновременные запуски libreoffice с общим профилем конфликтуют,
+        поэтому каждый поток пула использует собственный профиль.
+        """
+        return pathlib.Path(
+            tempfile.gettempdir(),
+            f"templdoc_lo_{os.getpid()}_{threading.get_ident()}",
+        )
+
+    @classmethod
+    def _run_soffice_once(
+        cls,
+        docx_files: List[pathlib.Path],
+        outdir: str,
+        profile_dir: pathlib.Path,
+        timeout: float,
+    ) -> None:
+        """Однократный запуск libreoffice с ограничением по времени.
+
+        libreoffice запускается в отдельной группе процессов, чтобы при
+        превышении времени завершить и порожденные им процессы.
+
+        Raises:
+            subprocess.TimeoutExpired: при превышении времени.
+            subprocess.CalledProcessError: при ненулевом коде возврата.
+        """
+        process = subprocess.Popen(
+            [
+                settings.PDF_SOFFICE_BINARY,
+                f"-env:UserInstallation={profile_dir.as_uri()}",
+                "--headless",
+                "--invisible",
+                "--nologo",
+                "--convert-to",
+                "pdf",
+                "--outdir",
+                outdir,
+                *(str(file) for file in docx_files),
+            ],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+            start_new_session=True,
+        )
+        try:
+            _, stderr = process.communicate(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            with contextlib.suppress(ProcessLookupError):
+                os.killpg(process.pid, signal.SIGKILL)
+            process.communicate()
+            raise
+        if process.returncode:
+            raise subprocess.CalledProcessError(
+                process.returncode, process.args, stderr=stderr
+            )
+
+    @classmethod
+    def _run_soffice(cls, docx_files: List[pathlib.Path], outdir: str) -> None:
+        """Конвертирует docx файлы в pdf одним запуском libreoffice.
+
+        Время запуска ограничено PDF_CONVERT_TIMEOUT (плюс
+        PDF_CONVERT_FILE_TIMEOUT на каждый файл). При ошибке или зависании
+        запуск повторяется с новым чистым профилем libreoffice. Серия
+        неудачных запусков размыкает предохранитель, и до истечения
+        PDF_CIRCUIT_RESET_TIMEOUT конвертация отклоняется без запуска.
+
+        Args:
+            docx_files: пути к входным docx файлам.
+            outdir: каталог для результирующих pdf файлов.
+
+        Raises:
+            PdfConverterUnavailableException: предохранитель разомкнут.
+            TemplatePdfConvertErrorException: при ошибках конвертации.
+        """
+        if not cls._breaker.allow():
+            PDF_CONVERSION_FAILURES.labels("circuit_open").inc()
+            raise PdfConverterUnavailableException()
+        timeout = (
+            settings.PDF_CONVERT_TIMEOUT
+            + settings.PDF_CONVERT_FILE_TIMEOUT * len(docx_files)
+        )
+        mode = "batch" if len(docx_files) > 1 else "single"
+        for attempt in range(settings.PDF_CONVERT_RETRIES + 1):
+            with contextlib.ExitStack() as stack:
+                if attempt:
+                    profile_dir = pathlib.Path(
+                        stack.enter_context(tempfile.TemporaryDirectory())
+                    )
+                else:
+                    profile_dir = cls._profile_dir()
+                start = time.perf_counter()
+                try:
+                    cls._run_soffice_once(
+                        docx_files, outdir, profile_dir, timeout
+                    )
+                except subprocess.TimeoutExpired:
+                    PDF_CONVERSION_FAILURES.labels("timeout").inc()
+                    logger.warning(
+                        f"libreoffice killed after {timeout}s "
+                        f"(attempt {attempt + 1})"
+                    )
+                except (OSError, subprocess.CalledProcessError) as e:
+                    PDF_CONVERSION_FAILURES.labels("error").inc()
+                    logger.warning(
+                        f"libreoffice conversion failed (attempt "
+                        f"{attempt + 1}): {e}"
+                    )
+                else:
+                    PDF_CONVERSION_SECONDS.labels(mode).observe(
+                        time.perf_counter() - start
+                    )
+                    cls._breaker.record_success()
+                    return
+        cls._breaker.record_failure()
+        logger.error(f"libreoffice conversion failed: {len(docx_files)} files")
+        raise TemplatePdfConvertErrorException()
+
     @classmethod
     def _docx_to_pdf_linux(cls, in_file: BytesIO) -> BytesIO:
         """Конвертирует docx файл pdf-файла на платформах linux.
@@ -66,33 +204,83 @@ class PdfConverter:
         Raises:
             TemplatePdfConvertErrorException: при ошибках конвертации.
         """
-        with tempfile.NamedTemporaryFile() as output:
-            out_file = pathlib.Path(output.name).resolve()
-            out_file.write_bytes(in_file.read())
-            try:
-                subprocess.run(
-                    [
-                        "soffice",
-                        "--headless",
-                        "--invisible",
-                        "--nologo",
-                        "--convert-to",
-                        "pdf",
-                        "--outdir",
-                        out_file.parent,
-                        out_file.absolute(),
-                    ],
-                    check=True,
-                )
-            except Exception as e:
-                logger.exception("libreoffice conversion failed" + e)
+        with tempfile.TemporaryDirectory() as scratch_dir:
+            docx_file = pathlib.Path(scratch_dir, "document.docx")
+            docx_file.write_bytes(in_file.read())
+            cls._run_soffice([docx_file], scratch_dir)
+            pdf_file = docx_file.with_suffix(".pdf")
+            if not pdf_file.exists():
                 raise TemplatePdfConvertErrorException()
-            pdf_file = out_file.with_suffix(".pdf")
-            out_buffer = BytesIO()
-            out_buffer.write(pdf_file.read_bytes())
-            out_buffer.seek(0)
-            pdf_file.unlink(missing_ok=True)
-        return out_buffer
+            return BytesIO(pdf_file.read_bytes())
+
+    @classmethod
+    def _docx_to_pdf_linux_chunk(
+        cls, in_files: List[BytesIO]
+    ) -> Iterator[Optional[BytesIO]]:
+        """Конвертирует группу docx файлов одним запуском libreoffice.
+
+        Args:
+            in_files: содержимое входных docx файлов.
+
+        Yields:
+            BytesIO | None: pdf файлы в порядке входных файлов (None, если
+            файл не удалось сконвертировать).
+
+        Raises:
+            TemplatePdfConvertErrorException: при ошибке запуска libreoffice.
+        """
+        with tempfile.TemporaryDirectory() as scratch_dir:
+            docx_files = []
+            for i, in_file in enumerate(in_files):
+                docx_file = pathlib.Path(scratch_dir, f"doc_{i:05d}.docx")
+                docx_file.write_bytes(in_file.read())
+                docx_files.append(docx_file)
+            cls._run_soffice(docx_files, scratch_dir)
+            for docx_file in docx_files:
+                pdf_file = docx_file.with_suffix(".pdf")
+                if not pdf_file.exists():
+                    logger.warning(f"libreoffice skipped {docx_file.name}")
+                    yield None
+                    continue
+                yield BytesIO(pdf_file.read_bytes())
+                pdf_file.unlink()
+
+    @classmethod
+    def docx_to_pdf_many(
+        cls, in_files: Iterable[BytesIO], chunk_size: Optional[int] = None
+    ) -> Iterator[Optional[BytesIO]]:
+        """Пакетная конвертация docx файлов в pdf.
+
+        Входные файлы группируются в пакеты по chunk_size, каждый пакет
+        конвертируется одним запуском libreoffice во временном каталоге.
+        Результаты выдаются по мере готовности пакетов в порядке входных
+        файлов. На платформе win32 файлы конвертируются по одному.
+
+        Args:
+            in_files: содержимое входных docx файлов.
+            chunk_size: количество файлов в одном запуске libreoffice
+                (по умолчанию PDF_BATCH_SIZE).
+
+        Yields:
+            BytesIO | None: pdf файлы в порядке входных файлов (None, если
+            файл не удалось сконвертировать).
+
+        Raises:
+            TemplatePdfConvertErrorException: при ошибке запуска libreoffice.
+        """
+        if sys.platform != "linux":
+            for in_file in in_files:
+                yield cls.docx_to_pdf(in_file)
+            return
+        chunk_size = chunk_size or cls.PDF_BATCH_SIZE
+        chunk = []
+        for in_file in in_files:
+            chunk.append(in_file)
+            if len(chunk) >= chunk_size:
+                yield from cls._docx_to_pdf_linux_chunk(chunk)
+                chunk = []
+        if chunk:
+            yield from cls._docx_to_pdf_linux_chunk(chunk)
 
     @classmethod
     def docx_to_pdf(cls, in_file: BytesIO) -> BytesIO:
@@ -0,0 +1,345 @@
+import asyncio
+import os
+from io import BytesIO
+from typing import Dict, Hashable, List, Optional, Sequence, Tuple
+
+from starlette.concurrency import run_in_threadpool
+
+from app.common.cache import TTLCache
+from app.common.constants import FileFormat, RenderEngine
+from app.common.exceptions import (
+    TemplateException,
+    TemplatePdfConvertErrorException,
+    TemplateRenderErrorException,
+)
+from app.common.single_flight import create_single_flight, make_key
+from app.config import settings
+from app.logger import logger
+from app.services.docx_html import DocxHtmlConverter
+from app.services.docx_merge import DocxMerger
+from app.services.docx_render import DocxRender
+from app.services.docx_stream import DocxStreamRender
+from app.services.pdf_converter import PdfConverter
+
+
+class RenderService:
+    """Генерация файлов документов по docx шаблонам.
+
+    Генерация выполняется в пуле потоков и не блокирует цикл событий.
+    Одновременные запросы с одинаковыми входными данными объединяются:
+    документ генерируется (и конвертируется в pdf) один раз, а результат
+    получают все ожидающие запросы.
+
+    Если конвертация в pdf не удалась (или конвертер временно отключен)
+    и разрешен fallback, вместо pdf возвращается docx документ.
+
+    Формат html предназначен для предпросмотра на экране: конвертация
+    выполняется без libreoffice, результат кэшируется по версии файла
+    шаблона и входным данным. Версия - id неизменяемой версии шаблона
+    (TemplateVersion), а для файлов без версии - время модификации и
+    размер файла.
+
+    Движок генерации docx выбирается для каждого шаблона (RenderEngine):
+    docxtpl (DocxRender) или потоковый (DocxStreamRender).
+
+    Несколько документов объединяются в один файл (merge): части
+    генерируются параллельно, а в pdf конвертируется только результат.
+    """
+
+    RENDER_CLASSES = {
+        RenderEngine.DOCXTPL: DocxRender,
+        RenderEngine.STREAM: DocxStreamRender,
+    }
+
+    _flight = create_single_flight("render")
+    _html_cache: TTLCache[bytes] = TTLCache(
+        "html_preview",
+        settings.HTML_PREVIEW_CACHE_SIZE,
+        settings.HTML_PREVIEW_CACHE_TTL,
+    )
+
+    @classmethod
+    def _file_version(cls, docx_path: str) -> Optional[tuple[int, int]]:
+        """Версия файла шаблона (время модификации и размер)."""
+        try:
+            stat = os.stat(docx_path)
+        except (OSError, TypeError, ValueError):
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    @classmethod
+    def _render(
+        cls,
+        docx_path: str,
+        context: Dict[str, str],
+        context_default: Optional[Dict[str, str]],
+        draft: bool,
+        fmt: str,
+        fallback: bool,
+        engine: str = RenderEngine.DOCXTPL,
+    ) -> Tuple[bytes, str]:
+        """Синхронная генерация документа (выполняется в пуле потоков).
+
+        Args:
+            docx_path: путь к docx файлу шаблона.
+            context: словарь значений полей вида {тэг: значение}.
+            context_default: словарь значений по умолчанию (для документа).
+            draft: True для черновика, False для документа.
+            fmt: формат результата (docx, pdf, html).
+            fallback: True - вернуть docx при ошибке конвертации в pdf.
+            engine: движок генерации docx (RenderEngine).
+
+        Returns:
+            (bytes, str): содержимое сгенерированного файла и его
+            расширение (формат).
+
+        Raises:
+            TemplateRenderErrorException: при ошибках генерации docx/html.
+            TemplatePdfConvertErrorException: при ошибках генерации pdf.
+        """
+        try:
+            doc = cls.RENDER_CLASSES[engine](docx_path)
+            if draft:
+                buffer = doc.get_draft(context)
+            else:
+                buffer = doc.get_partial(context, context_default)
+        except Exception as e:
+            logger.exception(e)
+            raise TemplateRenderErrorException()
+        return cls._convert(buffer, fmt, fallback)
+
+    @classmethod
+    def _convert(
+        cls, buffer: BytesIO, fmt: str, fallback: bool
+    ) -> Tuple[bytes, str]:
+        """Конвертация сгенерированного docx в заданный формат.
+
+        Args:
+            buffer: сгенерированный docx документ.
+            fmt: формат результата (docx, pdf, html).
+            fallback: True - вернуть docx при ошибке конвертации в pdf.
+
+        Returns:
+            (bytes, str): содержимое файла и его расширение (формат).
+
+        Raises:
+            TemplateRenderErrorException: при ошибках генерации html.
+            TemplatePdfConvertErrorException: при ошибках генерации pdf.
+        """
+        if fmt == FileFormat.HTML:
+            try:
+                content = DocxHtmlConverter.convert(buffer)
+            except Exception as e:
+                logger.exception(e)
+                raise TemplateRenderErrorException()
+            return content.encode("utf-8"), FileFormat.HTML
+        if fmt != FileFormat.PDF:
+            return buffer.getvalue(), FileFormat.DOCX
+        try:
+            pdf_buffer = PdfConverter.docx_to_pdf(buffer)
+            return pdf_buffer.getvalue(), FileFormat.PDF
+        except TemplatePdfConvertErrorException as e:
+            if not fallback:
+                raise
+            logger.warning(f"pdf недоступен, отдается docx: {e.detail}")
+        except Exception as e:
+            logger.exception(e)
+            if not fallback:
+                raise TemplatePdfConvertErrorException()
+        return buffer.getvalue(), FileFormat.DOCX
+
+    @classmethod
+    async def _render_shared(
+        cls,
+        docx_path: str,
+        context: Dict[str, str],
+        context_default: Optional[Dict[str, str]],
+        draft: bool,
+        fmt: str,
+        fallback: bool,
+        engine: str,
+        version: Optional[Hashable],
+    ) -> Tuple[BytesIO, str]:
+        if version is None:
+            version = cls._file_version(docx_path)
+        key = make_key(
+            str(docx_path),
+            version,
+            context,
+            context_default,
+            draft,
+            fmt,
+            fallback,
+            engine,
+        )
+        if fmt == FileFormat.HTML:
+            if (content := cls._html_cache.get(key)) is not None:
+                return BytesIO(content), FileFormat.HTML
+        content, ext = await cls._flight.do(
+            key,
+            lambda: run_in_threadpool(
+                cls._render,
+                docx_path,
+                context,
+                context_default,
+                draft,
+                fmt,
+                fallback,
+                engine,
+            ),
+        )
+        if ext == FileFormat.HTML:
+            cls._html_cache.set(key, content)
+        return BytesIO(content), ext
+
+    @classmethod
+    async def get_draft(
+        cls,
+        docx_path: str,
+        context: Dict[str, str],
+        fmt: str = FileFormat.DOCX,
+        fallback: bool = False,
+        engine: str = RenderEngine.DOCXTPL,
+        version: Optional[Hashable] = None,
+    ) -> Tuple[BytesIO, str]:
+        """Генерирует черновик документа (тэги выделены цветом).
+
+        Args:
+            docx_path: путь к docx файлу шаблона.
+            context: словарь вида {тэг: наименование поля}.
+            fmt: формат результата (docx, pdf, html).
+            fallback: True - вернуть docx при ошибке конвертации в pdf.
+            engine: движок генерации docx (RenderEngine).
+            version: версия файла шаблона для ключа кэша (id
+                TemplateVersion), None - по времени модификации файла.
+
+        Returns:
+            (BytesIO, str): сгенерированный файл и его расширение.
+
+        Raises:
+            TemplateRenderErrorException: при ошибках генерации docx.
+            TemplatePdfConvertErrorException: при ошибках генерации pdf.
+        """
+        return await cls._render_shared(
+            docx_path, context, None, True, fmt, fallback, engine, version
+        )
+
+    @classmethod
+    async def get_partial(
+        cls,
+        docx_path: str,
+        context: Dict[str, str],
+        context_default: Dict[str, str],
+        fmt: str = FileFormat.DOCX,
+        fallback: bool = False,
+        engine: str = RenderEngine.DOCXTPL,
+        version: Optional[Hashable] = None,
+    ) -> Tuple[BytesIO, str]:
+        """Генерирует частично заполненный документ.
+
+        Args:
+            docx_path: путь к docx файлу шаблона.
+            context: словарь значений полей вида {тэг: значение}.
+            context_default: словарь значений по умолчанию вида
+                {тэг: значение по умолчанию}.
+            fmt: формат результата (docx, pdf, html).
+            fallback: True - вернуть docx при ошибке конвертации в pdf.
+            engine: движок генерации docx (RenderEngine).
+            version: версия файла шаблона для ключа кэша (id
+                TemplateVersion), None - по времени модификации файла.
+
+        Returns:
+            (BytesIO, str): сгенерированный файл и его расширение.
+
+        Raises:
+            TemplateRenderErrorException: при ошибках генерации docx.
+            TemplatePdfConvertErrorException: при ошибках генерации pdf.
+        """
+        return await cls._render_shared(
+            docx_path,
+            context,
+            context_default,
+            False,
+            fmt,
+            fallback,
+            engine,
+            version,
+        )
+
+    @classmethod
+    async def merge(
+        cls,
+        parts: Sequence[
+            Tuple[
+                str,
+                Dict[str, str],
+                Optional[Dict[str, str]],
+                str,
+                Optional[Hashable],
+            ]
+        ],
+        fmt: str = FileFormat.DOCX,
+        fallback: bool = False,
+    ) -> Tuple[BytesIO, str]:
+        """Генерирует несколько документов и объединяет их в один файл.
+
+        Части генерируются параллельно (не более DOCUMENT_MERGE_CONCURRENCY
+        одновременно) и добавляются в результат по порядку, как только
+        готова очередная часть. Каждая часть начинается с новой страницы.
+        Результат конвертируется в pdf (html) один раз.
+
+        Args:
+            parts: части в порядке объединения, каждая в виде
+                (путь к docx шаблона, context, context_default, движок[,
+                версия файла шаблона]).
+            fmt: формат результата (docx, pdf, html).
+            fallback: True - вернуть docx при ошибке конвертации в pdf.
+
+        Returns:
+            (BytesIO, str): объединенный файл и его расширение.
+
+        Raises:
+            TemplateRenderErrorException: при ошибках генерации docx.
+            TemplatePdfConvertErrorException: при ошибках генерации pdf.
+        """
+        semaphore = asyncio.Semaphore(settings.DOCUMENT_MERGE_CONCURRENCY)
+
+        async def render_part(
+            docx_path, context, context_default, engine, version=None
+        ):
+            async with semaphore:
+                buffer, _ = await cls.get_partial(
+                    docx_path,
+                    context,
+                    context_default,
+                    FileFormat.DOCX,
+                    engine=engine,
+                    version=version,
+                )
+                return buffer
+
+        tasks: List[Optional[asyncio.Task]] = [
+            asyncio.create_task(render_part(*part)) for part in parts
+        ]
+        merger = DocxMerger()
+        try:
+            for number, task in enumerate(tasks):
+                buffer = await task
+                # готовая часть больше не нужна после добавления
+                tasks[number] = None
+                await run_in_threadpool(merger.append, buffer)
+            merged = await run_in_threadpool(merger.save)
+        except TemplateException:
+            raise
+        except Exception as e:
+            logger.exception(e)
+            raise TemplateRenderErrorException()
+        finally:
+            pending = [task for task in tasks if task is not None]
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+        content, ext = await run_in_threadpool(
+            cls._convert, merged, fmt, fallback
+        )
+        return BytesIO(content), ext
@@ -0,0 +1,84 @@
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import Row
+
+from app.models.base import pk_type, storage_docx
+from app.models.template import TemplateField
+
+
+class RenderPlan:
+    """Данные для генерации документа по шаблону.
+
+    Формируется по строкам одного запроса (TemplateDAO.get_render_plan,
+    DocumentDAO.get_render_plan) только из столбцов, нужных для генерации,
+    без загрузки групп, подсказок полей и других связанных объектов.
+
+    Attributes:
+        name: наименование шаблона (документа) для имени файла.
+        docx_path: путь к docx файлу шаблона (None, если файла нет).
+        engine: движок генерации docx (RenderEngine).
+        version_id: версия файла шаблона (TemplateVersion) - ключ кэшей
+            генерации; None для файлов, загруженных без версии.
+        fields: поля шаблона (tag, name, default, type с name/mask/kind).
+        values: значения полей документа {id поля: (value, items)}.
+        owner_id: владелец документа.
+        deleted: шаблон удален.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        docx_path: Optional[str],
+        engine: str,
+        fields: List[TemplateField],
+        values: Optional[Dict[pk_type, Tuple[Any, Any]]] = None,
+        owner_id: Optional[pk_type] = None,
+        deleted: bool = False,
+        version_id: Optional[pk_type] = None,
+    ):
+        self.name = name
+        self.docx_path = docx_path
+        self.engine = engine
+        self.version_id = version_id
+        self.fields = fields
+        self.values = values or {}
+        self.owner_id = owner_id
+        self.deleted = deleted
+
+    @classmethod
+    def from_rows(cls, rows: Sequence[Row]) -> Optional["RenderPlan"]:
+        """План генерации по строкам запроса get_render_plan.
+
+        Returns:
+            RenderPlan или None, если строк нет (объект отсутствует).
+        """
+        if not rows:
+            return None
+        fields, values = [], {}
+        for row in rows:
+            field = row.TemplateField
+            if field is None:  # шаблон без полей
+                continue
+            fields.append(field)
+            mapping = row._mapping
+            if (stored := mapping.get("stored")) is not None:
+                # значение из document.field_values
+                values[field.id] = (stored.get("value"), stored.get("items"))
+            elif mapping.get("value") is not None or mapping.get("items"):
+                values[field.id] = (mapping["value"], mapping["items"])
+        first = rows[0]._mapping
+        if version_filename := first.get("version_filename"):
+            docx_path = storage_docx.get_path(version_filename)
+        else:
+            filename = first["filename"]
+            docx_path = filename.path if filename else None
+        return cls(
+            name=first["name"],
+            docx_path=docx_path,
+            engine=first["render_engine"],
+            fields=fields,
+            values=values,
+            owner_id=first.get("owner_id"),
+            deleted=first.get("deleted", False),
+            version_id=first.get("version_id"),
+        )
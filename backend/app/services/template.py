@@ -1,48 +1,71 @@
+import hashlib
+from datetime import datetime
 from io import BytesIO
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
 
-import aiofiles
-import aiofiles.os
 from fastapi import UploadFile
-
-from app.common.constants import Messages
+from starlette.concurrency import run_in_threadpool
+
+from app.common.cache import TTLCache
+from app.common.constants import (
+    FieldKind,
+    FileFormat,
+    InvalidationEventType,
+    Messages,
+    RenderEngine,
+)
 from app.common.exceptions import (
+    DocumentFieldValidationException,
     TemplateAlreadyDeletedException,
     TemplateFieldNotFoundException,
     TemplateNotFoundException,
-    TemplatePdfConvertErrorException,
     TemplateRenderErrorException,
     TypeFieldNotFoundException,
 )
+from app.common.invalidation import InvalidationEvent, invalidation_bus
+from app.common.utils import prefix_tsquery
 from app.config import settings
 from app.crud.template_dao import (
     TemplateDAO,
     TemplateFieldDAO,
     TemplateFieldGroupDAO,
+    TemplateVersionDAO,
 )
 from app.logger import logger
 from app.models.base import pk_type
-from app.models.template import Template
+from app.models.template import Template, TemplateField, TemplateVersion
 from app.models.user import User
 from app.schemas.template import (
     TemplateReadDTO,
     TemplateReadMinifiedDTO,
     TemplateWriteDTO,
 )
-from app.services.docx_render import DocxRender
+from app.services.docx_render import DocxRender, FieldPlaceholder, TableRow
+from app.services.docx_stream import DocxStreamPlan
 from app.services.favorite import TemplateFavoriteService
+from app.services.field_validator import FieldMaskValidator
 from app.services.pdf_converter import PdfConverter
+from app.services.render import RenderService
+from app.services.render_plan import RenderPlan
 from app.services.template_field_type import TemplateFieldTypeService
 
 
 class TemplateService:
-    DOCX_FILENAME_FORMAT = "tpl_{id}.docx"
-    THUMBNAIL_FILENAME_FORMAT = "thumbnail_{id}.png"
+    DOCX_FILENAME_FORMAT = "tpl_{id}_v{number}.docx"
+    THUMBNAIL_FILENAME_FORMAT = "thumbnail_{id}_v{number}.png"
     DRAFT_FILENAME_FORMAT = "{name}_шаблон.{ext}"
     PREVIEW_FILENAME_FORMAT = "{name}_preview.{ext}"
     THUMBNAIL_WIDTH = settings.THUMBNAIL_WIDTH
     THUMBNAIL_HEIGHT = settings.THUMBNAIL_HEIGHT
 
+    # планы генерации по id шаблона, сбрасываются событиями
+    # InvalidationEventType.TEMPLATE и FIELD_TYPE во всех процессах
+    _plan_cache: TTLCache[RenderPlan] = TTLCache(
+        "template_render_plan",
+        settings.TEMPLATE_RENDER_PLAN_CACHE_SIZE,
+        settings.TEMPLATE_RENDER_PLAN_CACHE_TTL,
+    )
+
     @classmethod
     def _update_fields_type_by_id(
         cls, fields: list[dict[str, Any]], type_id_mapping: dict[str:pk_type]
@@ -110,6 +133,10 @@ class TemplateService:
         # создание несгруппированных полей
         cls._update_fields_template_id(field_dicts, template.id)
         await TemplateFieldDAO.create_list(field_dicts)
+        await TemplateDAO.update_search_vector(template.id)
+        await invalidation_bus.publish(
+            InvalidationEventType.TEMPLATE, template.id
+        )
         return template.id
 
     @classmethod
@@ -131,6 +158,42 @@ class TemplateService:
             raise TemplateNotFoundException()
         return obj
 
+    @classmethod
+    async def get_render_plan(cls, id: pk_type) -> RenderPlan:
+        """План генерации документа по шаблону (один запрос к б.д.).
+
+        План кэшируется в памяти процесса до события сброса кэшей
+        шаблона (см. InvalidationBus).
+
+        Args:
+            id: идентификатор шаблона.
+
+        Returns:
+            RenderPlan: данные шаблона для генерации.
+
+        Raises:
+            TemplateNotFoundException: если объект с заданным id
+                отсутствует или удален.
+        """
+        plan = cls._plan_cache.get(id)
+        if plan is None:
+            generation = invalidation_bus.generation
+            plan = RenderPlan.from_rows(await TemplateDAO.get_render_plan(id))
+            if plan and generation == invalidation_bus.generation:
+                cls._plan_cache.set(id, plan)
+        if not plan or plan.deleted:
+            raise TemplateNotFoundException()
+        return plan
+
+    @classmethod
+    def _invalidate(cls, event: InvalidationEvent) -> None:
+        """Сбрасывает кэш планов генерации по событию шины."""
+        if event.type == InvalidationEventType.TEMPLATE and event.id:
+            cls._plan_cache.pop(event.id)
+        else:
+            # изменение типа поля затрагивает планы всех шаблонов
+            cls._plan_cache.clear()
+
     @classmethod
     async def get(
         cls, *, id: pk_type, user: Optional[User] = None
@@ -149,28 +212,84 @@ class TemplateService:
                 отсутствует или удален.
         """
         obj = await cls.get_or_raise_not_found(id)
-        groups_dicts = {group.id: group.to_dict() for group in obj.groups}
-        ungrouped_fields = []
-        for field in obj.fields:
-            field_dict = field.to_dict()
-            field_dict["type"] = field.type.type
-            field_dict["mask"] = field.type.mask
-            group_dict = groups_dicts.get(field.group_id)
-            if group_dict:
-                fields = group_dict.setdefault("fields", [])
-                fields.append(field_dict)
-            else:
-                ungrouped_fields.append(field_dict)
-
-        obj_dict = obj.to_dict()
-        obj_dict["grouped_fields"] = groups_dicts.values()
-        obj_dict["ungrouped_fields"] = ungrouped_fields
+        grouped_fields, ungrouped_fields = cls.fields_as_dicts(
+            obj, cls.field_as_dict
+        )
         # формирование is_favorited (в 'избранном' текущего пользователя)
+        is_favorited = False
         if user:
-            obj_dict["is_favorited"] = (
-                await TemplateFavoriteService.is_favorited(user.id, obj.id)
+            is_favorited = await TemplateFavoriteService.is_favorited(
+                user.id, obj.id
             )
-        return TemplateReadDTO.model_validate(obj_dict)
+        return TemplateReadDTO.model_validate(
+            {
+                "id": obj.id,
+                "title": obj.title,
+                "description": obj.description,
+                "created_at": obj.created_at,
+                "updated_at": obj.updated_at,
+                "deleted": obj.deleted,
+                "category_id": obj.category_id,
+                "owner_id": obj.owner_id,
+                "is_favorited": is_favorited,
+                "thumbnail": obj.thumbnail,
+                "render_engine": obj.render_engine,
+                "grouped_fields": grouped_fields,
+                "ungrouped_fields": ungrouped_fields,
+            }
+        )
+
+    @classmethod
+    def field_as_dict(cls, field: TemplateField) -> Dict[str, Any]:
+        """Описание поля шаблона для DTO ответа.
+
+        Словарь содержит только значения схемы ответа (to_dict модели
+        перебирает все столбцы таблицы).
+
+        Args:
+            field: поле шаблона (с загруженным типом поля).
+
+        Returns:
+            Dict: значения TemplateFieldReadDTO.
+        """
+        field_type = field.type
+        return {
+            "id": field.id,
+            "tag": field.tag,
+            "name": field.name,
+            "hint": field.hint,
+            "type": field_type.type,
+            "length": field.length,
+            "mask": field_type.mask,
+            "kind": field_type.kind,
+            "default": field.default,
+        }
+
+    @classmethod
+    def fields_as_dicts(
+        cls,
+        obj: Template,
+        field_as_dict: Callable[[TemplateField], Dict[str, Any]],
+    ) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """Раскладывает описания полей шаблона по группам за один проход.
+
+        Args:
+            obj: шаблон (с загруженными группами и полями).
+            field_as_dict: формирование описания поля.
+
+        Returns:
+            Tuple: группы с полями и поля вне групп.
+        """
+        groups = {
+            group.id: {"id": group.id, "name": group.name, "fields": []}
+            for group in obj.groups
+        }
+        ungrouped_fields = []
+        for field in obj.fields:
+            group = groups.get(field.group_id)
+            fields = group["fields"] if group else ungrouped_fields
+            fields.append(field_as_dict(field))
+        return list(groups.values()), ungrouped_fields
 
     @classmethod
     async def get_all(
@@ -193,69 +312,227 @@ class TemplateService:
             obj_sequence = await TemplateDAO.get_all()
         else:
             obj_sequence = await TemplateDAO.get_all(deleted=False)
-        obj_dto_list = []
+        return [
+            obj_dto
+            for obj_dto in await cls._models_as_minified_dto(
+                obj_sequence, user
+            )
+            if favorited is None or favorited == obj_dto.is_favorited
+        ]
+
+    @classmethod
+    async def search(
+        cls,
+        query: str,
+        user: Optional[User] = None,
+        limit: int = settings.SEARCH_PAGE_SIZE,
+        offset: int = 0,
+    ) -> List[TemplateReadMinifiedDTO]:
+        """Полнотекстовый поиск шаблонов по наименованию, описанию и
+        наименованиям полей (удаленные шаблоны не ищутся).
+
+        Args:
+            query: строка поиска, слова совпадают по префиксу.
+            user: пользователь для которого генерируется ответ.
+            limit: количество шаблонов на странице.
+            offset: количество пропускаемых шаблонов.
+
+        Returns:
+            list[TemplateReadMinifiedDTO]: шаблоны в порядке убывания
+                релевантности.
+        """
+        ts_query = prefix_tsquery(query, settings.SEARCH_MAX_TERMS)
+        if ts_query is None:
+            return []
+        obj_sequence = await TemplateDAO.search(
+            ts_query, limit, offset, deleted=False
+        )
+        return await cls._models_as_minified_dto(obj_sequence, user)
+
+    @classmethod
+    async def _models_as_minified_dto(
+        cls, obj_sequence: Sequence[Template], user: Optional[User]
+    ) -> List[TemplateReadMinifiedDTO]:
+        """Преобразование шаблонов в DTO без описания полей с отметкой
+        избранных шаблонов пользователя."""
         user_favorites = (
             set(await TemplateFavoriteService.get_user_favorite_ids(user.id))
             if user
             else set()
         )
+        obj_dto_list = []
         for obj in obj_sequence:
             obj_dto = TemplateReadMinifiedDTO.model_validate(obj)
             obj_dto.is_favorited = obj.id in user_favorites
-            if favorited is None or favorited == obj_dto.is_favorited:
-                obj_dto_list.append(obj_dto)
+            obj_dto_list.append(obj_dto)
         return obj_dto_list
 
     @classmethod
-    async def update_docx_template(cls, id: pk_type, file: UploadFile) -> None:
-        """Обновить docx файл шаблона с заданным идентификатором.
+    async def update_docx_template(
+        cls, id: pk_type, file: UploadFile
+    ) -> Optional[pk_type]:
+        """Загрузить новую версию docx файла шаблона.
+
+        Каждая загрузка файла с новым содержимым создает неизменяемую
+        версию (TemplateVersion) с отдельным файлом tpl_{id}_v{номер}.docx,
+        хэшем содержимого, тэгами docx и снимком полей шаблона. Файлы
+        прежних версий не перезаписываются: документы генерируются по
+        закрепленной за ними версии. Повторная загрузка того же файла
+        версию не создает.
+
+        Для шаблонов с потоковым движком генерации файл компилируется
+        сразу после загрузки (DocxStreamPlan).
 
         Args:
             id: идентификатор шаблона в б.д.
             file: загруженный docx файл шаблона.
+
+        Returns:
+            pk_type: идентификатор текущей версии файла шаблона.
         """
         obj_db = await cls.get_or_raise_not_found(id)
-        file.filename = cls.DOCX_FILENAME_FORMAT.format(id=obj_db.id)
-        if obj_db.filename and obj_db.filename.name != file.filename:
-            try:
-                await aiofiles.os.remove(obj_db.filename.path)
-            except Exception as e:
-                logger.exception(e)
-        await TemplateDAO.update_(obj_db.id, filename=file)
+        file_hash = hashlib.sha256(await file.read()).hexdigest()
+        await file.seek(0)
+        version = obj_db.version
+        if version and version.file_hash == file_hash:
+            return version.id
+        number = version.number + 1 if version else 1
+        file.filename = cls.DOCX_FILENAME_FORMAT.format(
+            id=obj_db.id, number=number
+        )
+        fields = [
+            {
+                "id": field.id,
+                "tag": field.tag,
+                "name": field.name,
+                "default": field.default,
+                "type": field.type.type,
+            }
+            for field in obj_db.fields
+        ]
+        filename = (
+            await TemplateDAO.update_(obj_db.id, filename=file)
+        ).filename
+        if obj_db.render_engine == RenderEngine.STREAM:
+            await run_in_threadpool(DocxStreamPlan.build, filename.path)
+        try:
+            tags = sorted(
+                await run_in_threadpool(DocxRender(filename.path).get_tags)
+            )
+        except Exception as e:
+            logger.exception(e)
+            tags = None
+        version = await TemplateVersionDAO.create(
+            template_id=obj_db.id,
+            number=number,
+            filename=filename.name,
+            file_hash=file_hash,
+            tags=tags,
+            fields=fields,
+        )
+        await TemplateDAO.update_(
+            obj_db.id, version_id=version.id, updated_at=datetime.utcnow()
+        )
+        await invalidation_bus.publish(InvalidationEventType.TEMPLATE, id)
+        return version.id
 
     @classmethod
-    async def generate_thumbnail(cls, template_id: pk_type):
-        """Генерирует png thumbnail для шаблона документа.
+    async def _save_thumbnail(
+        cls,
+        template_id: pk_type,
+        version: Optional[TemplateVersion],
+        pdf_buffer: BytesIO,
+    ) -> None:
+        """Генерирует png thumbnail по pdf черновику и сохраняет в базе.
 
-        После генерации обновляет поле thumbnail шаблона в базе данных.
+        Миниатюра сохраняется в файл версии шаблона и отмечается в
+        версии, повторно для той же версии она не генерируется.
 
         Args:
             template_id: идентификатор шаблона.
-
-        Raises:
-            TemplateNotFoundException: если шаблон с заданным template_id
-                отсутствует или удален.
+            version: версия файла шаблона (None - файл без версии).
+            pdf_buffer: черновик шаблона в формате pdf.
         """
-        obj_db = await cls.get_or_raise_not_found(template_id)
-        pdf_buffer, _ = await TemplateService.get_draft(template_id, pdf=True)
         png_buffer = PdfConverter.pdf_to_thumbnail(
             pdf_buffer,
             width=cls.THUMBNAIL_WIDTH,
             height=cls.THUMBNAIL_HEIGHT,
             format="png",
         )
-        filename = cls.THUMBNAIL_FILENAME_FORMAT.format(id=template_id)
+        filename = cls.THUMBNAIL_FILENAME_FORMAT.format(
+            id=template_id, number=version.number if version else 0
+        )
         try:
             thumb_file = UploadFile(
                 file=png_buffer,
                 filename=filename,
                 headers={"content-type": "image/png"},
             )
-            await TemplateDAO.update_(obj_db.id, thumbnail=thumb_file)
+            await TemplateDAO.update_(template_id, thumbnail=thumb_file)
+            if version:
+                await TemplateVersionDAO.update_(
+                    version.id, thumbnail=filename
+                )
             logger.info(f"Сгенерирован thumbnail: {filename}")
         except Exception as e:
             logger.exception(e)
 
+    @classmethod
+    async def generate_thumbnail(cls, template_id: pk_type):
+        """Генерирует png thumbnail для шаблона документа.
+
+        После генерации обновляет поле thumbnail шаблона в базе данных.
+        Если для текущей версии файла шаблона миниатюра уже
+        сгенерирована, повторная генерация не выполняется.
+
+        Args:
+            template_id: идентификатор шаблона.
+
+        Raises:
+            TemplateNotFoundException: если шаблон с заданным template_id
+                отсутствует или удален.
+        """
+        obj_db = await cls.get_or_raise_not_found(template_id)
+        if obj_db.version and obj_db.version.thumbnail:
+            return
+        pdf_buffer, _ = await TemplateService.get_draft(
+            template_id, FileFormat.PDF, fallback=False
+        )
+        await cls._save_thumbnail(obj_db.id, obj_db.version, pdf_buffer)
+
+    @classmethod
+    async def generate_all_thumbnails(cls) -> None:
+        """Генерирует png thumbnail для всех шаблонов с docx файлом,
+        у текущей версии которых миниатюры еще нет.
+
+        Черновики конвертируются в pdf пакетами (один запуск libreoffice
+        на пакет из PdfConverter.PDF_BATCH_SIZE файлов).
+        """
+        obj_sequence = await TemplateDAO.get_all(deleted=False)
+        versions = {
+            version.id: version
+            for version in await TemplateVersionDAO.get_all(thumbnail=None)
+        }
+        templates = [
+            (obj.id, versions.get(obj.version_id))
+            for obj in obj_sequence
+            if obj.filename
+            and (obj.version_id is None or obj.version_id in versions)
+        ]
+        batch_size = PdfConverter.PDF_BATCH_SIZE
+        for i in range(0, len(templates), batch_size):
+            batch = templates[i : i + batch_size]
+            drafts = [
+                (await cls.get_draft(template_id))[0]
+                for template_id, _ in batch
+            ]
+            pdf_buffers = await run_in_threadpool(
+                lambda: list(PdfConverter.docx_to_pdf_many(drafts))
+            )
+            for (template_id, version), pdf_buffer in zip(batch, pdf_buffers):
+                if pdf_buffer is not None:
+                    await cls._save_thumbnail(template_id, version, pdf_buffer)
+
     @classmethod
     async def delete(cls, id: pk_type) -> int:
         """Удалить шаблон с заданным id.
@@ -273,6 +550,7 @@ class TemplateService:
         if obj_db.deleted:
             raise TemplateAlreadyDeletedException()
         await TemplateDAO.update_(id, deleted=True)
+        await invalidation_bus.publish(InvalidationEventType.TEMPLATE, id)
 
     @classmethod
     async def get_inconsistent_tags(
@@ -296,7 +574,10 @@ class TemplateService:
         """
         tpl = await cls.get_or_raise_not_found(id)
         docx_tags, field_tags = set(), set()
-        if tpl.filename:
+        if tpl.version and tpl.version.tags is not None:
+            # тэги, сохраненные при загрузке версии файла
+            docx_tags = set(tpl.version.tags)
+        elif tpl.filename:
             try:
                 doc = DocxRender(tpl.filename)
                 docx_tags = set(doc.get_tags())
@@ -355,15 +636,73 @@ class TemplateService:
         return {"result": Messages.TEMPLATE_CONSISTENT}
 
     @classmethod
-    async def get_draft(cls, id: pk_type, pdf=False) -> Tuple[BytesIO, str]:
-        """Возвращает черновик документа в формате docx или pdf.
+    def field_context_value(
+        cls,
+        field: TemplateField,
+        value: Optional[str],
+        items: Optional[List[Any]] = None,
+    ) -> Any:
+        """Значение поля для контекста генерации с учетом вида поля.
+
+        Args:
+            field: поле шаблона.
+            value: значение скалярного поля.
+            items: элементы списочного или табличного поля.
+
+        Returns:
+            Значение для контекста: строка, список строк или список
+            TableRow. None (или пустое значение), если поле не заполнено.
+        """
+        kind = field.type.kind
+        if kind == FieldKind.SCALAR:
+            return value
+        if not items:
+            return None
+        if kind == FieldKind.TABLE:
+            return [TableRow(row) for row in items if isinstance(row, dict)]
+        return [str(item) for item in items]
+
+    @classmethod
+    def field_placeholder(cls, field: TemplateField, text: str) -> Any:
+        """Заглушка незаполненного поля (черновик, значение по умолчанию).
+
+        Для списочных полей - список из одного элемента, чтобы строка
+        таблицы (абзац) поля осталась в документе.
+        """
+        kind = field.type.kind
+        if kind == FieldKind.LIST:
+            return [FieldPlaceholder(text)]
+        if kind == FieldKind.TABLE:
+            return [TableRow.placeholder(text)]
+        return text
+
+    @classmethod
+    def context_default(cls, fields: List[TemplateField]) -> Dict[str, Any]:
+        """Значения по умолчанию незаполненных полей {тэг: значение}."""
+        return {
+            field.tag: cls.field_placeholder(
+                field, field.default or field.name
+            )
+            for field in fields
+        }
+
+    @classmethod
+    async def get_draft(
+        cls,
+        id: pk_type,
+        fmt: str = FileFormat.DOCX,
+        fallback: bool = settings.PDF_FALLBACK_TO_DOCX,
+    ) -> Tuple[BytesIO, str]:
+        """Возвращает черновик документа в формате docx, pdf или html.
 
         В черновике все тэги заменены соответствующими наименованиями полей.
         Имя файла filename формируется по полю title шаблона.
 
         Args:
             id: идентификатор шаблона.
-            pdf: True для формата pdf, False для формата docx.
+            fmt: формат файла (docx, pdf, html).
+            fallback: True - вернуть docx, если pdf сгенерировать не удалось
+                (по умолчанию PDF_FALLBACK_TO_DOCX).
 
         Returns:
             (file (BytesIO), filename (str)): сгенерированный файл и имя.
@@ -372,38 +711,38 @@ class TemplateService:
             TemplateRenderErrorException: при ошибках генерации docx.
             TemplatePdfConvertErrorException: при ошибках генерации pdf.
         """
-        tpl = await cls.get_or_raise_not_found(id)
-        context = {field.tag: field.name for field in tpl.fields}
-        docx_path = tpl.filename.path
-        try:
-            doc = DocxRender(docx_path)
-            buffer = doc.get_draft(context)
-        except Exception as e:
-            logger.exception(e)
+        plan = await cls.get_render_plan(id)
+        context = {
+            field.tag: cls.field_placeholder(field, field.name)
+            for field in plan.fields
+        }
+        if not plan.docx_path:
             raise TemplateRenderErrorException
-        filename = cls.DRAFT_FILENAME_FORMAT.format(name=tpl.title, ext="docx")
-        if pdf:
-            try:
-                buffer = PdfConverter.docx_to_pdf(buffer)
-                filename = cls.DRAFT_FILENAME_FORMAT.format(
-                    name=tpl.title, ext="pdf"
-                )
-            except Exception as e:
-                logger.exception(e)
-                raise TemplatePdfConvertErrorException
+        buffer, ext = await RenderService.get_draft(
+            plan.docx_path,
+            context,
+            fmt,
+            fallback,
+            plan.engine,
+            plan.version_id,
+        )
+        filename = cls.DRAFT_FILENAME_FORMAT.format(name=plan.name, ext=ext)
         return buffer, filename
 
     @classmethod
     async def get_preview(
-        cls, id: pk_type, field_values: list[dict[int, str]], pdf=False
+        cls,
+        id: pk_type,
+        field_values: list[dict[str, Any]],
+        fmt: str = FileFormat.DOCX,
     ) -> Tuple[BytesIO, str]:
-        """Возвращает документ с заполненными полями в формате docx или pdf.
+        """Возвращает документ с заполненными полями в формате docx/pdf/html.
 
         Args:
             id: идентификатор шаблона.
             field_values: список значений полей в виде
-                {"field_id":id, "value":значение}
-            pdf: True для формата pdf, False для формата docx.
+                {"field_id":id, "value":значение, "items":элементы}
+            fmt: формат файла (docx, pdf, html).
 
         Returns:
             (file (BytesIO), filename (str)): сгенерированный файл и имя.
@@ -412,12 +751,14 @@ class TemplateService:
             TemplateNotFoundException: если шаблон с заданным id отсутствует.
             TemplateFieldNotFoundException: если field_values содержит
                 ошибочные 'field_id', отсутствующие в полях шаблона.
+            DocumentFieldValidationException: если значения не
+                соответствуют маскам типов полей.
             TemplateRenderErrorException: при ошибках генерации docx.
             TemplatePdfConvertErrorException: при ошибках генерации pdf.
 
         """
-        tpl = await cls.get_or_raise_not_found(id)
-        fields_dict = {field.id: field for field in tpl.fields}
+        plan = await cls.get_render_plan(id)
+        fields_dict = {field.id: field for field in plan.fields}
         context = {}
         for field_value in field_values:
             field = fields_dict.get(field_value["field_id"])
@@ -427,28 +768,33 @@ class TemplateService:
                         field_id=field_value["field_id"], template_id=id
                     )
                 )
-            if field_value["value"]:
-                context[field.tag] = field_value["value"]
-        context_default = {
-            field.tag: field.default or field.name for field in tpl.fields
-        }
-        docx_path = tpl.filename
-        try:
-            doc = DocxRender(docx_path)
-            buffer = doc.get_partial(context, context_default)
-        except Exception as e:
-            logger.exception(e)
+            if value := cls.field_context_value(
+                field, field_value["value"], field_value.get("items")
+            ):
+                context[field.tag] = value
+        if errors := FieldMaskValidator.validate(fields_dict, field_values):
+            raise DocumentFieldValidationException(detail=errors)
+        if not plan.docx_path:
             raise TemplateRenderErrorException()
-        filename = cls.PREVIEW_FILENAME_FORMAT.format(
-            name=tpl.title, ext="docx"
+        buffer, ext = await RenderService.get_partial(
+            plan.docx_path,
+            context,
+            cls.context_default(plan.fields),
+            fmt,
+            settings.PDF_FALLBACK_TO_DOCX,
+            plan.engine,
+            plan.version_id,
         )
-        if pdf:
-            try:
-                buffer = PdfConverter.docx_to_pdf(buffer)
-                filename = cls.PREVIEW_FILENAME_FORMAT.format(
-                    name=tpl.title, ext="pdf"
-                )
-            except Exception as e:
-                logger.exception(e)
-                raise TemplatePdfConvertErrorException()
+        filename = cls.PREVIEW_FILENAME_FORMAT.format(name=plan.name, ext=ext)
         return buffer, filename
+
+
+invalidation_bus.add_cache(
+    TemplateService._plan_cache, settings.TEMPLATE_RENDER_PLAN_CACHE_TTL
+)
+invalidation_bus.subscribe(
+    InvalidationEventType.TEMPLATE, TemplateService._invalidate
+)
+invalidation_bus.subscribe(
+    InvalidationEventType.FIELD_TYPE, TemplateService._invalidate
+)
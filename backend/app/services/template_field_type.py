@@ -1,10 +1,11 @@
 from typing import Optional
 
-from app.common.constants import Messages
+from app.common.constants import InvalidationEventType, Messages
 from app.common.exceptions import (
     TypeFieldAlreadyExistsException,
     TypeFieldNotFoundException,
 )
+from app.common.invalidation import invalidation_bus
 from app.crud.template_dao import TemplateFieldTypeDAO
 from app.models.base import pk_type
 from app.schemas.template import (
@@ -134,7 +135,9 @@ class TemplateFieldTypeService:
             raise TypeFieldAlreadyExistsException(
                 detail=Messages.TYPE_FIELD_ALREADY_EXISTS.format(dto.type)
             )
-        return await TemplateFieldTypeDAO.update_(id, **dto.model_dump())
+        obj = await TemplateFieldTypeDAO.update_(id, **dto.model_dump())
+        await invalidation_bus.publish(InvalidationEventType.FIELD_TYPE, id)
+        return obj
 
     @classmethod
     async def delete(cls, id: pk_type):
@@ -153,3 +156,4 @@ class TemplateFieldTypeService:
                 detail=Messages.TYPE_FIELD_NOT_FOUND.format(id)
             )
         await TemplateFieldTypeDAO.delete_(id)
+        await invalidation_bus.publish(InvalidationEventType.FIELD_TYPE, id)
@@ -1,9 +1,82 @@
+from typing import Final
+
 from celery import Celery
+from kombu import Exchange, Queue
 
 from app.config import settings
 
+
+class TaskQueue:
+    """Очереди фоновых задач (в порядке убывания приоритета)."""
+
+    INTERACTIVE: Final[str] = "interactive"  # превью по запросу пользователя
+    DOWNLOAD: Final[str] = "download"  # скачивание готовых документов
+    BULK: Final[str] = "bulk"  # миниатюры, пакетная генерация
+
+
+class TaskPriority:
+    """Приоритеты задач внутри очереди (для redis 0 - наивысший)."""
+
+    INTERACTIVE: Final[int] = 0
+    DOWNLOAD: Final[int] = 3
+    BULK: Final[int] = 9
+
+
 celery_app = Celery(
     "celery_tasks",
     broker=f"redis://{settings.REDIS_HOST}:{settings.REDIS_PORT}",
     include=["app.tasks.tasks"],
 )
+
+celery_app.conf.update(
+    task_queues=(
+        Queue(
+            TaskQueue.INTERACTIVE,
+            Exchange(TaskQueue.INTERACTIVE),
+            routing_key=TaskQueue.INTERACTIVE,
+        ),
+        Queue(
+            TaskQueue.DOWNLOAD,
+            Exchange(TaskQueue.DOWNLOAD),
+            routing_key=TaskQueue.DOWNLOAD,
+        ),
+        Queue(
+            TaskQueue.BULK,
+            Exchange(TaskQueue.BULK),
+            routing_key=TaskQueue.BULK,
+        ),
+    ),
+    task_default_queue=TaskQueue.DOWNLOAD,
+    task_default_priority=TaskPriority.DOWNLOAD,
+    # Маршрутизация задач по очередям: явные имена задач и шаблоны имен
+    task_routes={
+        "generate_template_thumbnail": {
+            "queue": TaskQueue.BULK,
+            "priority": TaskPriority.BULK,
+        },
+        "interactive.*": {
+            "queue": TaskQueue.INTERACTIVE,
+            "priority": TaskPriority.INTERACTIVE,
+        },
+        "download.*": {
+            "queue": TaskQueue.DOWNLOAD,
+            "priority": TaskPriority.DOWNLOAD,
+        },
+        "bulk.*": {
+            "queue": TaskQueue.BULK,
+            "priority": TaskPriority.BULK,
+        },
+    },
+    broker_transport_options={
+        # поддержка приоритетов в redis (очередь разбивается на подочереди)
+        "priority_steps": list(range(10)),
+        "sep": ":",
+        # воркер, слушающий несколько очередей, выбирает их по порядку
+        # объявления (interactive -> download -> bulk)
+        "queue_order_strategy": "priority",
+    },
+    # Генерация pdf занимает секунды: воркер не должен забирать задачи
+    # впрок, иначе срочная задача будет ждать за длинной очередью.
+    worker_prefetch_multiplier=1,
+    task_acks_late=True,
+)
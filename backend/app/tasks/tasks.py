@@ -2,6 +2,7 @@ import asyncio
 
 from celery.utils.log import get_task_logger
 
+from app.database import routing_scope
 from app.services.template import TemplateService
 from app.tasks.celery_config import celery_app
 
@@ -10,8 +11,16 @@ logger = get_task_logger(__name__)
 
 @celery_app.task(name="generate_template_thumbnail")
 def generate_template_thumbnail(template_id: int):
-    asyncio.run(TemplateService.generate_thumbnail(template_id))
+    # задача ставится сразу после загрузки файла: чтение из основной б.д.
+    with routing_scope(primary=True):
+        asyncio.run(TemplateService.generate_thumbnail(template_id))
     logger.info(
         "Завершена фоновая задача: "
         f"generate_template_thumbnail({template_id})"
     )
+
+
+@celery_app.task(name="bulk.generate_all_template_thumbnails")
+def generate_all_template_thumbnails():
+    asyncio.run(TemplateService.generate_all_thumbnails())
+    logger.info("Завершена фоновая задача: generate_all_template_thumbnails()")
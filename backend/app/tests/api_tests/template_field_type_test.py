@@ -4,17 +4,35 @@ from httpx import AsyncClient
 from app.config import settings
 
 expected_get_json = [
-    {"id": 1, "type": "str", "name": "Строка", "mask": "/^.*$/"},
-    {"id": 2, "type": "int", "name": "Целочисленный", "mask": "/^\\d*$/"},
+    {
+        "id": 1,
+        "type": "str",
+        "name": "Строка",
+        "mask": "/^.*$/",
+        "kind": "scalar",
+    },
+    {
+        "id": 2,
+        "type": "int",
+        "name": "Целочисленный",
+        "mask": "/^\\d*$/",
+        "kind": "scalar",
+    },
     {
         "id": 3,
         "type": "float",
         "name": "Вещественный",
         "mask": "/^\\d+(?:\\.|,)?\\d*$/",
+        "kind": "scalar",
     },
 ]
 
-new_type_json = {"type": "currency", "name": "валюта", "mask": "^\\d+$"}
+new_type_json = {
+    "type": "currency",
+    "name": "валюта",
+    "mask": "^\\d+$",
+    "kind": "table",
+}
 duplicate_type_json = {"type": "int", "name": "валюта", "mask": "^\\d+$"}
 
 
@@ -81,6 +99,7 @@ class TestFieldTypeApiV1:
             "type": "new_currency",
             "name": "new_валюта",
             "mask": "111",
+            "kind": "list",
         }
         response = await superuser_ac.put(
             route + str(id), json=updated_type_json
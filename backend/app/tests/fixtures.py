@@ -148,6 +148,7 @@ templates_for_read = [
         "owner_id": None,
         "is_favorited": False,
         "thumbnail": None,
+        "render_engine": "docxtpl",
         "grouped_fields": [
             {
                 "id": 1,
@@ -161,6 +162,7 @@ templates_for_read = [
                         "type": "str",
                         "length": 100,
                         "mask": template_field_type_mask_mapping.get("str"),
+                        "kind": "scalar",
                         "default": None,
                     },
                     {
@@ -171,6 +173,7 @@ templates_for_read = [
                         "type": "int",
                         "length": 20,
                         "mask": template_field_type_mask_mapping.get("int"),
+                        "kind": "scalar",
                         "default": None,
                     },
                 ],
@@ -187,6 +190,7 @@ templates_for_read = [
                         "type": "str",
                         "length": 40,
                         "mask": template_field_type_mask_mapping.get("str"),
+                        "kind": "scalar",
                         "default": None,
                     },
                     {
@@ -197,6 +201,7 @@ templates_for_read = [
                         "type": "float",
                         "length": 40,
                         "mask": template_field_type_mask_mapping.get("float"),
+                        "kind": "scalar",
                         "default": "0.0",
                     },
                 ],
@@ -211,6 +216,7 @@ templates_for_read = [
                 "type": "str",
                 "length": 100,
                 "mask": template_field_type_mask_mapping.get("str"),
+                "kind": "scalar",
                 "default": None,
             },
             {
@@ -221,6 +227,7 @@ templates_for_read = [
                 "type": "str",
                 "length": 100,
                 "mask": template_field_type_mask_mapping.get("str"),
+                "kind": "scalar",
                 "default": None,
             },
         ],
@@ -236,6 +243,7 @@ templates_for_read = [
         "is_favorited": False,
         "owner_id": None,
         "thumbnail": None,
+        "render_engine": "docxtpl",
         "grouped_fields": [
             {
                 "id": 3,
@@ -249,6 +257,7 @@ templates_for_read = [
                         "type": "str",
                         "length": 100,
                         "mask": template_field_type_mask_mapping.get("str"),
+                        "kind": "scalar",
                         "default": None,
                     },
                     {
@@ -259,6 +268,7 @@ templates_for_read = [
                         "type": "int",
                         "length": 20,
                         "mask": template_field_type_mask_mapping.get("int"),
+                        "kind": "scalar",
                         "default": None,
                     },
                 ],
@@ -275,6 +285,7 @@ templates_for_read = [
                         "type": "str",
                         "length": 40,
                         "mask": template_field_type_mask_mapping.get("str"),
+                        "kind": "scalar",
                         "default": "значение по умолчанию",
                     },
                     {
@@ -285,6 +296,7 @@ templates_for_read = [
                         "type": "float",
                         "length": 40,
                         "mask": template_field_type_mask_mapping.get("float"),
+                        "kind": "scalar",
                         "default": None,
                     },
                 ],
@@ -299,6 +311,7 @@ templates_for_read = [
                 "type": "str",
                 "length": 100,
                 "mask": template_field_type_mask_mapping.get("str"),
+                "kind": "scalar",
                 "default": None,
             },
             {
@@ -309,6 +322,7 @@ templates_for_read = [
                 "type": "str",
                 "length": 100,
                 "mask": template_field_type_mask_mapping.get("str"),
+                "kind": "scalar",
                 "default": None,
             },
         ],
@@ -351,6 +365,7 @@ template_with_invalid_type_field = {
     ],
 }
 
+docx_path = "app/tests/service_tests/docx/template1.docx"
 broken_docx_path = "app/tests/service_tests/docx/broken_template1.docx"
 broken_docx_error_tags = (("Тэг7",), ("Тэг6",))
 
@@ -378,6 +393,7 @@ documents_for_read = [
                         "type": "str",
                         "length": 100,
                         "mask": template_field_type_mask_mapping.get("str"),
+                        "kind": "scalar",
                         "default": "",
                         "value": "Значение поля 1",
                     },
@@ -389,8 +405,9 @@ documents_for_read = [
                         "type": "int",
                         "length": 20,
                         "mask": template_field_type_mask_mapping.get("int"),
+                        "kind": "scalar",
                         "default": "",
-                        "value": "Значение поля 2",
+                        "value": "2",
                     },
                 ],
             },
@@ -406,6 +423,7 @@ documents_for_read = [
                         "type": "str",
                         "length": 40,
                         "mask": template_field_type_mask_mapping.get("str"),
+                        "kind": "scalar",
                         "default": "",
                         "value": "Значение поля 3",
                     },
@@ -417,8 +435,9 @@ documents_for_read = [
                         "type": "float",
                         "length": 40,
                         "mask": template_field_type_mask_mapping.get("float"),
+                        "kind": "scalar",
                         "default": "0.0",
-                        "value": "Значение поля 4",
+                        "value": "4",
                     },
                 ],
             },
@@ -432,6 +451,7 @@ documents_for_read = [
                 "type": "str",
                 "length": 100,
                 "mask": template_field_type_mask_mapping.get("str"),
+                "kind": "scalar",
                 "default": "",
                 "value": "Значение поля 5",
             },
@@ -443,6 +463,7 @@ documents_for_read = [
                 "type": "str",
                 "length": 100,
                 "mask": template_field_type_mask_mapping.get("str"),
+                "kind": "scalar",
                 "default": "",
                 "value": "Значение поля 6",
             },
@@ -471,6 +492,7 @@ documents_for_read = [
                         "type": "str",
                         "length": 100,
                         "mask": template_field_type_mask_mapping.get("str"),
+                        "kind": "scalar",
                         "default": "",
                         "value": "Значение поля 11",
                     },
@@ -482,8 +504,9 @@ documents_for_read = [
                         "type": "int",
                         "length": 20,
                         "mask": template_field_type_mask_mapping.get("int"),
+                        "kind": "scalar",
                         "default": "",
-                        "value": "Значение поля 12",
+                        "value": "12",
                     },
                 ],
             },
@@ -499,6 +522,7 @@ documents_for_read = [
                         "type": "str",
                         "length": 40,
                         "mask": template_field_type_mask_mapping.get("str"),
+                        "kind": "scalar",
                         "default": "",
                         "value": "Значение поля 13",
                     },
@@ -510,8 +534,9 @@ documents_for_read = [
                         "type": "float",
                         "length": 40,
                         "mask": template_field_type_mask_mapping.get("float"),
+                        "kind": "scalar",
                         "default": "0.0",
-                        "value": "Значение поля 14",
+                        "value": "14",
                     },
                 ],
             },
@@ -525,6 +550,7 @@ documents_for_read = [
                 "type": "str",
                 "length": 100,
                 "mask": template_field_type_mask_mapping.get("str"),
+                "kind": "scalar",
                 "default": "",
                 "value": "Значение поля 15",
             },
@@ -536,6 +562,7 @@ documents_for_read = [
                 "type": "str",
                 "length": 100,
                 "mask": template_field_type_mask_mapping.get("str"),
+                "kind": "scalar",
                 "default": "",
                 "value": "",
             },
@@ -556,7 +583,7 @@ documents_for_write = [
             },
             {
                 "field_id": 2,
-                "value": "Значение поля 2",
+                "value": "2",
             },
             {
                 "field_id": 3,
@@ -564,7 +591,7 @@ documents_for_write = [
             },
             {
                 "field_id": 4,
-                "value": "Значение поля 4",
+                "value": "4",
             },
             {
                 "field_id": 5,
@@ -588,7 +615,7 @@ documents_for_write = [
             },
             {
                 "field_id": 2,
-                "value": "Значение поля 12",
+                "value": "12",
             },
             {
                 "field_id": 3,
@@ -596,7 +623,7 @@ documents_for_write = [
             },
             {
                 "field_id": 4,
-                "value": "Значение поля 14",
+                "value": "14",
             },
             {
                 "field_id": 5,
@@ -638,7 +665,7 @@ inconsistent_documents = [
             },
             {
                 "field_id": 4,
-                "value": "Значение поля 4",
+                "value": "4",
             },
             {
                 "field_id": 5,
@@ -661,7 +688,7 @@ documents_for_update = [
             },
             {
                 "field_id": 2,
-                "value": "Значение поля 200",
+                "value": "200",
             },
             {
                 "field_id": 3,
@@ -669,7 +696,7 @@ documents_for_update = [
             },
             {
                 "field_id": 4,
-                "value": "Значение поля 400",
+                "value": "400",
             },
             {
                 "field_id": 5,
@@ -693,7 +720,7 @@ documents_for_update = [
             },
             {
                 "field_id": 2,
-                "value": "Значение поля 120",
+                "value": "120",
             },
             {
                 "field_id": 3,
@@ -701,7 +728,7 @@ documents_for_update = [
             },
             {
                 "field_id": 4,
-                "value": "Значение поля 140",
+                "value": "140",
             },
             {
                 "field_id": 5,
@@ -739,6 +766,7 @@ updated_documents_for_read = [
                         "type": "str",
                         "length": 100,
                         "mask": template_field_type_mask_mapping.get("str"),
+                        "kind": "scalar",
                         "default": None,
                         "value": "Значение поля 100",
                     },
@@ -750,8 +778,9 @@ updated_documents_for_read = [
                         "type": "int",
                         "length": 20,
                         "mask": template_field_type_mask_mapping.get("int"),
+                        "kind": "scalar",
                         "default": None,
-                        "value": "Значение поля 200",
+                        "value": "200",
                     },
                 ],
             },
@@ -767,6 +796,7 @@ updated_documents_for_read = [
                         "type": "str",
                         "length": 40,
                         "mask": template_field_type_mask_mapping.get("str"),
+                        "kind": "scalar",
                         "default": None,
                         "value": "Значение поля 300",
                     },
@@ -778,8 +808,9 @@ updated_documents_for_read = [
                         "type": "float",
                         "length": 40,
                         "mask": template_field_type_mask_mapping.get("float"),
+                        "kind": "scalar",
                         "default": "0.0",
-                        "value": "Значение поля 400",
+                        "value": "400",
                     },
                 ],
             },
@@ -793,6 +824,7 @@ updated_documents_for_read = [
                 "type": "str",
                 "length": 100,
                 "mask": template_field_type_mask_mapping.get("str"),
+                "kind": "scalar",
                 "default": None,
                 "value": "Значение поля 500",
             },
@@ -804,6 +836,7 @@ updated_documents_for_read = [
                 "type": "str",
                 "length": 100,
                 "mask": template_field_type_mask_mapping.get("str"),
+                "kind": "scalar",
                 "default": None,
                 "value": "Значение поля 600",
             },
@@ -832,6 +865,7 @@ updated_documents_for_read = [
                         "type": "str",
                         "length": 100,
                         "mask": template_field_type_mask_mapping.get("str"),
+                        "kind": "scalar",
                         "default": "",
                         "value": "Значение поля 110",
                     },
@@ -843,8 +877,9 @@ updated_documents_for_read = [
                         "type": "int",
                         "length": 20,
                         "mask": template_field_type_mask_mapping.get("int"),
+                        "kind": "scalar",
                         "default": "",
-                        "value": "Значение поля 120",
+                        "value": "120",
                     },
                 ],
             },
@@ -860,6 +895,7 @@ updated_documents_for_read = [
                         "type": "str",
                         "length": 40,
                         "mask": template_field_type_mask_mapping.get("str"),
+                        "kind": "scalar",
                         "default": "",
                         "value": "Значение поля 130",
                     },
@@ -871,8 +907,9 @@ updated_documents_for_read = [
                         "type": "float",
                         "length": 40,
                         "mask": template_field_type_mask_mapping.get("float"),
+                        "kind": "scalar",
                         "default": "0.0",
-                        "value": "Значение поля 140",
+                        "value": "140",
                     },
                 ],
             },
@@ -886,6 +923,7 @@ updated_documents_for_read = [
                 "type": "str",
                 "length": 100,
                 "mask": template_field_type_mask_mapping.get("str"),
+                "kind": "scalar",
                 "default": "",
                 "value": "Значение поля 150",
             },
@@ -897,6 +935,7 @@ updated_documents_for_read = [
                 "type": "str",
                 "length": 100,
                 "mask": template_field_type_mask_mapping.get("str"),
+                "kind": "scalar",
                 "default": "",
                 "value": "Значение поля 160",
             },
@@ -932,7 +971,7 @@ inconsistent_documents = [
             },
             {
                 "field_id": 4,
-                "value": "Значение поля 4",
+                "value": "4",
             },
             {
                 "field_id": 5,
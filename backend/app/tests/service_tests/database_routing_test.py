@@ -0,0 +1,99 @@
+import asyncio
+
+import pytest
+import sqlalchemy
+from sqlalchemy import NullPool
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.config import settings
+from app.database import create_session_maker, engine, routing_scope
+
+# реплика - отдельная б.д. на том же сервере: по содержимому таблицы
+# routing_node видно, какая б.д. выполнила запрос
+REPLICA_DB_NAME = f"{settings.TEST_DB_NAME}_replica"
+NODE = sqlalchemy.table("routing_node", sqlalchemy.column("name"))
+READ = sqlalchemy.select(NODE.c.name)
+WRITE = sqlalchemy.delete(NODE).where(NODE.c.name == "absent")
+
+
+@pytest.fixture(scope="module")
+async def replica():
+    assert settings.MODE == "TEST"
+
+    async with engine.connect() as conn:
+        await conn.execution_options(isolation_level="AUTOCOMMIT")
+        await conn.exec_driver_sql(
+            f'DROP DATABASE IF EXISTS "{REPLICA_DB_NAME}"'
+        )
+        await conn.exec_driver_sql(f'CREATE DATABASE "{REPLICA_DB_NAME}"')
+    replica = create_async_engine(
+        engine.url.set(database=REPLICA_DB_NAME), poolclass=NullPool
+    )
+    for db, name in ((engine, "primary"), (replica, "replica")):
+        async with db.begin() as conn:
+            await conn.exec_driver_sql("DROP TABLE IF EXISTS routing_node")
+            await conn.exec_driver_sql("CREATE TABLE routing_node (name text)")
+            await conn.execute(sqlalchemy.insert(NODE).values(name=name))
+    yield replica
+
+    await replica.dispose()
+    async with engine.connect() as conn:
+        await conn.execution_options(isolation_level="AUTOCOMMIT")
+        await conn.exec_driver_sql("DROP TABLE routing_node")
+        await conn.exec_driver_sql(f'DROP DATABASE "{REPLICA_DB_NAME}"')
+
+
+@pytest.fixture
+def session_maker(replica):
+    return create_session_maker(engine, replica)
+
+
+async def read_node(session_maker) -> str:
+    async with session_maker() as session:
+        return await session.scalar(READ)
+
+
+async def write(session_maker) -> None:
+    async with session_maker() as session:
+        await session.execute(WRITE)
+        await session.commit()
+
+
+class TestDatabaseRouting:
+    async def test_reads_go_to_replica(self, session_maker):
+        assert await read_node(session_maker) == "replica"
+
+    async def test_without_replica_all_go_to_primary(self):
+        assert await read_node(create_session_maker(engine)) == "primary"
+
+    async def test_session_reads_primary_after_write(self, session_maker):
+        async with session_maker() as session:
+            assert await session.scalar(READ) == "replica"
+            await session.execute(WRITE)
+            assert await session.scalar(READ) == "primary"
+            await session.commit()
+
+    async def test_for_update_goes_to_primary(self, session_maker):
+        async with session_maker() as session:
+            assert await session.scalar(READ.with_for_update()) == "primary"
+
+    async def test_scope_sticks_to_primary_after_write(self, session_maker):
+        with routing_scope() as scope:
+            assert await read_node(session_maker) == "replica"
+            await write(session_maker)
+            assert scope.primary, "Запись не отмечена в области"
+            assert await read_node(session_maker) == "primary"
+        # следующий запрос api снова читает из реплики
+        with routing_scope():
+            assert await read_node(session_maker) == "replica"
+        assert await read_node(session_maker) == "replica"
+
+    async def test_primary_scope(self, session_maker):
+        with routing_scope(primary=True):
+            assert await read_node(session_maker) == "primary"
+
+    async def test_scope_shared_with_tasks(self, session_maker):
+        with routing_scope():
+            # запись в дочерней задаче (например, asyncio.gather)
+            await asyncio.create_task(write(session_maker))
+            assert await read_node(session_maker) == "primary"
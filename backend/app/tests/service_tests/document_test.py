@@ -2,18 +2,21 @@ from typing import Any
 
 import pytest
 import sqlalchemy
+from fastapi import UploadFile
 from icecream import ic  # noqa
 
 from app.common.exceptions import (
     DocumentAccessDeniedException,
     DocumentConflictException,
+    DocumentFieldValidationException,
     DocumentNotFoundException,
 )
 from app.config import settings
 from app.crud.base_dao import UserDAO
-from app.database import async_session_maker
+from app.crud.template_dao import TemplateDAO
+from app.database import async_session_maker, engine
 from app.models.document import Document, DocumentField
-from app.models.template import Template, TemplateField
+from app.models.template import Template, TemplateField, TemplateVersion
 from app.models.user import User
 from app.schemas.document import (
     DocumentReadDTO,
@@ -27,6 +30,8 @@ from app.tests.fixtures import (
     documents_for_read,
     documents_for_update,
     documents_for_write,
+    broken_docx_path,
+    docx_path,
     inconsistent_documents,
     templates_for_read,
     updated_documents_for_read,
@@ -93,7 +98,6 @@ async def prepare_templates():
 
 
 class TestDocumentService:
-
     def _compare_fields(self, field1, field2):
         assert field1.tag == field2.tag, "tag полей не совпадают"
         assert field1.name == field2.name, "name полей не совпадают"
@@ -140,6 +144,11 @@ class TestDocumentService:
         read_dto = await DocumentService.get(id=id, user=user)
         assert read_dto, "Объект не найден в базе"
         self._compare_documents(read_dto, expected_dto)
+        # ответ api (get_json_response) соответствует схеме
+        json_dto = DocumentReadDTO.model_validate_json(
+            read_dto.model_dump_json()
+        )
+        assert json_dto == read_dto
 
     async def test_get_invalid_id_raises_exception(self, active_user):
         with pytest.raises(DocumentNotFoundException):
@@ -204,6 +213,20 @@ class TestDocumentService:
             with pytest.raises(DocumentConflictException):
                 await DocumentService.add(DocumentWriteDTO(**doc), active_user)
 
+    @pytest.mark.parametrize("dto_write", (dto_write,))
+    async def test_add_raises_exception_for_invalid_values(
+        self,
+        dto_write: list[DocumentWriteDTO],
+        active_user,
+    ):
+        # значения полей 2 (int) и 4 (float) не соответствуют маскам
+        dto = dto_write[0].model_copy(deep=True)
+        dto.fields[1].value = "abc"
+        dto.fields[3].value = "1.5e3"
+        with pytest.raises(DocumentFieldValidationException) as e:
+            await DocumentService.add(dto, active_user)
+        assert [error["field_id"] for error in e.value.detail] == [2, 4]
+
     @pytest.mark.parametrize(
         "dto_write, dto_read",
         [(dto_write, dto_read)],
@@ -349,3 +372,231 @@ class TestDocumentService:
         # delete documents by owner
         for id in doc_ids:
             await DocumentService.delete(id, active_user)
+
+    @pytest.mark.parametrize("dto_write", (dto_write,))
+    async def test_get_render_plan(
+        self, dto_write: list[DocumentWriteDTO], active_user
+    ):
+        dto = dto_write[0]
+        doc_id = await DocumentService.add(dto, active_user)
+        statements = []
+
+        def count_statements(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        sync_engine = engine.sync_engine
+        sqlalchemy.event.listen(
+            sync_engine, "before_cursor_execute", count_statements
+        )
+        try:
+            plan = await DocumentService._get_for_render(doc_id, active_user)
+        finally:
+            sqlalchemy.event.remove(
+                sync_engine, "before_cursor_execute", count_statements
+            )
+        assert len(statements) == 1, "План загружается одним запросом"
+        assert plan.name == dto.description
+        assert plan.owner_id == active_user.id
+        assert [field.id for field in plan.fields] == [
+            field.field_id for field in dto.fields
+        ]
+        assert {id: value for id, (value, _) in plan.values.items()} == {
+            field.field_id: field.value for field in dto.fields
+        }
+        # загружаются только столбцы, нужные для генерации
+        assert "hint" in sqlalchemy.inspect(plan.fields[0]).unloaded
+        assert plan.fields[0].type.kind == "scalar"
+
+        await DocumentService.delete(doc_id, active_user)
+
+    async def _document_field_count(self, id) -> int:
+        async with async_session_maker() as session:
+            return await session.scalar(
+                sqlalchemy.select(sqlalchemy.func.count())
+                .select_from(DocumentField)
+                .filter_by(document_id=id)
+            )
+
+    async def _stored_field_values(self, id) -> Any:
+        async with async_session_maker() as session:
+            return await session.scalar(
+                sqlalchemy.select(Document.field_values).filter_by(id=id)
+            )
+
+    @pytest.mark.parametrize(
+        "dto_write, dto_read, dto_update, expected_dto_update",
+        [(dto_write, dto_read, dto_update, expected_dto_update)],
+    )
+    async def test_jsonb_storage(
+        self,
+        dto_write: list[DocumentWriteDTO],
+        dto_read: list[DocumentReadDTO],
+        dto_update: list[DocumentWriteDTO],
+        expected_dto_update: list[DocumentReadDTO],
+        active_user,
+        monkeypatch,
+    ):
+        monkeypatch.setattr(settings, "DOCUMENT_FIELDS_STORAGE", "jsonb")
+        doc_ids = [
+            await DocumentService.add(dto, active_user) for dto in dto_write
+        ]
+        for id, dto, expected_dto in zip(doc_ids, dto_write, dto_read):
+            assert await self._document_field_count(id) == 0
+            assert await self._stored_field_values(id) == (
+                Document.dump_field_values(dto.model_dump()["fields"])
+            )
+            await self._check_document_by_id(id, expected_dto, active_user)
+            plan = await DocumentService._get_for_render(id, active_user)
+            assert {id: value for id, (value, _) in plan.values.items()} == {
+                field.field_id: field.value for field in dto.fields
+            }
+
+        for id, dto, expected_dto in zip(
+            doc_ids, dto_update, expected_dto_update
+        ):
+            new_dto = await DocumentService.update(id, dto, active_user)
+            self._compare_documents(new_dto, expected_dto)
+            assert await self._document_field_count(id) == 0
+
+        for id in doc_ids:
+            await DocumentService.delete(id, active_user)
+
+    @pytest.mark.parametrize(
+        "dto_write, dto_read", [(dto_write[0], dto_read[0])]
+    )
+    async def test_storage_transition(
+        self,
+        dto_write: DocumentWriteDTO,
+        dto_read: DocumentReadDTO,
+        active_user,
+        monkeypatch,
+    ):
+        field_count = len(dto_write.fields)
+        # документ сохранен строками document_field
+        doc_id = await DocumentService.add(dto_write, active_user)
+        assert await self._document_field_count(doc_id) == field_count
+        assert await self._stored_field_values(doc_id) is None
+
+        # чтение в режиме jsonb, перевод при сохранении
+        monkeypatch.setattr(settings, "DOCUMENT_FIELDS_STORAGE", "jsonb")
+        await self._check_document_by_id(doc_id, dto_read, active_user)
+        await DocumentService.update(doc_id, dto_write, active_user)
+        assert await self._document_field_count(doc_id) == 0
+        assert await self._stored_field_values(doc_id)
+        await self._check_document_by_id(doc_id, dto_read, active_user)
+
+        # обратный перевод в строки document_field
+        monkeypatch.setattr(settings, "DOCUMENT_FIELDS_STORAGE", "eav")
+        await DocumentService.update(doc_id, dto_write, active_user)
+        assert await self._document_field_count(doc_id) == field_count
+        assert await self._stored_field_values(doc_id) is None
+        await self._check_document_by_id(doc_id, dto_read, active_user)
+        async with async_session_maker() as session:
+            assert await session.scalar(
+                sqlalchemy.select(Document.id).filter(
+                    Document.id == doc_id, Document.field_values.is_(None)
+                )
+            ), "field_values - NULL, а не json null"
+        plan = await DocumentService._get_for_render(doc_id, active_user)
+        assert len(plan.values) == field_count
+
+        await DocumentService.delete(doc_id, active_user)
+
+    @pytest.mark.parametrize("dto_write", (dto_write,))
+    async def test_get_all_by_field_value(
+        self,
+        dto_write: list[DocumentWriteDTO],
+        active_user,
+        admin_user,
+        monkeypatch,
+    ):
+        dto = dto_write[0]
+        field = dto.fields[0]
+        eav_id = await DocumentService.add(dto, active_user)
+        monkeypatch.setattr(settings, "DOCUMENT_FIELDS_STORAGE", "jsonb")
+        jsonb_id = await DocumentService.add(dto, active_user)
+        other_id = await DocumentService.add(dto_write[1], active_user)
+
+        docs = await DocumentService.get_all_by_field_value(
+            active_user, field.field_id, field.value
+        )
+        assert sorted(doc.id for doc in docs) == [eav_id, jsonb_id]
+        assert {doc.description for doc in docs} == {dto.description}
+        assert not await DocumentService.get_all_by_field_value(
+            active_user, field.field_id, "Другое значение"
+        )
+        assert not await DocumentService.get_all_by_field_value(
+            admin_user, field.field_id, field.value
+        )
+
+        for id in (eav_id, jsonb_id, other_id):
+            await DocumentService.delete(id, active_user)
+
+    @pytest.mark.parametrize("dto_write", (dto_write,))
+    async def test_get_merged_file_raises_exceptions(
+        self,
+        dto_write: list[DocumentWriteDTO],
+        active_user,
+        admin_user,
+        inactive_user,
+    ):
+        doc_ids = [
+            await DocumentService.add(dto, active_user) for dto in dto_write
+        ]
+        with pytest.raises(DocumentAccessDeniedException):
+            await DocumentService.get_merged_file(doc_ids, inactive_user)
+        with pytest.raises(DocumentAccessDeniedException):
+            await DocumentService.get_merged_file(doc_ids, admin_user)
+        with pytest.raises(DocumentConflictException):
+            await DocumentService.get_merged_file([], active_user)
+        with pytest.raises(DocumentNotFoundException):
+            await DocumentService.get_merged_file(
+                [*doc_ids, doc_ids[-1] + 10], active_user
+            )
+
+        for id in doc_ids:
+            await DocumentService.delete(id, active_user)
+
+    async def _upload_docx(self, template_id, path):
+        with open(path, "rb") as file:
+            return await TemplateService.update_docx_template(
+                template_id, UploadFile(file=file, filename="upload.docx")
+            )
+
+    @pytest.mark.parametrize("dto_write", (dto_write,))
+    async def test_template_version_pinning(
+        self, dto_write: list[DocumentWriteDTO], active_user
+    ):
+        dto = dto_write[0]
+        v1_id = await self._upload_docx(dto.template_id, docx_path)
+        v1_doc_id = await DocumentService.add(dto, active_user)
+        v2_id = await self._upload_docx(dto.template_id, broken_docx_path)
+        v2_doc_id = await DocumentService.add(dto, active_user)
+        try:
+            # документ генерируется по версии файла, с которой создан
+            v1_plan = await DocumentService._get_for_render(
+                v1_doc_id, active_user
+            )
+            assert v1_plan.version_id == v1_id
+            assert v1_plan.docx_path.endswith("_v1.docx")
+            v2_plan = await DocumentService._get_for_render(
+                v2_doc_id, active_user
+            )
+            assert v2_plan.version_id == v2_id
+            assert v2_plan.docx_path.endswith("_v2.docx")
+
+            # обновление без смены шаблона версию не меняет
+            await DocumentService.update(v1_doc_id, dto, active_user)
+            v1_plan = await DocumentService._get_for_render(
+                v1_doc_id, active_user
+            )
+            assert v1_plan.version_id == v1_id
+        finally:
+            for id in (v1_doc_id, v2_doc_id):
+                await DocumentService.delete(id, active_user)
+            await TemplateDAO.update_(
+                dto.template_id, filename=None, version_id=None
+            )
+            async with async_session_maker() as session:
+                await session.execute(sqlalchemy.delete(TemplateVersion))
+                await session.commit()
@@ -0,0 +1,63 @@
+import pathlib
+from io import BytesIO
+
+from docx import Document
+from docx.enum.text import WD_COLOR_INDEX
+from PIL import Image
+
+from app.common.constants import FileFormat
+from app.services.docx_html import DocxHtmlConverter
+from app.services.render import RenderService
+
+TEMPLATE_DOCX = pathlib.Path(__file__).parent / "docx" / "template1.docx"
+
+
+def make_docx() -> BytesIO:
+    docx = Document()
+    docx.sections[0].header.paragraphs[0].text = "Колонтитул"
+    docx.add_heading("Заголовок", level=2)
+    paragraph = docx.add_paragraph("Обычный <текст> ")
+    paragraph.add_run("жирный").bold = True
+    paragraph.add_run(" тэг").font.highlight_color = WD_COLOR_INDEX.YELLOW
+    table = docx.add_table(rows=2, cols=2)
+    table.cell(0, 0).merge(table.cell(1, 0))
+    table.cell(0, 1).text = "Ячейка"
+    image = BytesIO()
+    Image.new("RGB", (4, 4)).save(image, format="png")
+    image.seek(0)
+    docx.add_picture(image)
+    buffer = BytesIO()
+    docx.save(buffer)
+    buffer.seek(0)
+    return buffer
+
+
+class TestDocxHtmlConverter:
+    def test_convert(self):
+        html = DocxHtmlConverter.convert(make_docx())
+        assert '<header class="docx-header"><p>Колонтитул</p>' in html
+        assert "<h2>Заголовок</h2>" in html
+        assert "Обычный &lt;текст&gt; <b>жирный</b>" in html
+        assert '<span style="background-color:yellow"> тэг</span>' in html
+        assert '<td rowspan="2">' in html, "Не учтено объединение ячеек"
+        assert "<td><p>Ячейка</p></td>" in html
+        assert '<img src="data:image/png;base64,' in html
+
+    async def test_render_html_cached(self, monkeypatch):
+        """html предпросмотр кэшируется по версии шаблона и контексту"""
+        RenderService._html_cache.clear()
+        calls = []
+        render = RenderService._render
+
+        def counting_render(*args):
+            calls.append(args)
+            return render(*args)
+
+        monkeypatch.setattr(RenderService, "_render", counting_render)
+        for _ in range(2):
+            buffer, ext = await RenderService.get_draft(
+                str(TEMPLATE_DOCX), {}, FileFormat.HTML
+            )
+            assert ext == FileFormat.HTML
+            assert buffer.getvalue().startswith(b'<div class="docx-preview"')
+        assert len(calls) == 1, "Повторная генерация html предпросмотра"
@@ -0,0 +1,82 @@
+import pytest
+from docx import Document
+from docx.enum.section import WD_ORIENT, WD_SECTION
+from docx.enum.style import WD_STYLE_TYPE
+
+from app.common.constants import RenderEngine
+from app.common.exceptions import TemplateRenderErrorException
+from app.services.docx_merge import DocxMerger
+from app.services.docx_render import DocxRender
+from app.services.render import RenderService
+
+
+def make_docx(path, text: str, landscape: bool = False) -> str:
+    docx = Document()
+    docx.styles.add_style(DocxRender.TAG_STYLE_NAME, WD_STYLE_TYPE.CHARACTER)
+    section = docx.sections[0]
+    section.header.paragraphs[0].text = f"Колонтитул: {text}"
+    if landscape:
+        section.orientation = WD_ORIENT.LANDSCAPE
+        section.page_width, section.page_height = (
+            section.page_height,
+            section.page_width,
+        )
+    docx.add_paragraph(text)
+    docx.save(path)
+    return str(path)
+
+
+class TestDocxMerger:
+    def test_sections(self, tmp_path):
+        """Каждая часть - отдельный раздел с новой страницы"""
+        merger = DocxMerger()
+        for number, landscape in enumerate((False, True, False)):
+            merger.append(
+                make_docx(
+                    tmp_path / f"{number}.docx", f"Часть {number}", landscape
+                )
+            )
+        docx = Document(merger.save())
+        assert [p.text for p in docx.paragraphs if p.text] == [
+            "Часть 0",
+            "Часть 1",
+            "Часть 2",
+        ]
+        sections = docx.sections
+        assert [section.orientation for section in sections] == [
+            WD_ORIENT.PORTRAIT,
+            WD_ORIENT.LANDSCAPE,
+            WD_ORIENT.PORTRAIT,
+        ]
+        assert sections[1].page_width > sections[1].page_height
+        assert all(
+            section.start_type == WD_SECTION.NEW_PAGE
+            for section in sections[1:]
+        )
+        assert sections[2].header.paragraphs[0].text == "Колонтитул: Часть 0"
+
+
+class TestRenderMerge:
+    async def test_merge(self, tmp_path):
+        parts = [
+            (
+                make_docx(tmp_path / f"{number}.docx", "Имя: {{ name }}"),
+                {"name": f"Документ {number}"},
+                None,
+                RenderEngine.DOCXTPL,
+            )
+            for number in range(5)
+        ]
+        buffer, ext = await RenderService.merge(parts)
+        assert ext == "docx"
+        docx = Document(buffer)
+        assert [p.text for p in docx.paragraphs if p.text] == [
+            f"Имя: Документ {number}" for number in range(5)
+        ]
+
+    async def test_merge_error(self, tmp_path):
+        parts = [
+            (str(tmp_path / "missing.docx"), {}, None, RenderEngine.DOCXTPL),
+        ]
+        with pytest.raises(TemplateRenderErrorException):
+            await RenderService.merge(parts)
@@ -1,6 +1,22 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import jinja2
 import pytest
+from docx import Document
+from docx.enum.style import WD_STYLE_TYPE
+from docx.enum.text import WD_COLOR_INDEX
+from docx.oxml import parse_xml
+from docx.oxml.ns import nsdecls
 
-from app.services.docx_render import CustomFilters
+from app.services.docx_render import (
+    CustomFilters,
+    DocxJinjaEnvironment,
+    DocxRender,
+    DocxTagIndex,
+    FieldPlaceholder,
+    TableRow,
+    jinja_env,
+)
 
 fiom_fixture = "иванов иван петрович"
 fiom_results = {
@@ -148,3 +164,197 @@ class TestCustomFilters:
         assert (
             filters.split(line, sep) == result
         ), "Фильтр split вернул неожиданный результат"
+
+
+def make_template(path) -> str:
+    docx = Document()
+    docx.styles.add_style(DocxRender.TAG_STYLE_NAME, WD_STYLE_TYPE.CHARACTER)
+    docx.add_paragraph("Исполнитель: {{ fio|fio_short }}")
+    docx.save(path)
+    return str(path)
+
+
+class TestDocxJinjaEnvironment:
+    def test_compiled_once(self, tmp_path, monkeypatch):
+        """Повторная генерация не компилирует xml шаблона"""
+        path = make_template(tmp_path / "template.docx")
+        jinja_env._templates.clear()
+        monkeypatch.setattr(jinja_env, "bytecode_cache", None)
+        calls = []
+        compile_ = jinja_env.compile
+
+        def counting_compile(source, *args, **kwargs):
+            calls.append(source)
+            return compile_(source, *args, **kwargs)
+
+        monkeypatch.setattr(jinja_env, "compile", counting_compile)
+        compiled = []
+        for _ in range(3):
+            buffer = DocxRender(path).get_document({"fio": "иванов иван"})
+            assert Document(buffer).paragraphs[0].text == (
+                "Исполнитель: Иванов И."
+            )
+            compiled.append(len(calls))
+        assert compiled[0] > 0
+        assert compiled[0] == compiled[-1], "Повторная компиляция шаблона"
+
+    def test_filters_bound_per_call(self, tmp_path):
+        """Фильтры отключены только для черновика, а не для документа"""
+        path = make_template(tmp_path / "template.docx")
+
+        def render(draft: bool) -> str:
+            doc = DocxRender(path)
+            context = {"fio": "иванов иван"}
+            buffer = (
+                doc.get_draft(context) if draft else doc.get_document(context)
+            )
+            return Document(buffer).paragraphs[0].text
+
+        with ThreadPoolExecutor(4) as pool:
+            results = list(pool.map(render, [True, False] * 4))
+        assert (
+            results
+            == [
+                "Исполнитель: иванов иван",
+                "Исполнитель: Иванов И.",
+            ]
+            * 4
+        )
+
+    def test_bytecode_cache(self, tmp_path, monkeypatch):
+        """Новый воркер загружает байт-код, а не компилирует шаблон"""
+        cache = jinja2.FileSystemBytecodeCache(str(tmp_path))
+        source = "{{ fio|fio_short }}"
+        DocxJinjaEnvironment(bytecode_cache=cache).from_string(source)
+        env = DocxJinjaEnvironment(bytecode_cache=cache)
+
+        def fail_compile(*args, **kwargs):
+            raise AssertionError("Шаблон скомпилирован повторно")
+
+        monkeypatch.setattr(env, "compile", fail_compile)
+        template = env.from_string(source)
+        with env.bind_filters(CustomFilters()):
+            assert template.render(fio="петров петр") == "Петров П."
+
+
+def make_list_template(path) -> str:
+    docx = Document()
+    docx.styles.add_style(DocxRender.TAG_STYLE_NAME, WD_STYLE_TYPE.CHARACTER)
+    docx.add_paragraph("Метка: {{ labels }}")
+    docx.add_paragraph("Позиций: {{ goods|length }}")
+    table = docx.add_table(rows=2, cols=2)
+    table.cell(0, 0).text = "Наименование"
+    table.cell(0, 1).text = "Сумма"
+    table.cell(1, 0).text = "{{ goods.name }}"
+    table.cell(1, 1).text = "{{ goods.price|currency_to_words }}"
+    docx.save(path)
+    return str(path)
+
+
+class TestListFields:
+    def test_rows_expanded(self, tmp_path):
+        """Строка таблицы и абзац размножаются по элементам списка"""
+        path = make_list_template(tmp_path / "template.docx")
+        goods = [TableRow(name=f"Товар {i}", price="1") for i in range(3)]
+        buffer = DocxRender(path).get_document(
+            {"labels": ["первая", "вторая"], "goods": goods}
+        )
+        docx = Document(buffer)
+        assert [p.text for p in docx.paragraphs] == [
+            "Метка: первая",
+            "Метка: вторая",
+            "Позиций: 3",
+        ]
+        rows = [
+            [cell.text for cell in row.cells] for row in docx.tables[0].rows
+        ]
+        assert rows[0] == ["Наименование", "Сумма"]
+        assert rows[1:] == [
+            [f"Товар {i}", "один рубль, 00 копеек"] for i in range(3)
+        ]
+
+    def test_placeholders(self, tmp_path):
+        """Незаполненное поле оставляет одну строку с заглушками"""
+        path = make_list_template(tmp_path / "template.docx")
+        buffer = DocxRender(path).get_partial(
+            {},
+            {
+                "labels": [FieldPlaceholder("Метки")],
+                "goods": [TableRow.placeholder("Товары")],
+            },
+        )
+        docx = Document(buffer)
+        assert docx.paragraphs[0].text == "Метка: Метки"
+        assert [cell.text for cell in docx.tables[0].rows[1].cells] == [
+            "Товары.name",
+            "Прописью(Товары.price)",
+        ], "Фильтр применен к заглушке"
+        assert len(docx.tables[0].rows) == 2
+
+
+TEXT_BOX_XML = (
+    "<w:r %s><w:pict><v:shape><v:textbox><w:txbxContent><w:p>"
+    "<w:r><w:t xml:space='preserve'>{{ </w:t></w:r>"
+    "<w:r><w:rPr><w:rStyle w:val='TemplateTag'/></w:rPr><w:t>box</w:t></w:r>"
+    "<w:r><w:t xml:space='preserve'> }}</w:t></w:r>"
+    "</w:p></w:txbxContent></v:textbox></v:shape></w:pict></w:r>"
+) % nsdecls("w", "v")
+
+
+def add_tag(paragraph, tag: str, parts: int = 1):
+    """Добавляет в абзац выражение {{ tag }} (тэг из parts прогонов)."""
+    paragraph.add_run("{{ ")
+    size = -(-len(tag) // parts)
+    for start in range(0, len(tag), size):
+        paragraph.add_run(tag[start : start + size], DocxRender.TAG_STYLE_NAME)
+    paragraph.add_run(" }}")
+
+
+def make_tagged_template(path) -> str:
+    docx = Document()
+    docx.styles.add_style(DocxRender.TAG_STYLE_NAME, WD_STYLE_TYPE.CHARACTER)
+    add_tag(docx.add_paragraph("Тело: "), "body", parts=2)
+    add_tag(docx.sections[0].header.paragraphs[0], "head")
+    add_tag(docx.sections[0].footer.paragraphs[0], "foot")
+    cell = docx.add_table(rows=1, cols=1).cell(0, 0)
+    add_tag(cell.add_table(rows=1, cols=1).cell(0, 0).paragraphs[0], "nested")
+    docx.add_paragraph()._p.append(parse_xml(TEXT_BOX_XML))
+    docx.save(path)
+    return str(path)
+
+
+class TestDocxTagIndex:
+    def test_all_parts(self, tmp_path):
+        """Индекс охватывает колонтитулы, вложенные таблицы и надписи"""
+        docx = Document(make_tagged_template(tmp_path / "template.docx"))
+        index = DocxTagIndex(docx)
+        assert set(index.tag_runs) == {"body", "head", "foot", "nested", "box"}
+        assert all(len(runs) == 1 for runs in index.tag_runs.values())
+        assert all("{{" in runs[0].text for runs in index.tag_runs.values())
+        assert len(index.expression_runs) == 10
+        assert [r.text for r in docx.paragraphs[0].runs] == [
+            "Тело: ",
+            "{{ ",
+            "body",
+            "",
+            " }}",
+        ], "Прогоны тэга не объединены"
+
+    def test_partial_highlight(self, tmp_path):
+        """Незаполненные тэги выделяются во всех частях документа"""
+        path = make_tagged_template(tmp_path / "template.docx")
+        buffer = DocxRender(path).get_partial(
+            {"body": "1", "nested": "2"}, {"head": "Шапка", "box": "Надпись"}
+        )
+        docx = Document(buffer)
+        header_runs = docx.sections[0].header.paragraphs[0].runs
+        assert header_runs[0].font.highlight_color == WD_COLOR_INDEX.YELLOW
+        assert "".join(r.text for r in header_runs) == "Шапка"
+        assert docx.paragraphs[0].text == "Тело: 1"
+        assert all(
+            r.font.highlight_color is None for r in docx.paragraphs[0].runs
+        )
+        highlights = docx.element.body.xpath(
+            ".//w:txbxContent//w:highlight/@w:val"
+        )
+        assert highlights == ["yellow"]
@@ -0,0 +1,123 @@
+import os
+import pathlib
+import shutil
+import zipfile
+from io import BytesIO
+
+import pytest
+from docx import Document
+from docx.enum.style import WD_STYLE_TYPE
+from docx.enum.text import WD_COLOR_INDEX
+
+from app.services.docx_render import DocxRender
+from app.services.docx_stream import (
+    DocxStreamPlan,
+    DocxStreamRender,
+    StreamVariant,
+)
+
+DOCX_DIR = pathlib.Path(__file__).parent / "docx"
+CORPUS = sorted(DOCX_DIR.glob("*.docx"))
+
+
+def make_template(path: pathlib.Path, control: bool = False) -> str:
+    """Шаблон с тэгами в колонтитуле, таблице, фильтрами и выделением."""
+    docx = Document()
+    style = docx.styles.add_style(
+        DocxRender.TAG_STYLE_NAME, WD_STYLE_TYPE.CHARACTER
+    )
+    docx.sections[0].header.paragraphs[0].text = "Шапка {{ org }}"
+    paragraph = docx.add_paragraph("Договор с ")
+    paragraph.add_run("{{ ")
+    paragraph.add_run("name").style = style
+    paragraph.add_run("|fio_short }}")
+    paragraph.add_run(" от ")
+    run = paragraph.add_run("{{ date }}")
+    run.font.highlight_color = WD_COLOR_INDEX.GREEN
+    table = docx.add_table(rows=1, cols=2)
+    table.cell(0, 0).text = "{{ org }}"
+    table.cell(0, 1).text = "{{ sum|currency_to_words }}"
+    if control:
+        docx.add_paragraph("{% if name %}{{ name }}{% endif %}")
+    docx.save(path)
+    return str(path)
+
+
+def assert_same_output(path: str, context: dict, defaults: dict) -> None:
+    """Сравнивает все элементы архива, сгенерированные двумя движками."""
+    for method, args in (
+        ("get_document", ()),
+        ("get_draft", ()),
+        ("get_partial", (defaults,)),
+        ("get_partial", (None,)),
+    ):
+        expected = getattr(DocxRender(path), method)(dict(context), *args)
+        result = getattr(DocxStreamRender(path), method)(dict(context), *args)
+        with zipfile.ZipFile(expected) as a, zipfile.ZipFile(result) as b:
+            assert a.namelist() == b.namelist()
+            for name in a.namelist():
+                assert a.read(name) == b.read(name), f"{method}: {name}"
+
+
+class TestDocxStreamRender:
+    @pytest.mark.parametrize("source", CORPUS, ids=lambda p: p.name)
+    def test_corpus_same_as_docxtpl(self, source, tmp_path):
+        path = str(shutil.copy(source, tmp_path))
+        plan = DocxStreamPlan.build(path)
+        assert set(plan.variants) == {
+            StreamVariant.DOCUMENT,
+            StreamVariant.DRAFT,
+            StreamVariant.PARTIAL,
+        }, plan.reason
+        defaults = {tag: f"умолчание {tag}" for tag in plan.tags}
+        for context in (
+            {tag: f'значение "{i}" > 0' for i, tag in enumerate(plan.tags)},
+            {plan.tags[0]: "иванов иван иванович"},
+            {},
+        ):
+            assert_same_output(path, context, defaults)
+
+    def test_template_features_same_as_docxtpl(self, tmp_path):
+        path = make_template(tmp_path / "template.docx")
+        context = {
+            "name": "иванов иван иванович",
+            "org": 'ООО "Ромашка"',
+            "date": "01.01.2024",
+            "sum": "1234.5",
+        }
+        defaults = {tag: tag.upper() for tag in context}
+        assert_same_output(path, context, defaults)
+        assert_same_output(path, {"org": ""}, defaults)
+
+    def test_fallback_to_docxtpl(self, tmp_path):
+        """Управляющие тэги и переносы строк генерируются docxtpl"""
+        path = make_template(tmp_path / "template.docx", control=True)
+        plan = DocxStreamPlan.build(path)
+        assert not plan.streamable, "Шаблон с {% if %} скомпилирован"
+        assert_same_output(path, {"name": "иванов иван"}, {})
+        path = make_template(tmp_path / "template2.docx")
+        assert_same_output(path, {"org": "строка 1\nстрока 2"}, {})
+
+    def test_values_escaped(self, tmp_path):
+        path = make_template(tmp_path / "template.docx")
+        buffer = DocxStreamRender(path).get_document({"org": "A & B <C>"})
+        docx = Document(buffer)
+        assert docx.tables[0].cell(0, 0).text == "A & B <C>"
+
+    def test_plan_saved_and_invalidated(self, tmp_path):
+        path = make_template(tmp_path / "template.docx")
+        plan = DocxStreamPlan.build(path)
+        assert os.path.exists(DocxStreamPlan.plan_path(path))
+        DocxStreamPlan._cache.clear()
+        loaded = DocxStreamPlan.load(path)
+        assert loaded.version == plan.version
+        assert loaded.variants == plan.variants
+        docx = Document(path)
+        docx.add_paragraph("{{ city }}")
+        docx.save(path)
+        os.utime(path, ns=(0, plan.version[0] + 1))
+        assert "city" in DocxStreamPlan.load(path).tags, "Устаревший план"
+        buffer = DocxStreamRender(path).get_document({"city": "Москва"})
+        assert Document(BytesIO(buffer.getvalue())).paragraphs[-1].text == (
+            "Москва"
+        )
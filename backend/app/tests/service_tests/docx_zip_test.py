@@ -0,0 +1,68 @@
+import zipfile
+from io import BytesIO
+
+import pytest
+from docx import Document
+from docx.enum.style import WD_STYLE_TYPE
+from docxtpl import DocxTemplate
+from PIL import Image
+
+from app.services.docx_render import DocxRender
+from app.services.docx_zip import DocxZipWriter
+
+
+@pytest.fixture
+def template_path(tmp_path) -> str:
+    docx = Document()
+    docx.styles.add_style(DocxRender.TAG_STYLE_NAME, WD_STYLE_TYPE.CHARACTER)
+    docx.sections[0].header.paragraphs[0].text = "{{ header }}"
+    docx.add_paragraph("Значение: {{ value }}")
+    image = BytesIO()
+    Image.new("RGB", (64, 64), "red").save(image, format="png")
+    image.seek(0)
+    docx.add_picture(image)
+    path = tmp_path / "template.docx"
+    docx.save(path)
+    return str(path)
+
+
+def rendered(path: str, passthrough: bool) -> zipfile.ZipFile:
+    template = DocxTemplate(path)
+    template.render({"header": "Шапка", "value": "42"})
+    out = BytesIO()
+    if passthrough:
+        DocxZipWriter.save(template, path, out, compresslevel=1)
+    else:
+        template.save(out)
+    return zipfile.ZipFile(out)
+
+
+class TestDocxZipWriter:
+    def test_rendered_parts_match_full_save(self, template_path):
+        expected = rendered(template_path, passthrough=False)
+        result = rendered(template_path, passthrough=True)
+        assert result.testzip() is None
+        assert sorted(result.namelist()) == sorted(expected.namelist())
+        for name in ("word/document.xml", "word/header1.xml"):
+            assert result.read(name) == expected.read(name), name
+        docx = Document(BytesIO(result.fp.getvalue()))
+        assert docx.paragraphs[0].text == "Значение: 42"
+        assert docx.sections[0].header.paragraphs[0].text == "Шапка"
+
+    def test_unchanged_members_copied_raw(self, template_path):
+        result = rendered(template_path, passthrough=True)
+        with zipfile.ZipFile(template_path) as source:
+            for info in source.infolist():
+                if info.filename.startswith("word/media/"):
+                    copied = result.getinfo(info.filename)
+                    assert copied.CRC == info.CRC
+                    assert copied.compress_size == info.compress_size
+
+    def test_fallback_on_media_replacement(self, template_path):
+        template = DocxTemplate(template_path)
+        template.replace_zipname("word/media/image1.png", template_path)
+        template.render({})
+        out = BytesIO()
+        DocxZipWriter.save(template, template_path, out)
+        with zipfile.ZipFile(out) as result, open(template_path, "rb") as f:
+            assert result.read("word/media/image1.png") == f.read()
@@ -0,0 +1,75 @@
+import pytest
+
+from app.models.template import TemplateField, TemplateFieldType
+from app.services.field_validator import FieldMaskValidator
+
+
+def make_field(
+    id: int, mask: str | None, kind: str = "scalar", type_id: int | None = None
+) -> TemplateField:
+    type_id = type_id or id
+    field_type = TemplateFieldType(
+        id=type_id, type=f"type{type_id}", name="Тип", mask=mask, kind=kind
+    )
+    return TemplateField(
+        id=id, tag=f"tag{id}", name="Поле", type_id=type_id, type=field_type
+    )
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    FieldMaskValidator.invalidate()
+    yield
+    FieldMaskValidator.invalidate()
+
+
+class TestFieldMaskValidator:
+    @pytest.mark.parametrize(
+        "mask, value, expected",
+        [
+            ("/^\\d*$/", "123", True),
+            ("/^\\d*$/", "12a", False),
+            ("/^abc$/i", "ABC", True),
+            ("/^abc$/", "ABC", False),
+            ("\\d", "a1", True),
+        ],
+    )
+    def test_compile(self, mask, value, expected):
+        pattern = FieldMaskValidator.compile(mask)
+        assert bool(pattern.search(value)) is expected
+
+    @pytest.mark.parametrize("mask", (None, "", "/[a-/"))
+    def test_compile_empty_or_invalid(self, mask):
+        assert FieldMaskValidator.compile(mask) is None
+
+    def test_validate(self):
+        fields = {
+            1: make_field(1, "/^\\d*$/"),
+            2: make_field(2, None),
+            3: make_field(3, "/^\\d*$/", kind="list"),
+            4: make_field(4, "/^\\d*$/", kind="table"),
+        }
+        values = [
+            {"field_id": 1, "value": "abc"},
+            {"field_id": 2, "value": "abc"},
+            {"field_id": 3, "value": None, "items": ["1", "x"]},
+            {"field_id": 4, "value": None, "items": [{"a": "x"}]},
+            {"field_id": 5, "value": "abc"},
+        ]
+        errors = FieldMaskValidator.validate(fields, values)
+        assert [(e["field_id"], e["tag"]) for e in errors] == [
+            (1, "tag1"),
+            (3, "tag3"),
+        ]
+        values = [{"field_id": 1, "value": ""}, {"field_id": 1, "value": "7"}]
+        assert FieldMaskValidator.validate(fields, values) == []
+
+    def test_cache_invalidation(self):
+        field = make_field(1, "/^\\d*$/")
+        pattern = FieldMaskValidator.get_pattern(field.type)
+        assert FieldMaskValidator.get_pattern(field.type) is pattern
+        # маска изменена в базе - компилируется заново
+        field.type.mask = "/^[a-z]*$/"
+        assert FieldMaskValidator.get_pattern(field.type).search("abc")
+        FieldMaskValidator.invalidate(field.type_id)
+        assert field.type_id not in FieldMaskValidator._compiled
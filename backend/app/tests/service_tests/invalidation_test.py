@@ -0,0 +1,166 @@
+import asyncio
+import time
+import uuid
+from contextlib import asynccontextmanager, suppress
+from typing import AsyncIterator, Callable, Optional
+
+import pytest
+import sqlalchemy
+
+from app.common.cache import TTLCache
+from app.common.constants import InvalidationEventType
+from app.common.exceptions import TemplateNotFoundException
+from app.common.invalidation import InvalidationBus, invalidation_bus
+from app.database import engine
+from app.schemas.template import TemplateWriteDTO
+from app.services.template import TemplateService
+from app.tests.fixtures import templates_for_write
+
+
+async def wait_until(predicate: Callable[[], bool], timeout: float = 5):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "Не дождались события"
+        await asyncio.sleep(0.01)
+
+
+@asynccontextmanager
+async def listening(bus: InvalidationBus) -> AsyncIterator[InvalidationBus]:
+    """Шина с запущенным слушателем (как в lifespan приложения)."""
+    task = asyncio.create_task(bus.listen())
+    try:
+        await wait_until(lambda: bus.connected)
+        yield bus
+    finally:
+        task.cancel()
+        with suppress(asyncio.CancelledError):
+            await task
+
+
+def make_bus(channel: Optional[str] = None, **kwargs) -> InvalidationBus:
+    """Шина процесса; отдельный канал не получает события других тестов."""
+    return InvalidationBus(
+        channel=channel or f"test_invalidation_{uuid.uuid4().hex}",
+        reconnect_delay=0.05,
+        **kwargs,
+    )
+
+
+class TestInvalidationBus:
+    async def test_event_delivered_to_other_process(self):
+        publisher = make_bus()
+        events = []
+        async with listening(make_bus(publisher.channel)) as listener:
+            listener.subscribe(InvalidationEventType.TEMPLATE, events.append)
+            await publisher.publish(InvalidationEventType.TEMPLATE, 42)
+            await wait_until(lambda: events)
+        [event] = events
+        assert event.type == InvalidationEventType.TEMPLATE
+        assert event.id == 42
+        assert event.source == publisher.source
+
+    async def test_own_events_applied_once(self):
+        other = make_bus()
+        events = []
+        async with listening(make_bus(other.channel)) as bus:
+            bus.subscribe(InvalidationEventType.FIELD_TYPE, events.append)
+            await bus.publish(InvalidationEventType.FIELD_TYPE, 1)
+            assert [event.id for event in events] == [1], "Не применено"
+            # события доставляются по порядку: после события другого
+            # процесса собственное уже получено слушателем
+            await other.publish(InvalidationEventType.FIELD_TYPE, 2)
+            await wait_until(lambda: len(events) == 2)
+        assert [event.id for event in events] == [1, 2]
+
+    async def test_fallback_ttl_while_disconnected(self):
+        bus = make_bus(fallback_ttl=0.05)
+        cache: TTLCache[int] = TTLCache("test_invalidation", 10, None)
+        bus.add_cache(cache, None)
+        cache.set("before", 1)
+        await asyncio.sleep(0.1)
+        assert cache.get("before") is None, "Без слушателя действует TTL"
+
+        async with listening(bus):
+            cache.set("connected", 2)
+            await asyncio.sleep(0.1)
+            assert cache.get("connected") == 2, "Запись без TTL истекла"
+        # после отключения записи живут не дольше fallback_ttl
+        assert cache.get("connected") == 2
+        await asyncio.sleep(0.1)
+        assert cache.get("connected") is None
+
+        cache.set("missed", 3)
+        async with listening(bus):
+            # события за время отключения могли быть пропущены
+            assert cache.get("missed") is None
+
+    async def test_listener_reconnects(self):
+        bus = make_bus(fallback_ttl=60)
+        cache: TTLCache[int] = TTLCache("test_invalidation", 10, None)
+        bus.add_cache(cache, None)
+        events = []
+        bus.subscribe(InvalidationEventType.TEMPLATE, events.append)
+        async with listening(bus):
+            cache.set("key", 1)
+            async with engine.begin() as conn:
+                await conn.execute(
+                    sqlalchemy.text(
+                        "SELECT pg_terminate_backend(pid)"
+                        " FROM pg_stat_activity WHERE query LIKE :query"
+                    ),
+                    {"query": f"%{bus.channel}%"},
+                )
+            await wait_until(lambda: not bus.connected)
+            await wait_until(lambda: bus.connected)
+            assert cache.get("key") is None, "Кэш не очищен"
+
+            await make_bus(bus.channel).publish(
+                InvalidationEventType.TEMPLATE, 5
+            )
+            await wait_until(lambda: events)
+        assert events[0].id == 5
+
+    def test_ttl_cache_set_ttl(self):
+        cache: TTLCache[int] = TTLCache("test_invalidation", 10, None)
+        cache.set("key", 1)
+        cache.set_ttl(0)
+        assert cache.get("key") is None, "Срок жизни записи не сокращен"
+        cache.set_ttl(None)
+        cache.set("key", 2)
+        assert cache.get("key") == 2
+
+
+class TestTemplatePlanInvalidation:
+    async def test_render_plan_cache(self):
+        tpl_id = await TemplateService.add(
+            TemplateWriteDTO(**templates_for_write[0])
+        )
+        plan = await TemplateService.get_render_plan(tpl_id)
+        assert await TemplateService.get_render_plan(tpl_id) is plan
+
+        await invalidation_bus.publish(InvalidationEventType.FIELD_TYPE, 1)
+        assert await TemplateService.get_render_plan(tpl_id) is not plan
+
+        await TemplateService.delete(tpl_id)
+        with pytest.raises(TemplateNotFoundException):
+            await TemplateService.get_render_plan(tpl_id)
+
+    async def test_render_plan_invalidated_by_other_process(self):
+        tpl_id = await TemplateService.add(
+            TemplateWriteDTO(**templates_for_write[0])
+        )
+        async with listening(invalidation_bus):
+            plan = await TemplateService.get_render_plan(tpl_id)
+            assert await TemplateService.get_render_plan(tpl_id) is plan
+
+            # шаблон удален другим воркером
+            await TemplateService.delete(tpl_id)
+            TemplateService._plan_cache.set(tpl_id, plan)
+            await make_bus(invalidation_bus.channel).publish(
+                InvalidationEventType.TEMPLATE, tpl_id
+            )
+            await wait_until(
+                lambda: TemplateService._plan_cache.get(tpl_id) is None
+            )
+        with pytest.raises(TemplateNotFoundException):
+            await TemplateService.get_render_plan(tpl_id)
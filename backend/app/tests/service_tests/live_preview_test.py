@@ -0,0 +1,117 @@
+import asyncio
+import json
+
+import pytest
+from docx import Document
+from docx.enum.style import WD_STYLE_TYPE
+from fastapi import WebSocketDisconnect, status
+
+from app.config import settings
+from app.services.docx_render import DocxRender
+from app.services.live_preview import LivePreviewService, LivePreviewSession
+
+FIELDS = {1: ("name", "Имя"), 2: ("city", "Город")}
+
+
+def make_template(tmp_path, text: str = "Привет, {{ name }}!") -> str:
+    docx = Document()
+    docx.styles.add_style(DocxRender.TAG_STYLE_NAME, WD_STYLE_TYPE.CHARACTER)
+    docx.add_paragraph(text)
+    docx.add_paragraph("Статичный текст")
+    table = docx.add_table(rows=1, cols=2)
+    table.cell(0, 0).text = "{{ city }}"
+    table.cell(0, 1).text = "Ячейка"
+    path = tmp_path / "template.docx"
+    docx.save(path)
+    return str(path)
+
+
+class FakeWebSocket:
+    """Websocket для тестов: сообщения клиента берутся из очереди."""
+
+    def __init__(self):
+        self.incoming = asyncio.Queue()
+        self.sent = []
+        self.close_code = None
+
+    async def receive_text(self) -> str:
+        message = await self.incoming.get()
+        if message is None:
+            raise WebSocketDisconnect()
+        return message
+
+    async def send_json(self, data):
+        self.sent.append(data)
+
+    async def close(self, code=1000, reason=None):
+        self.close_code = code
+
+
+class TestLivePreviewSession:
+    def test_render_all(self, tmp_path):
+        session = LivePreviewSession(make_template(tmp_path), FIELDS)
+        html = session.render_all()
+        assert '<div data-block="b0">' in html
+        assert "Привет, <mark>Имя</mark>!" in html, "Не выделено умолчание"
+        assert '<td data-block="b2-0-0"><p><mark>Город</mark></p></td>' in html
+
+    def test_update_only_changed_blocks(self, tmp_path):
+        session = LivePreviewSession(make_template(tmp_path), FIELDS)
+        session.render_all()
+        blocks = session.update({1: "Петр"})
+        assert [block["id"] for block in blocks] == ["b0"]
+        assert "Привет, Петр!" in blocks[0]["html"]
+        blocks = session.update({2: "<Москва>"})
+        assert blocks == [{"id": "b2-0-0", "html": "<p>&lt;Москва&gt;</p>"}]
+        assert session.update({2: "<Москва>"}) == [], "Лишняя генерация"
+
+    def test_control_tags_render_whole_document(self, tmp_path):
+        path = make_template(tmp_path, "{% if name %}{{ name }}{% endif %}")
+        session = LivePreviewSession(path, FIELDS)
+        assert 'data-block="doc"' in session.render_all()
+        blocks = session.update({2: "Москва"})
+        assert [block["id"] for block in blocks] == ["doc"]
+        assert "Москва" in blocks[0]["html"]
+
+
+class TestLivePreviewService:
+    @pytest.fixture
+    def session(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(settings, "LIVE_PREVIEW_DEBOUNCE", 0.05)
+        monkeypatch.setattr(settings, "LIVE_PREVIEW_MAX_DELAY", 1)
+        return LivePreviewSession(make_template(tmp_path), FIELDS)
+
+    @staticmethod
+    def delta(field_id: int, value: str) -> str:
+        return json.dumps({"fields": [{"field_id": field_id, "value": value}]})
+
+    async def test_debounce(self, session):
+        """Серия быстрых изменений перегенерируется один раз"""
+        websocket = FakeWebSocket()
+        task = asyncio.create_task(
+            LivePreviewService.run_session(websocket, session)
+        )
+        for value in ("П", "Пе", "Петр"):
+            websocket.incoming.put_nowait(self.delta(1, value))
+        for _ in range(100):
+            if len(websocket.sent) >= 2:
+                break
+            await asyncio.sleep(0.01)
+        await asyncio.sleep(0.1)
+        websocket.incoming.put_nowait(None)
+        with pytest.raises(WebSocketDisconnect):
+            await task
+        assert [message["type"] for message in websocket.sent] == [
+            "init",
+            "update",
+        ]
+        assert "Петр" in websocket.sent[1]["blocks"][0]["html"]
+
+    async def test_limits(self, session, monkeypatch):
+        monkeypatch.setattr(settings, "LIVE_PREVIEW_MAX_MESSAGE_SIZE", 100)
+        websocket = FakeWebSocket()
+        websocket.incoming.put_nowait(self.delta(99, "x"))
+        websocket.incoming.put_nowait(self.delta(1, "x" * 100))
+        await LivePreviewService.run_session(websocket, session)
+        assert websocket.sent[1]["type"] == "error", "Принято чужое поле"
+        assert websocket.close_code == status.WS_1009_MESSAGE_TOO_BIG
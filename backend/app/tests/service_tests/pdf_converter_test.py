@@ -0,0 +1,144 @@
+import pathlib
+import time
+from io import BytesIO
+
+import pytest
+
+from app.common.circuit_breaker import CircuitBreaker, CircuitState
+from app.common.constants import FileFormat
+from app.common.exceptions import (
+    PdfConverterUnavailableException,
+    TemplatePdfConvertErrorException,
+)
+from app.config import settings
+from app.services.pdf_converter import PdfConverter
+from app.services.render import RenderService
+
+TEMPLATE_DOCX = pathlib.Path(__file__).parent / "docx" / "template1.docx"
+
+
+@pytest.fixture
+def soffice_calls(monkeypatch):
+    """Подмена запуска libreoffice: pdf = содержимое docx файла."""
+    calls = []
+
+    def fake_run_soffice(docx_files, outdir):
+        calls.append(len(docx_files))
+        for docx_file in docx_files:
+            if docx_file.read_bytes() == b"broken":
+                continue
+            pdf_file = pathlib.Path(outdir, docx_file.stem + ".pdf")
+            pdf_file.write_bytes(b"pdf:" + docx_file.read_bytes())
+
+    monkeypatch.setattr(PdfConverter, "_run_soffice", fake_run_soffice)
+    monkeypatch.setattr("sys.platform", "linux")
+    return calls
+
+
+class TestPdfConverter:
+    def test_docx_to_pdf_many_chunks(self, soffice_calls):
+        """Файлы конвертируются пакетами с сохранением порядка"""
+        in_files = (BytesIO(str(i).encode()) for i in range(7))
+        results = list(PdfConverter.docx_to_pdf_many(in_files, chunk_size=3))
+        assert soffice_calls == [3, 3, 1], "Неверное разбиение на пакеты"
+        assert [r.getvalue() for r in results] == [
+            f"pdf:{i}".encode() for i in range(7)
+        ], "Нарушен порядок результатов"
+
+    def test_docx_to_pdf_many_skipped_file(self, soffice_calls):
+        """Несконвертированный файл не прерывает пакет"""
+        in_files = [BytesIO(b"1"), BytesIO(b"broken"), BytesIO(b"3")]
+        results = list(PdfConverter.docx_to_pdf_many(in_files))
+        assert soffice_calls == [3]
+        assert results[0].getvalue() == b"pdf:1"
+        assert results[1] is None
+        assert results[2].getvalue() == b"pdf:3"
+
+    def test_docx_to_pdf(self, soffice_calls):
+        result = PdfConverter.docx_to_pdf(BytesIO(b"docx"))
+        assert result.getvalue() == b"pdf:docx"
+
+
+@pytest.fixture
+def hanging_soffice(monkeypatch, tmp_path):
+    """Подмена libreoffice зависающим скриптом, порождающим дочерний процесс."""
+    pid_file = tmp_path / "child.pid"
+    script = tmp_path / "soffice"
+    script.write_text(f"#!/bin/sh\nsleep 30 &\necho $! > {pid_file}\nwait\n")
+    script.chmod(0o755)
+    monkeypatch.setattr(settings, "PDF_SOFFICE_BINARY", str(script))
+    monkeypatch.setattr(settings, "PDF_CONVERT_TIMEOUT", 0.3)
+    monkeypatch.setattr(settings, "PDF_CONVERT_FILE_TIMEOUT", 0)
+    monkeypatch.setattr(settings, "PDF_CONVERT_RETRIES", 1)
+    monkeypatch.setattr(
+        PdfConverter, "_breaker", CircuitBreaker("test", 2, 60)
+    )
+    monkeypatch.setattr("sys.platform", "linux")
+    return pid_file
+
+
+class TestPdfConverterResilience:
+    def test_hanging_soffice_killed(self, hanging_soffice):
+        """Зависший libreoffice и его дочерние процессы завершаются"""
+        start = time.perf_counter()
+        with pytest.raises(TemplatePdfConvertErrorException):
+            PdfConverter.docx_to_pdf(BytesIO(b"docx"))
+        assert time.perf_counter() - start < 5, "Не соблюден таймаут"
+        child_pid = int(hanging_soffice.read_text())
+        assert not pathlib.Path(f"/proc/{child_pid}").exists() or (
+            "zombie" in pathlib.Path(f"/proc/{child_pid}/status").read_text()
+        ), "Дочерний процесс libreoffice не завершен"
+
+    def test_circuit_opens_after_failures(self, hanging_soffice):
+        """После серии ошибок конвертация отклоняется без запуска"""
+        for _ in range(2):
+            with pytest.raises(TemplatePdfConvertErrorException):
+                PdfConverter.docx_to_pdf(BytesIO(b"docx"))
+        hanging_soffice.unlink()
+        start = time.perf_counter()
+        with pytest.raises(PdfConverterUnavailableException):
+            PdfConverter.docx_to_pdf(BytesIO(b"docx"))
+        assert time.perf_counter() - start < 0.1
+        assert not hanging_soffice.exists(), "libreoffice был запущен"
+
+    @pytest.mark.parametrize("fallback", [True, False])
+    async def test_render_fallback_to_docx(self, monkeypatch, fallback):
+        """При недоступном конвертере отдается docx (если разрешено)"""
+
+        def unavailable(in_file):
+            raise PdfConverterUnavailableException()
+
+        monkeypatch.setattr(PdfConverter, "docx_to_pdf", unavailable)
+        if not fallback:
+            with pytest.raises(PdfConverterUnavailableException):
+                await RenderService.get_draft(
+                    str(TEMPLATE_DOCX), {}, FileFormat.PDF
+                )
+            return
+        buffer, ext = await RenderService.get_draft(
+            str(TEMPLATE_DOCX), {}, FileFormat.PDF, fallback=True
+        )
+        assert ext == "docx"
+        assert buffer.getvalue()[:2] == b"PK"
+
+
+class TestCircuitBreaker:
+    def test_half_open_trial(self, monkeypatch):
+        now = [0.0]
+        monkeypatch.setattr(time, "monotonic", lambda: now[0])
+        breaker = CircuitBreaker("test", failure_threshold=2, reset_timeout=10)
+        breaker.record_failure()
+        assert breaker.allow()
+        breaker.record_failure()
+        assert breaker.state == CircuitState.OPEN
+        assert not breaker.allow()
+        now[0] = 11
+        assert breaker.allow(), "Не разрешен пробный вызов"
+        assert not breaker.allow(), "Разрешен второй пробный вызов"
+        breaker.record_failure()
+        assert breaker.state == CircuitState.OPEN
+        now[0] = 22
+        assert breaker.allow()
+        breaker.record_success()
+        assert breaker.state == CircuitState.CLOSED
+        assert breaker.allow()
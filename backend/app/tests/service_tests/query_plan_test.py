@@ -0,0 +1,287 @@
+import json
+from typing import Any, Awaitable, Callable, Iterator
+
+import pytest
+import sqlalchemy
+
+from app.config import settings
+from app.crud.document_dao import DocumentDAO, DocumentFieldDAO
+from app.crud.template_dao import TemplateDAO, UserTemplateFavoriteDAO
+from app.database import async_session_maker, engine
+
+USERS = 1000
+TEMPLATES = 1000
+TEMPLATE_FIELDS = 20
+TEMPLATE_GROUPS = 3
+DOCUMENTS = 10000
+FAVORITES = 5  # шаблонов в избранном у пользователя
+
+SEED_EMAIL = "plan_%@example.com"
+SEED_TITLE = "План запроса %"
+
+# таблицы, которые не должны читаться последовательным сканированием
+# (каталог шаблонов невелик, его чтение в hash join допустимо)
+LARGE_TABLES = {
+    "document",
+    "document_field",
+    "template_field",
+    "field_group",
+    "user_template_favorite",
+}
+
+SEED_SQL = (
+    # пользователи из mock_user.json добавлены с явными id
+    """
+    SELECT SETVAL('user_id_seq', (SELECT MAX(id) FROM "user"))
+    """,
+    f"""
+    INSERT INTO "user" (email, hashed_password, is_active, is_superuser,
+        is_verified, name)
+    SELECT 'plan_' || n || '@example.com', 'x', true, false, false,
+        'Пользователь ' || n
+    FROM generate_series(1, {USERS}) n
+    """,
+    f"""
+    INSERT INTO template (title, description, deleted, render_engine,
+        created_at, updated_at)
+    SELECT 'План запроса ' || n, 'Описание', n % 20 = 0, 'docxtpl',
+        now(), now()
+    FROM generate_series(1, {TEMPLATES}) n
+    """,
+    f"""
+    INSERT INTO field_group (template_id, name)
+    SELECT t.id, 'Группа ' || n
+    FROM template t, generate_series(1, {TEMPLATE_GROUPS}) n
+    WHERE t.title LIKE '{SEED_TITLE}'
+    """,
+    f"""
+    INSERT INTO template_field (tag, name, hint, "default", length,
+        template_id, type_id)
+    SELECT 'tag' || n, 'Поле ' || n, '', '', 100, t.id, 1
+    FROM template t, generate_series(1, {TEMPLATE_FIELDS}) n
+    WHERE t.title LIKE '{SEED_TITLE}'
+    """,
+    f"""
+    INSERT INTO document (description, template_id, owner_id, completed,
+        created_at, updated_at)
+    SELECT 'Документ ' || n, t.id, u.id, false,
+        now() - n * interval '1 minute', now() - n * interval '1 minute'
+    FROM generate_series(0, {DOCUMENTS - 1}) n
+    JOIN (
+        SELECT id, row_number() OVER (ORDER BY id) - 1 AS i FROM template
+        WHERE title LIKE '{SEED_TITLE}'
+    ) t ON t.i = n % {TEMPLATES}
+    JOIN (
+        SELECT id, row_number() OVER (ORDER BY id) - 1 AS i FROM "user"
+        WHERE email LIKE '{SEED_EMAIL}'
+    ) u ON u.i = n % {USERS}
+    """,
+    f"""
+    INSERT INTO document_field (value, template_field_id, document_id)
+    SELECT 'Значение', f.id, d.id
+    FROM document d JOIN template_field f ON f.template_id = d.template_id
+    JOIN "user" u ON u.id = d.owner_id
+    WHERE u.email LIKE '{SEED_EMAIL}'
+    """,
+    # половина документов хранит значения в document.field_values
+    f"""
+    UPDATE document d SET field_values = (
+        SELECT jsonb_object_agg(
+            f.template_field_id::text, jsonb_build_object('value', f.value)
+        )
+        FROM document_field f WHERE f.document_id = d.id
+    )
+    FROM "user" u
+    WHERE u.id = d.owner_id AND u.email LIKE '{SEED_EMAIL}' AND d.id % 2 = 0
+    """,
+    """
+    DELETE FROM document_field f USING document d
+    WHERE d.id = f.document_id AND d.field_values IS NOT NULL
+    """,
+    f"""
+    INSERT INTO user_template_favorite (user_id, template_id)
+    SELECT u.id, t.id
+    FROM "user" u CROSS JOIN generate_series(1, {FAVORITES}) n
+    JOIN template t ON t.id % {TEMPLATES} = (u.id + n) % {TEMPLATES}
+    WHERE u.email LIKE '{SEED_EMAIL}' AND t.title LIKE '{SEED_TITLE}'
+    """,
+)
+
+
+@pytest.fixture(autouse=True, scope="module")
+async def seed() -> dict[str, int]:
+    """Заполнение б.д. данными реалистичного объема."""
+    assert settings.MODE == "TEST"
+
+    async with async_session_maker() as session:
+        for statement in SEED_SQL:
+            await session.execute(sqlalchemy.text(statement))
+        await session.commit()
+        template_ids = await session.scalars(
+            sqlalchemy.text(
+                f"SELECT id FROM template WHERE title LIKE '{SEED_TITLE}'"
+            )
+        )
+        document_ids = await session.scalars(
+            sqlalchemy.text(
+                "SELECT d.id FROM document d JOIN template t"
+                " ON t.id = d.template_id"
+                f" WHERE t.title LIKE '{SEED_TITLE}'"
+            )
+        )
+        ids = (
+            await session.execute(
+                sqlalchemy.text(
+                    "SELECT d.id AS document_id, d.template_id, d.owner_id,"
+                    " (SELECT MIN(f.id) FROM template_field f"
+                    " WHERE f.template_id = d.template_id) AS field_id"
+                    " FROM document d JOIN template t"
+                    " ON t.id = d.template_id"
+                    f" WHERE t.title LIKE '{SEED_TITLE}' AND NOT t.deleted"
+                    " ORDER BY d.id DESC LIMIT 1"
+                )
+            )
+        ).one()
+    # векторы поиска, как после сохранения через сервисы
+    await TemplateDAO.update_search_vector(*template_ids)
+    await DocumentDAO.update_search_vector(*document_ids)
+    async with engine.connect() as conn:
+        await conn.execution_options(isolation_level="AUTOCOMMIT")
+        for table in LARGE_TABLES | {"user", "template"}:
+            # VACUUM переносит записи GIN индекса из pending list,
+            # как autovacuum в рабочей б.д.
+            await conn.exec_driver_sql(f'VACUUM ANALYZE "{table}"')
+    yield ids._asdict()
+
+    async with async_session_maker() as session:
+        await session.execute(
+            sqlalchemy.text(
+                f"DELETE FROM \"user\" WHERE email LIKE '{SEED_EMAIL}'"
+            )
+        )
+        await session.execute(
+            sqlalchemy.text(
+                f"DELETE FROM template WHERE title LIKE '{SEED_TITLE}'"
+            )
+        )
+        await session.commit()
+
+
+def plan_nodes(node: dict[str, Any]) -> Iterator[dict[str, Any]]:
+    yield node
+    for child in node.get("Plans", ()):
+        yield from plan_nodes(child)
+
+
+async def explain_queries(
+    call: Callable[[], Awaitable[Any]]
+) -> list[tuple[str, list[dict[str, Any]]]]:
+    """Выполняет вызов DAO и возвращает планы всех его запросов."""
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, *args):
+        if not statement.startswith("EXPLAIN"):
+            statements.append((statement, parameters))
+
+    sync_engine = engine.sync_engine
+    sqlalchemy.event.listen(sync_engine, "before_cursor_execute", capture)
+    try:
+        await call()
+    finally:
+        sqlalchemy.event.remove(sync_engine, "before_cursor_execute", capture)
+    assert statements, "Вызов не выполнил запросов"
+
+    plans = []
+    async with engine.connect() as conn:
+        for statement, parameters in statements:
+            result = await conn.exec_driver_sql(
+                f"EXPLAIN (FORMAT JSON) {statement}", parameters
+            )
+            plan = result.scalar()
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            plans.append((statement, list(plan_nodes(plan[0]["Plan"]))))
+    return plans
+
+
+DAO_CALLS = {
+    "DocumentDAO.get_by_id": lambda ids: DocumentDAO.get_by_id(
+        ids["document_id"]
+    ),
+    "DocumentDAO.get_all": lambda ids: DocumentDAO.get_all(
+        owner_id=ids["owner_id"]
+    ),
+    "DocumentDAO.get_render_plan": lambda ids: DocumentDAO.get_render_plan(
+        ids["document_id"]
+    ),
+    "DocumentFieldDAO.get_all": lambda ids: DocumentFieldDAO.get_all(
+        document_id=ids["document_id"]
+    ),
+    "DocumentFieldDAO.delete_all": lambda ids: DocumentFieldDAO.delete_all(
+        document_id=ids["document_id"]
+    ),
+    "TemplateDAO.get_by_id": lambda ids: TemplateDAO.get_by_id(
+        ids["template_id"]
+    ),
+    "TemplateDAO.get_render_plan": lambda ids: TemplateDAO.get_render_plan(
+        ids["template_id"]
+    ),
+    "DocumentDAO.get_all_by_field_value": lambda ids: (
+        DocumentDAO.get_all_by_field_value(
+            ids["field_id"], "Значение", owner_id=ids["owner_id"]
+        )
+    ),
+    "DocumentDAO.search": lambda ids: DocumentDAO.search(
+        "9999:*", 20, 0, owner_id=ids["owner_id"]
+    ),
+    "TemplateDAO.search": lambda ids: TemplateDAO.search(
+        "99:*", 20, 0, deleted=False
+    ),
+    "UserTemplateFavoriteDAO.get_all": lambda ids: (
+        UserTemplateFavoriteDAO.get_all(user_id=ids["owner_id"])
+    ),
+    "UserTemplateFavoriteDAO.get_one_or_none": lambda ids: (
+        UserTemplateFavoriteDAO.get_one_or_none(
+            user_id=ids["owner_id"], template_id=ids["template_id"]
+        )
+    ),
+}
+
+
+class TestQueryPlans:
+    @pytest.mark.parametrize("name", DAO_CALLS)
+    async def test_no_seq_scan_on_large_tables(self, name: str, seed):
+        for statement, nodes in await explain_queries(
+            lambda: DAO_CALLS[name](seed)
+        ):
+            seq_scans = [
+                node["Relation Name"]
+                for node in nodes
+                if node["Node Type"] == "Seq Scan"
+                and node["Relation Name"] in LARGE_TABLES
+            ]
+            assert not seq_scans, f"{name}: Seq Scan {seq_scans}\n{statement}"
+
+    async def test_user_documents_use_owner_index(self, seed):
+        [(statement, nodes)] = await explain_queries(
+            lambda: DocumentDAO.get_all(owner_id=seed["owner_id"])
+        )
+        indexes = {node.get("Index Name") for node in nodes}
+        assert "ix_document_owner_id_updated_at" in indexes, statement
+
+    async def test_field_value_lookup_uses_gin_index(self, seed):
+        [(statement, nodes)] = await explain_queries(
+            lambda: DocumentDAO.get_all_by_field_value(
+                seed["field_id"], "Значение"
+            )
+        )
+        indexes = {node.get("Index Name") for node in nodes}
+        assert "ix_document_field_values" in indexes, statement
+
+    async def test_search_uses_gin_index(self, seed):
+        # описание одного из документов - "Документ 9999"
+        [(statement, nodes)] = await explain_queries(
+            lambda: DocumentDAO.search("9999:*", 20, 0)
+        )
+        indexes = {node.get("Index Name") for node in nodes}
+        assert "ix_document_search_vector" in indexes, statement
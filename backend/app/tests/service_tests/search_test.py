@@ -0,0 +1,231 @@
+import random
+
+import pytest
+import sqlalchemy
+from httpx import AsyncClient
+
+from app.common.constants import DocumentFieldsStorage
+from app.common.utils import prefix_tsquery
+from app.config import settings
+from app.crud.base_dao import UserDAO
+from app.database import engine
+from app.models.template import Template
+from app.schemas.document import DocumentWriteDTO
+from app.schemas.template import TemplateWriteDTO
+from app.services.document import DocumentService
+from app.services.template import TemplateService
+
+# в тестовой б.д. с кодировкой SQL_ASCII или LC_CTYPE=C Postgres не
+# разбирает кириллицу на слова: в данных - латинские слова без гласных,
+# которые не изменяются стеммером
+LETTERS = "bcdfghjklmnpqrtvwxz"
+
+
+def make_word() -> str:
+    return "".join(random.choices(LETTERS, k=12))
+
+
+def make_template(
+    title: str, description: str = "", field_name: str = "field"
+) -> TemplateWriteDTO:
+    return TemplateWriteDTO(
+        title=title,
+        description=description,
+        grouped_fields=[],
+        ungrouped_fields=[
+            {
+                "tag": "tag1",
+                "name": field_name,
+                "hint": "",
+                "type": "str",
+                "length": 100,
+            }
+        ],
+    )
+
+
+@pytest.fixture(scope="module")
+async def template() -> Template:
+    id = await TemplateService.add(make_template("Documents"))
+    return await TemplateService.get_or_raise_not_found(id)
+
+
+def make_document(
+    template: Template, description: str, value: str
+) -> DocumentWriteDTO:
+    return DocumentWriteDTO(
+        template_id=template.id,
+        description=description,
+        completed=False,
+        fields=[{"field_id": template.fields[0].id, "value": value}],
+    )
+
+
+@pytest.fixture
+async def user():
+    return await UserDAO.get_by_id(1)
+
+
+@pytest.fixture
+async def other_user():
+    return await UserDAO.get_by_id(2)
+
+
+@pytest.fixture
+def storage():
+    yield
+    settings.DOCUMENT_FIELDS_STORAGE = DocumentFieldsStorage.EAV
+
+
+class TestPrefixTsquery:
+    @pytest.mark.parametrize(
+        "text, expected",
+        [
+            ("Supply", "supply:*"),
+            (" supply,  contract! ", "supply:* & contract:*"),
+            ("a & b | !c:*", "a:* & b:* & c:*"),
+            ("snake_case", "snake:* & case:*"),
+            ("!!! ()", None),
+        ],
+    )
+    def test_prefix_tsquery(self, text, expected):
+        assert prefix_tsquery(text, 10) == expected
+
+    def test_max_terms(self):
+        assert prefix_tsquery("a b c", 2) == "a:* & b:*"
+
+
+class TestTemplateSearch:
+    async def test_search_ranking_and_prefix(self):
+        word = make_word()
+        by_field = await TemplateService.add(
+            make_template("Field", field_name=f"{word} field")
+        )
+        by_description = await TemplateService.add(
+            make_template("Description", description=f"About {word}")
+        )
+        by_title = await TemplateService.add(make_template(f"{word} title"))
+
+        result = await TemplateService.search(word)
+        assert [dto.id for dto in result] == [
+            by_title,
+            by_description,
+            by_field,
+        ], "Наименование должно быть релевантнее описания и полей"
+        result = await TemplateService.search(word[:5])
+        assert {dto.id for dto in result} >= {by_title, by_field}
+        assert await TemplateService.search(f"{word} {make_word()}") == []
+
+        await TemplateService.delete(by_title)
+        result = await TemplateService.search(word)
+        assert [dto.id for dto in result] == [by_description, by_field]
+
+    async def test_search_pagination(self):
+        word = make_word()
+        ids = [
+            await TemplateService.add(make_template(f"{word} {n}"))
+            for n in range(5)
+        ]
+        page = await TemplateService.search(word, limit=2)
+        # при равной релевантности - сначала новые
+        assert [dto.id for dto in page] == ids[::-1][:2]
+        page = await TemplateService.search(word, limit=2, offset=4)
+        assert [dto.id for dto in page] == ids[:1]
+
+    async def test_search_marks_favorites(self, user):
+        word = make_word()
+        id = await TemplateService.add(make_template(word))
+        [dto] = await TemplateService.search(word, user)
+        assert dto.id == id
+        assert dto.is_favorited is False
+
+    async def test_empty_query(self):
+        assert await TemplateService.search("!!!") == []
+
+
+class TestDocumentSearch:
+    @pytest.mark.parametrize(
+        "fields_storage",
+        [DocumentFieldsStorage.EAV, DocumentFieldsStorage.JSONB],
+    )
+    async def test_search_by_value(
+        self, fields_storage, storage, template, user, other_user
+    ):
+        settings.DOCUMENT_FIELDS_STORAGE = fields_storage
+        word = make_word()
+        by_value = await DocumentService.add(
+            make_document(template, "Document", f"Value {word}"), user
+        )
+        by_description = await DocumentService.add(
+            make_document(template, f"Document {word}", "Value"), user
+        )
+        await DocumentService.add(
+            make_document(template, f"Document {word}", f"Value {word}"),
+            other_user,
+        )
+
+        result = await DocumentService.search(user, word[:6])
+        assert [dto.id for dto in result] == [by_description, by_value]
+        assert result[0].template_title
+
+        await DocumentService.update(
+            by_value, make_document(template, "Document", "Changed"), user
+        )
+        result = await DocumentService.search(user, word)
+        assert [dto.id for dto in result] == [by_description]
+        assert await DocumentService.search(None, word) == []
+
+    async def test_empty_values(self, template, user):
+        word = make_word()
+        id = await DocumentService.add(
+            make_document(template, f"{word} description", ""), user
+        )
+        [dto] = await DocumentService.search(user, word)
+        assert dto.id == id
+
+
+class TestSearchApi:
+    async def test_template_search(self, ac: AsyncClient):
+        word = make_word()
+        id = await TemplateService.add(make_template(word))
+        route = settings.API_V1_PREFIX + "/template/search"
+        response = await ac.get(route, params={"q": word})
+        assert response.status_code == 200
+        assert [obj["id"] for obj in response.json()] == [id]
+
+        response = await ac.get(route, params={"q": ""})
+        assert response.status_code == 422
+        response = await ac.get(
+            route,
+            params={"q": word, "limit": settings.SEARCH_MAX_PAGE_SIZE + 1},
+        )
+        assert response.status_code == 422
+
+    async def test_document_search(
+        self, ac: AsyncClient, user_ac: AsyncClient, template, user
+    ):
+        word = make_word()
+        id = await DocumentService.add(make_document(template, word, ""), user)
+        route = settings.API_V1_PREFIX + "/document/search"
+        response = await user_ac.get(route, params={"q": word})
+        assert response.status_code == 200
+        assert [obj["id"] for obj in response.json()] == [id]
+
+        response = await ac.get(route, params={"q": word})
+        assert response.status_code == 401
+
+
+class TestRussianSearch:
+    async def test_russian_stemming(self):
+        async with engine.connect() as conn:
+            words = await conn.scalar(
+                sqlalchemy.text("SELECT length(to_tsvector('russian', 'дом'))")
+            )
+        if not words:
+            pytest.skip("Б.д. не разбирает кириллицу (кодировка, LC_CTYPE)")
+        word = make_word()
+        id = await TemplateService.add(
+            make_template(f"Договоры поставки {word}")
+        )
+        result = await TemplateService.search(f"договор постав {word}")
+        assert [dto.id for dto in result] == [id]
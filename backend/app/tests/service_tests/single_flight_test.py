@@ -0,0 +1,77 @@
+import asyncio
+
+import pytest
+
+from app.common.single_flight import SingleFlight, make_key
+
+
+class TestSingleFlight:
+    async def test_concurrent_calls_are_coalesced(self):
+        """Одновременные вызовы с одинаковым ключом выполняются один раз"""
+        flight = SingleFlight("test")
+        calls = 0
+
+        async def compute():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.05)
+            return b"result"
+
+        key = make_key("tpl.docx", {"tag": "value"}, True)
+        results = await asyncio.gather(
+            *(flight.do(key, compute) for _ in range(5))
+        )
+        assert calls == 1, "Вычисление выполнено более одного раза"
+        assert results == [b"result"] * 5, "Неверный результат вызовов"
+
+        # после завершения вычисление выполняется заново
+        await flight.do(key, compute)
+        assert calls == 2, "Результат не должен кэшироваться"
+
+    async def test_different_keys_are_not_coalesced(self):
+        """Вызовы с разными ключами выполняются независимо"""
+        flight = SingleFlight("test")
+
+        async def compute(value):
+            await asyncio.sleep(0.01)
+            return value
+
+        results = await asyncio.gather(
+            flight.do(make_key("a"), lambda: compute("a")),
+            flight.do(make_key("b"), lambda: compute("b")),
+        )
+        assert results == ["a", "b"], "Результаты вызовов перепутаны"
+
+    async def test_exception_is_shared(self):
+        """Исключение вычисления получают все ожидающие вызовы"""
+        flight = SingleFlight("test")
+
+        async def compute():
+            await asyncio.sleep(0.01)
+            raise ValueError("render failed")
+
+        key = make_key("broken")
+        results = await asyncio.gather(
+            flight.do(key, compute),
+            flight.do(key, compute),
+            return_exceptions=True,
+        )
+        assert all(isinstance(r, ValueError) for r in results)
+
+    async def test_cancelled_caller_does_not_cancel_computation(self):
+        """Отмена одного из вызовов не прерывает вычисление для остальных"""
+        flight = SingleFlight("test")
+
+        async def compute():
+            await asyncio.sleep(0.05)
+            return 42
+
+        key = make_key("cancel")
+        first = asyncio.ensure_future(flight.do(key, compute))
+        await asyncio.sleep(0)
+        second = asyncio.ensure_future(flight.do(key, compute))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        assert await second == 42
@@ -1,3 +1,4 @@
+import hashlib
 import os.path
 from typing import Any
 
@@ -10,12 +11,14 @@ from app.common.exceptions import (
     TypeFieldNotFoundException,
 )
 from app.config import settings
-from app.crud.template_dao import TemplateDAO
+from app.crud.template_dao import TemplateDAO, TemplateVersionDAO
 from app.schemas.template import TemplateReadDTO, TemplateWriteDTO
+from app.services.render_plan import RenderPlan
 from app.services.template import TemplateService
 from app.tests.fixtures import (
     broken_docx_error_tags,
     broken_docx_path,
+    docx_path,
     template_with_invalid_type_field,
     templates_for_read,
     templates_for_write,
@@ -57,6 +60,11 @@ class TestTemplateService:
         read_dto = await TemplateService.get(id=id)
         assert read_dto, "Объект не найден в базе"
         self._compare_templates(read_dto, expected_dto)
+        # ответ api (get_json_response) соответствует схеме
+        json_dto = TemplateReadDTO.model_validate_json(
+            read_dto.model_dump_json()
+        )
+        assert json_dto == read_dto
 
     async def test_get_invalid_id_raises_exception(self):
         with pytest.raises(TemplateNotFoundException):
@@ -160,7 +168,7 @@ class TestTemplateService:
             await TemplateService.update_docx_template(
                 tpl_id, file=upload_file
             )
-        expected_name = f"tpl_{tpl_id}.docx"
+        expected_name = f"tpl_{tpl_id}_v1.docx"
         expected_path = settings.TEMPLATE_DOCX_DIR + expected_name
         tpl = await TemplateDAO.get_by_id(tpl_id)
         assert tpl.filename, "Шаблон не загружен"
@@ -174,6 +182,43 @@ class TestTemplateService:
         assert inconsistent_tags == broken_tags, "Ошибка проверки тэгов"
         # assert os.path.exists("")
 
+    async def _upload(self, tpl_id, docx_path):
+        with open(docx_path, "rb") as test_file:
+            upload_file = UploadFile(file=test_file, filename="upload.docx")
+            return await TemplateService.update_docx_template(
+                tpl_id, file=upload_file
+            )
+
+    async def test_template_versions(self):
+        tpl_id = await TemplateService.add(
+            TemplateWriteDTO(**templates_for_write[0])
+        )
+        v1_id = await self._upload(tpl_id, docx_path)
+        assert v1_id == await self._upload(
+            tpl_id, docx_path
+        ), "Повторная загрузка файла создала версию"
+        v2_id = await self._upload(tpl_id, broken_docx_path)
+        assert v2_id != v1_id, "Новый файл не создал версию"
+
+        tpl = await TemplateDAO.get_by_id(tpl_id)
+        assert tpl.version_id == v2_id
+        assert tpl.version.number == 2
+        assert tpl.filename.name == f"tpl_{tpl_id}_v2.docx"
+        assert tpl.version.tags == sorted(tpl.version.tags)
+        assert {field["tag"] for field in tpl.version.fields} == {
+            field.tag for field in tpl.fields
+        }
+        # файл прежней версии не перезаписывается
+        v1 = await TemplateVersionDAO.get_by_id(v1_id)
+        assert v1.number == 1
+        assert os.path.exists(v1.path), "Файл версии удален"
+        with open(docx_path, "rb") as file:
+            assert hashlib.sha256(file.read()).hexdigest() == v1.file_hash
+
+        plan = RenderPlan.from_rows(await TemplateDAO.get_render_plan(tpl_id))
+        assert plan.version_id == v2_id
+        assert os.path.samefile(plan.docx_path, tpl.version.path)
+
     # async def test_update(self):
     #     new_obj = TemplateFieldTypeWriteDTO(
     #         type="currency", name="Валюта", mask="маска"
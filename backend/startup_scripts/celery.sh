@@ -1,7 +1,24 @@
 #!/bin/bash
 
+CELERY_APP="app.tasks.celery_config:celery_app"
+
 if [[ "${1}" == "celery" ]]; then
-    celery --app=app.tasks.celery_config:celery_app worker -l INFO
+    # один воркер для всех очередей (порядок очередей задает приоритет)
+    celery --app=${CELERY_APP} worker -l INFO \
+        -Q interactive,download,bulk
+elif [[ "${1}" == "celery-interactive" ]]; then
+    celery --app=${CELERY_APP} worker -l INFO -n interactive@%h \
+        -Q interactive \
+        --concurrency=${CELERY_INTERACTIVE_CONCURRENCY:-2}
+elif [[ "${1}" == "celery-download" ]]; then
+    # свободные воркеры скачивания помогают очереди interactive
+    celery --app=${CELERY_APP} worker -l INFO -n download@%h \
+        -Q interactive,download \
+        --concurrency=${CELERY_DOWNLOAD_CONCURRENCY:-2}
+elif [[ "${1}" == "celery-bulk" ]]; then
+    celery --app=${CELERY_APP} worker -l INFO -n bulk@%h \
+        -Q bulk \
+        --concurrency=${CELERY_BULK_CONCURRENCY:-1}
 elif [[ "${1}" == "flower" ]]; then
-    celery --app=app.tasks.celery_config:celery_app flower
+    celery --app=${CELERY_APP} flower
 fi